@@ -0,0 +1,167 @@
+"""End-to-end benchmark of the search and the solver at several worker counts.
+
+There are two fixed workloads:
+
+    search         the first midgame positions of corpus.json, each searched to a
+                   fixed depth, with the positions split between the workers
+    reduced_solve  parallel.solve of every position reachable from the empty board
+                   in the smaller game where each player has one of each piece,
+                   SOLVE_INVENTORY, with the given number of workers
+
+Each run happens in a fresh process, so its peak RSS can be measured, and is
+written as one JSON object per line with the wall time, nodes, nodes per second,
+peak RSS in bytes and the transposition table hit rate. For the solve, the nodes
+are the positions solved and there is no transposition table.
+
+The peak RSS is the largest peak of any one process of the run, the benchmark
+process or one of its workers, not the total of all of them, so with several
+workers the run as a whole uses more memory than it shows.
+
+Run with: python -m benchmarks.end_to_end [--workers 1 2 4 8] [--output FILE]"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.micro import load_corpus
+from goblet_gobblers.solver import parallel
+from goblet_gobblers.solver.search import Searcher
+
+SEARCH_ROOTS = 8
+"""The number of midgame positions searched."""
+
+SEARCH_DEPTH = 5
+
+TABLE_CAPACITY = 1 << 16
+
+SOLVE_INVENTORY = (1, 1, 1, 1, 1, 1)
+"""The inventory of the reduced_solve workload, see retrograde.FULL_INVENTORY."""
+
+
+def _search_root(index: int) -> tuple:
+    """Searches one root and returns (nodes, probes, hits)."""
+    state = load_corpus()["midgame"][index]
+    searcher = Searcher(table_capacity=TABLE_CAPACITY)
+    searcher.search(state, SEARCH_DEPTH)
+    return searcher.nodes, searcher.table.probes, searcher.table.hits
+
+
+def search_workload(workers: int) -> dict:
+    roots = range(SEARCH_ROOTS)
+    if workers == 1:
+        results = [_search_root(i) for i in roots]
+    else:
+        with multiprocessing.get_context().Pool(workers) as pool:
+            results = pool.map(_search_root, roots)
+
+    nodes = sum(r[0] for r in results)
+    probes = sum(r[1] for r in results)
+    hits = sum(r[2] for r in results)
+    return {"nodes": nodes, "tt_hit_rate": hits / probes if probes else 0.0}
+
+
+def solve_workload(workers: int) -> dict:
+    solution = parallel.solve(workers=workers, inventory=SOLVE_INVENTORY)
+    return {"nodes": len(solution), "tt_hit_rate": None}
+
+
+WORKLOADS = {"search": search_workload, "reduced_solve": solve_workload}
+
+
+def _peak_rss() -> int:
+    """Returns the largest resident set size of this process or any one of its
+    finished child processes, in bytes. getrusage doesn't add up the children."""
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Linux reports kilobytes and macOS reports bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run(workload: str, workers: int, queue):
+    start = time.perf_counter()
+    result = WORKLOADS[workload](workers)
+    seconds = time.perf_counter() - start
+
+    result.update(
+        {
+            "workload": workload,
+            "workers": workers,
+            "seconds": round(seconds, 3),
+            "nodes_per_second": round(result["nodes"] / seconds),
+            "peak_rss": _peak_rss(),
+        }
+    )
+    queue.put(result)
+
+
+def run(workload: str, workers: int) -> dict:
+    """Runs a workload in a new process and returns its measurements."""
+    context = multiprocessing.get_context()
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(workload, workers, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search and solver.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count()}),
+    )
+    parser.add_argument(
+        "--workload", choices=sorted(WORKLOADS), nargs="+", default=sorted(WORKLOADS)
+    )
+    parser.add_argument("--output", help="Append the results to this JSON lines file.")
+    args = parser.parse_args()
+
+    context = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+    output = open(args.output, "a") if args.output is not None else None
+    try:
+        for workload in args.workload:
+            for workers in args.workers:
+                result = {**context, **run(workload, workers)}
+                line = json.dumps(result, sort_keys=True)
+                print(line, flush=True)
+                if output is not None:
+                    output.write(line + "\n")
+                    output.flush()
+    finally:
+        if output is not None:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Micro-benchmarks for the State hot paths.
+
+Each operation is timed over the positions of one group of the fixed corpus in
+corpus.json: openings, midgames and crowded endgames. For each operation and group
+the benchmark reports
+
+    ops_per_second       calls per second, the best of several repeats
+    blocks_per_call      memory blocks still allocated per call when the results
+                         are kept, i.e., roughly the objects a call returns
+    peak_bytes_per_call  the average peak memory allocated during a call, which
+                         includes temporary objects
+
+The results can be saved as a baseline, and a later run fails if the throughput of
+an operation drops by more than the threshold. Baselines are only comparable on
+the same machine.
+
+Every group must hold distinct positions, counting equivalent positions as the
+same, so loading or generating a corpus with a repeated position fails. Run with
+--generate GROUP to replace the positions of a group with new random ones.
+
+Run with: python -m benchmarks.micro [--save] [--threshold 0.2]"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from goblet_gobblers.game import symmetry
+from goblet_gobblers.game.position import Position
+from goblet_gobblers.game.state import State, Player
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(DIRECTORY, "corpus.json")
+BASELINE_PATH = os.path.join(DIRECTORY, "baseline.json")
+
+DEFAULT_THRESHOLD = 0.2
+"""The fraction the throughput may drop below the baseline before a run fails."""
+
+GROUP_SIZE = 20
+"""The number of positions in each group of the corpus."""
+
+GROUP_PLIES = {"opening": (0, 4), "midgame": (4, 9), "endgame": (9, 16)}
+"""The range of the number of random plies played to make a position of each
+group, for --generate."""
+
+
+def check_distinct(group: str, states: list):
+    """Raises ValueError if a group holds a position more than once."""
+    seen = {}
+    for i, state in enumerate(states):
+        key = state.key()
+        if key in seen:
+            raise ValueError(
+                f"Corpus group {group} repeats position {seen[key]} at {i}: {state}"
+            )
+        seen[key] = i
+
+
+def _read_corpus(path: str) -> dict:
+    with open(path) as file:
+        corpus = json.load(file)
+
+    return {
+        group: [
+            State(
+                Player[entry["to_play"]],
+                initial_board=np.array(entry["board"], dtype=np.int8),
+            )
+            for entry in entries
+        ]
+        for group, entries in corpus.items()
+    }
+
+
+def load_corpus(path: str = CORPUS_PATH) -> dict:
+    """Returns the States of each group of the corpus."""
+    corpus = _read_corpus(path)
+    for group, states in corpus.items():
+        check_distinct(group, states)
+
+    return corpus
+
+
+def generate_group(group: str, seed: int = 0, count: int = GROUP_SIZE) -> list:
+    """Returns count distinct positions where the game isn't over, each found by
+    playing a random number of random moves, in the range GROUP_PLIES[group], from
+    the empty board."""
+    rng = random.Random(seed)
+    low, high = GROUP_PLIES[group]
+    states = []
+    keys = set()
+    for _ in range(1000 * count):
+        if len(states) == count:
+            break
+
+        state = State(Player.ORANGE, pieces=[])
+        for _ in range(rng.randint(low, high)):
+            state = state.play(*rng.choice(state.valid_moves()))
+            if state.is_win() is not None:
+                break
+
+        if state.is_win() is None and state.key() not in keys:
+            keys.add(state.key())
+            states.append(state)
+
+    if len(states) < count:
+        raise ValueError(f"Only found {len(states)} distinct {group} positions")
+
+    check_distinct(group, states)
+    return states
+
+
+def save_corpus(corpus: dict, path: str = CORPUS_PATH):
+    """Writes the States of each group, one position per line."""
+    groups = []
+    for group, states in corpus.items():
+        check_distinct(group, states)
+        entries = [
+            json.dumps({"to_play": state.to_play.name, "board": state._board.tolist()})
+            for state in states
+        ]
+        groups.append(f' "{group}": [\n  ' + ",\n  ".join(entries) + "\n ]")
+
+    with open(path, "w") as file:
+        file.write("{\n" + ",\n".join(groups) + "\n}\n")
+
+
+def _make_unmake(position: Position, move: int):
+    position.make_move(move)
+    position.unmake_move()
+
+
+def operations(states: list) -> dict:
+    """Returns, for each operation, the function to call and the list of argument
+    tuples to call it with."""
+    moves = [(state, move) for state in states for move in state.valid_moves()]
+    positions = [Position(state) for state in states]
+    position_moves = [
+        (position, move) for position in positions for move in position.valid_moves()
+    ]
+
+    return {
+        "init": (
+            lambda to_play, board: State(to_play, initial_board=board.copy()),
+            [(state.to_play, state._board) for state in states],
+        ),
+        "play": (lambda state, move: state.play(*move), moves),
+        "valid_moves": (State.valid_moves, [(state,) for state in states]),
+        "is_win": (State.is_win, [(state,) for state in states]),
+        "canonicalize": (
+            lambda tables, board: tables.canonical(symmetry.pack(board)),
+            [(state._symmetry_tables, state._board) for state in states],
+        ),
+        "position_valid_moves": (Position.valid_moves, [(p,) for p in positions]),
+        "position_make_unmake": (_make_unmake, position_moves),
+    }
+
+
+def ops_per_second(function, calls: list, min_time: float, repeats: int = 3) -> float:
+    """Times the calls, repeating them until at least min_time has passed, and
+    returns the best rate of several repeats."""
+    best = 0.0
+    for _ in range(repeats):
+        count = 0
+        start = time.perf_counter()
+        while True:
+            for args in calls:
+                function(*args)
+            count += len(calls)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+
+        best = max(best, count / elapsed)
+
+    return best
+
+
+def allocations(function, calls: list) -> tuple[float, float]:
+    """Returns (blocks_per_call, peak_bytes_per_call) for the calls."""
+    gc.collect()
+    gc.disable()
+    try:
+        results = []
+        before = sys.getallocatedblocks()
+        for args in calls:
+            results.append(function(*args))
+        blocks = (sys.getallocatedblocks() - before) / len(calls)
+        del results
+
+        tracemalloc.start()
+        peak_bytes = 0
+        for args in calls:
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            function(*args)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_bytes += peak - current
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+
+    return blocks, peak_bytes / len(calls)
+
+
+def run(min_time: float = 0.2, only: str = None) -> dict:
+    """Runs the benchmarks and returns the results keyed by operation/group."""
+    results = {}
+    for group, states in load_corpus().items():
+        for name, (function, calls) in operations(states).items():
+            key = f"{name}/{group}"
+            if only is not None and only not in key:
+                continue
+
+            blocks, peak_bytes = allocations(function, calls)
+            results[key] = {
+                "ops_per_second": round(ops_per_second(function, calls, min_time)),
+                "blocks_per_call": round(blocks, 2),
+                "peak_bytes_per_call": round(peak_bytes),
+            }
+
+    return results
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns the keys whose throughput dropped by more than threshold."""
+    return [
+        key
+        for key, result in results.items()
+        if key in baseline
+        and result["ops_per_second"] < (1 - threshold) * baseline[key]["ops_per_second"]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the State hot paths.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument(
+        "--save", action="store_true", help="Save the results as the baseline."
+    )
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--only", help="Only run benchmarks whose name contains this.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    parser.add_argument(
+        "--generate",
+        choices=sorted(GROUP_PLIES),
+        help="Replace the positions of a corpus group with new random ones and exit.",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="The seed for --generate.")
+    args = parser.parse_args()
+
+    if args.generate is not None:
+        # The group being replaced may be the one with a repeated position.
+        corpus = _read_corpus(CORPUS_PATH)
+        corpus[args.generate] = generate_group(args.generate, args.seed)
+        save_corpus(corpus)
+        return
+
+    results = run(args.min_time, args.only)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    print(f"{'benchmark':36} {'ops/s':>10} {'baseline':>10} {'blocks':>7} {'bytes':>7}")
+    for key, result in results.items():
+        expected = baseline.get(key, {}).get("ops_per_second", "")
+        print(
+            f"{key:36} {result['ops_per_second']:>10} {expected:>10}"
+            f" {result['blocks_per_call']:>7} {result['peak_bytes_per_call']:>7}"
+        )
+
+    for path in [args.output, args.baseline if args.save else None]:
+        if path is not None:
+            with open(path, "w") as file:
+                json.dump(results, file, indent=1, sort_keys=True)
+                file.write("\n")
+
+    slower = regressions(results, baseline, args.threshold)
+    if slower:
+        print(f"Slower than the baseline by more than {args.threshold:.0%}:")
+        for key in slower:
+            print(f"  {key}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Vectorized operations on many boards at once.
+
+A batch of boards is an array of shape (N, 9) with dtype np.int8, where each row is
+a board in the same format as State._board, together with an array of shape (N,)
+holding the Player.value of the player to play in each board."""
+
+import numpy as np
+
+from goblet_gobblers.game import bitboard, symmetry
+from goblet_gobblers.game.state import State, Piece, Player
+
+HAND = -1
+"""The from cell of a move that takes a piece from the player's hand."""
+
+CHUNK_SIZE = 1 << 16
+"""The number of boards processed at once, which bounds the size of the temporary
+arrays."""
+
+_PIECES_BY_PLAYER = {
+    Player.ORANGE: [Piece.ORANGE_BIG, Piece.ORANGE_MEDIUM, Piece.ORANGE_SMALL],
+    Player.BLUE: [Piece.BLUE_BIG, Piece.BLUE_MEDIUM, Piece.BLUE_SMALL],
+}
+
+
+def _shared_tables():
+    """Returns the tables that State shares between all instances, creating a State
+    to initialize them if necessary."""
+    if State._cannot_place_pieces is None or State._symmetry_tables is None:
+        State(Player.ORANGE)
+
+    return (
+        State._cannot_place_pieces.astype(np.uint8),
+        State._cannot_move_pieces.astype(np.uint8),
+        State._symmetry_tables,
+    )
+
+
+def _move_columns():
+    """Returns the moves that valid_moves can generate, in the order it generates
+    them, as the arrays (slot, from_cell, to_cell). Slot is the index of the piece
+    in the list of the player's pieces."""
+    slots = []
+    from_cells = []
+    to_cells = []
+
+    # Moves from the hand
+    for slot in range(3):
+        for to_cell in range(9):
+            slots.append(slot)
+            from_cells.append(HAND)
+            to_cells.append(to_cell)
+
+    # Moves on the board
+    for from_cell in range(9):
+        for slot in range(3):
+            for to_cell in range(9):
+                if to_cell != from_cell:
+                    slots.append(slot)
+                    from_cells.append(from_cell)
+                    to_cells.append(to_cell)
+
+    return (
+        np.array(slots, dtype=np.int8),
+        np.array(from_cells, dtype=np.int8),
+        np.array(to_cells, dtype=np.int8),
+    )
+
+
+_SLOTS, _FROM_CELLS, _TO_CELLS = _move_columns()
+_HAND_COLUMNS = _FROM_CELLS == HAND
+
+_PLAYER_VALUE_OF_OWNER = np.array(
+    [0, Player.ORANGE.value, Player.BLUE.value], dtype=np.int8
+)
+
+
+def player_pieces(to_play: np.ndarray) -> np.ndarray:
+    """Returns an array of shape (N, 3) with the values of the big, medium and small
+    piece of the player to play."""
+    orange = np.array([p.value for p in _PIECES_BY_PLAYER[Player.ORANGE]], np.uint8)
+    blue = np.array([p.value for p in _PIECES_BY_PLAYER[Player.BLUE]], np.uint8)
+    return np.where((to_play == Player.ORANGE.value)[:, None], orange, blue)
+
+
+def valid_moves(boards: np.ndarray, to_play: np.ndarray):
+    """Returns all valid moves in a batch of boards. The moves are returned as the
+    arrays (parent, piece, from_cell, to_cell), where parent is the row of the
+    board, piece is the Piece.value of the piece moved, from_cell is 3 * row + col
+    of the square the piece is moved from or HAND and to_cell is the square the
+    piece is moved to. The moves of each board are in the same order as
+    State.valid_moves returns them."""
+
+    results = []
+    for start in range(0, len(boards), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        results.append(_valid_moves(boards[start:stop], to_play[start:stop], start))
+
+    if not results:
+        results.append(_valid_moves(boards, to_play, 0))
+
+    return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+
+def _valid_moves(boards: np.ndarray, to_play: np.ndarray, offset: int):
+    cannot_place, cannot_move, _ = _shared_tables()
+    boards = boards.view(np.uint8)
+    pieces = player_pieces(to_play)
+
+    # Find the squares each piece can be put on and moved off of.
+    can_place = np.empty(shape=(len(boards), 3, 9), dtype=bool)
+    can_move = np.empty(shape=(len(boards), 3, 9), dtype=bool)
+    in_hand = np.empty(shape=(len(boards), 3), dtype=bool)
+    for slot in range(3):
+        piece = pieces[:, slot, None]
+        on_board = (boards & piece) != 0
+        can_place[:, slot] = (boards & cannot_place[piece]) == 0
+        can_move[:, slot] = on_board & ((boards & cannot_move[piece]) == 0)
+        in_hand[:, slot] = on_board.sum(axis=1) < 2
+
+    # Check each possible move
+    allowed = can_place[:, _SLOTS, _TO_CELLS]
+    allowed[:, _HAND_COLUMNS] &= in_hand[:, _SLOTS[_HAND_COLUMNS]]
+    allowed[:, ~_HAND_COLUMNS] &= can_move[
+        :, _SLOTS[~_HAND_COLUMNS], _FROM_CELLS[~_HAND_COLUMNS]
+    ]
+
+    parent, column = np.nonzero(allowed)
+    return (
+        parent + offset,
+        pieces[parent, _SLOTS[column]].view(np.int8),
+        _FROM_CELLS[column],
+        _TO_CELLS[column],
+    )
+
+
+def is_win(boards: np.ndarray, to_play: np.ndarray) -> np.ndarray:
+    """Checks a batch of boards for wins. Returns an array with dtype np.int8 that
+    holds the Player.value of the winner of each board, or 0 if nobody has won. As
+    in State.is_win, if both players have a line then the player who just played
+    wins."""
+
+    # Look up the owner of each square and then the winner of the owner pattern.
+    owner = bitboard.OWNER_OF_VALUE[boards.view(np.uint8)]
+    pattern = owner @ bitboard.TERNARY_DIGITS
+    winner = bitboard.WINNER_OF_PATTERN[
+        (to_play == Player.BLUE.value).astype(np.intp), pattern
+    ]
+
+    return _PLAYER_VALUE_OF_OWNER[winner]
+
+
+def play(
+    boards: np.ndarray,
+    to_play: np.ndarray,
+    parent: np.ndarray,
+    piece: np.ndarray,
+    from_cell: np.ndarray,
+    to_cell: np.ndarray,
+):
+    """Plays moves in the format returned by valid_moves. Returns the arrays
+    (children, next_to_play) with one row per move. The child boards are not
+    cannonical, see canonical_keys."""
+
+    rows = np.arange(len(parent))
+    children = boards[parent]
+
+    from_board = from_cell != HAND
+    children[rows[from_board], from_cell[from_board]] &= ~piece[from_board]
+    children[rows, to_cell] |= piece
+
+    next_to_play = np.where(
+        to_play[parent] == Player.ORANGE.value, Player.BLUE.value, Player.ORANGE.value
+    ).astype(np.int8)
+
+    return children, next_to_play
+
+
+def canonical_keys(boards: np.ndarray) -> np.ndarray:
+    """Returns the keys of the cannonical boards equivalent to a batch of boards, as
+    an array with dtype np.uint64. See the symmetry module for the key format."""
+    _, _, tables = _shared_tables()
+    values = boards.view(np.uint8)
+
+    keys = np.zeros(len(boards), dtype=np.uint64)
+    for s in range(len(tables.symmetries)):
+        image = tables.images[s, 0, values[:, 0]]
+        for cell in range(1, 9):
+            image |= tables.images[s, cell, values[:, cell]]
+        np.maximum(keys, image, out=keys)
+
+    return keys
+
+
+def boards_from_keys(keys: np.ndarray) -> np.ndarray:
+    """Converts an array of keys back to a batch of boards."""
+    shifts = np.array(symmetry.SHIFTS, dtype=np.uint64)
+    return ((keys[:, None] >> shifts) & np.uint64(symmetry.CELL_MASK)).astype(np.int8)
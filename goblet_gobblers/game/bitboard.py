@@ -0,0 +1,178 @@
+"""Bitboard helpers for the board representation.
+
+A board is stored as six planes, one for each piece. Each plane is a 9-bit mask
+with bit 3 * row + col set if the piece is in that square. The planes are indexed
+in the order given by PIECE_VALUES, i.e., the orange pieces from small to big and
+then the blue pieces from small to big, so plane i holds a piece of size i % 3 that
+belongs to player i // 3."""
+
+import numpy as np
+
+FULL = 0x1FF
+"""A mask with every square set."""
+
+PIECE_VALUES = (0x01, 0x02, 0x04, 0x10, 0x20, 0x40)
+"""The value of the Piece stored in each plane."""
+
+PLANE_OF_VALUE = {value: i for i, value in enumerate(PIECE_VALUES)}
+"""Maps a Piece value to its plane."""
+
+ORANGE = 0
+BLUE = 1
+
+NOBODY = 0
+"""The owner of an empty square. A square owned by a player has owner player + 1."""
+
+SMALL = 0
+MEDIUM = 1
+BIG = 2
+
+WIN_MASKS = (
+    # Diagonals
+    0b100010001,
+    0b001010100,
+    # Rows
+    0b000000111,
+    0b000111000,
+    0b111000000,
+    # Columns
+    0b001001001,
+    0b010010010,
+    0b100100100,
+)
+"""The squares of each line of three."""
+
+CELLS_OF_MASK = tuple(
+    tuple(cell for cell in range(9) if mask & (1 << cell)) for mask in range(FULL + 1)
+)
+"""For each mask, the squares that are set, in increasing order."""
+
+_HAS_LINE = tuple(
+    any(mask & line == line for line in WIN_MASKS) for mask in range(FULL + 1)
+)
+
+# For each square value, the planes it contributes to, packed nine bits per plane.
+_PACKED_PLANES_OF_VALUE = tuple(
+    sum(1 << (9 * i) for i, piece in enumerate(PIECE_VALUES) if value & piece)
+    for value in range(128)
+)
+
+
+TERNARY_DIGITS = 3 ** np.arange(9)
+"""The value of each square in an owner pattern. An owner pattern is the base three
+number whose digit for each square is the owner of the square."""
+
+TERNARY_OF_MASK = tuple(
+    sum(3**cell for cell in CELLS_OF_MASK[mask]) for mask in range(FULL + 1)
+)
+"""The owner pattern with a one digit for each square set in the mask."""
+
+
+def _create_owner_of_value() -> np.ndarray:
+    values = np.arange(128, dtype=np.uint8)
+    big = values & 0x44
+    medium = values & 0x22
+    small = values & 0x11
+    top = np.where(big != 0, big, np.where(medium != 0, medium, small))
+
+    owner = np.full(128, NOBODY, dtype=np.uint8)
+    owner[(top & 0x07) != 0] = ORANGE + 1
+    owner[(top & 0x70) != 0] = BLUE + 1
+    return owner
+
+
+def _create_winner_of_pattern() -> np.ndarray:
+    patterns = np.arange(3**9)
+    digits = (patterns[:, None] // TERNARY_DIGITS) % 3
+    lines = np.array([CELLS_OF_MASK[line] for line in WIN_MASKS])
+
+    winner = np.full(shape=(2, 3**9), fill_value=NOBODY, dtype=np.uint8)
+    orange_win = np.all(digits[:, lines] == ORANGE + 1, axis=2).any(axis=1)
+    blue_win = np.all(digits[:, lines] == BLUE + 1, axis=2).any(axis=1)
+    winner[:, orange_win] = ORANGE + 1
+    winner[:, blue_win] = BLUE + 1
+
+    # If both players have a line the player who just played wins.
+    both = orange_win & blue_win
+    winner[ORANGE, both] = BLUE + 1
+    winner[BLUE, both] = ORANGE + 1
+    return winner
+
+
+OWNER_OF_VALUE = _create_owner_of_value()
+"""The owner of a square, indexed by the value of the square in a board."""
+
+WINNER_OF_PATTERN = _create_winner_of_pattern()
+"""Indexed by the player to play and an owner pattern. The winner, as an owner, or
+NOBODY if nobody has won."""
+
+_WINNER_OF_PATTERN = WINNER_OF_PATTERN.tolist()
+
+
+def planes_from_board(board: np.ndarray) -> tuple:
+    """Converts a board stored as an array of nine piece values into planes."""
+    return planes_from_values(board.tolist())
+
+
+def planes_from_values(values) -> tuple:
+    """Converts the nine piece values of a board, given as any iterable of integers
+    from square 0 to square 8, into planes."""
+    packed = 0
+    for cell, value in enumerate(values):
+        packed |= _PACKED_PLANES_OF_VALUE[value] << cell
+
+    return tuple((packed >> (9 * i)) & FULL for i in range(6))
+
+
+def board_from_planes(planes: tuple) -> np.ndarray:
+    """Converts planes back into a board stored as an array of nine piece values."""
+    board = np.zeros(shape=9, dtype=np.int8)
+    for plane, value in zip(planes, PIECE_VALUES):
+        for cell in CELLS_OF_MASK[plane]:
+            board[cell] |= value
+
+    return board
+
+
+def covering_masks(planes: tuple) -> tuple:
+    """Returns, for each size, the squares that hold a piece of that size or larger.
+    A piece of a given size can only be put on squares outside of the mask for its
+    size."""
+    big = planes[BIG] | planes[3 + BIG]
+    medium = big | planes[MEDIUM] | planes[3 + MEDIUM]
+    small = medium | planes[SMALL] | planes[3 + SMALL]
+    return (small, medium, big)
+
+
+def top_masks(planes: tuple) -> tuple:
+    """Returns, for each plane, the squares where the piece is visible, i.e., is not
+    covered by a larger piece."""
+    big = planes[BIG] | planes[3 + BIG]
+    medium = planes[MEDIUM] | planes[3 + MEDIUM]
+    return (
+        planes[SMALL] & ~(big | medium),
+        planes[MEDIUM] & ~big,
+        planes[BIG],
+        planes[3 + SMALL] & ~(big | medium),
+        planes[3 + MEDIUM] & ~big,
+        planes[3 + BIG],
+    )
+
+
+def owner_masks(planes: tuple) -> tuple:
+    """Returns the squares owned by orange and by blue. A square is owned by the
+    player whose piece is on top."""
+    tops = top_masks(planes)
+    return (tops[0] | tops[1] | tops[2], tops[3] | tops[4] | tops[5])
+
+
+def winner(planes: tuple, to_play: int) -> int:
+    """Returns the winner, as an owner, or NOBODY if nobody has won."""
+    orange, blue = owner_masks(planes)
+    pattern = TERNARY_OF_MASK[orange] + 2 * TERNARY_OF_MASK[blue]
+    return _WINNER_OF_PATTERN[to_play][pattern]
+
+
+def has_line(mask: int) -> bool:
+    """Checks if the squares in the mask contain a line of three."""
+    return _HAS_LINE[mask]
@@ -0,0 +1,133 @@
+"""Moves packed into small integers.
+
+A move is stored as an integer with the plane of the piece, see the bitboard module,
+in bits 8 to 10, the from square plus one in bits 4 to 7, or zero for a piece taken
+from the player's hand, and the to square in bits 0 to 3. Every move fits in an
+unsigned 16-bit integer, so a MoveList keeps them in an array that is allocated
+once and then refilled, e.g., once per ply of a search.
+
+State.valid_moves returns moves as tuples (Piece, from_row, from_col, to_row,
+to_col), and to_tuple and from_tuple convert between the two forms."""
+
+from array import array
+
+from goblet_gobblers.game import bitboard
+from goblet_gobblers.game.state import Piece
+
+HAND = -1
+"""The from cell of a move that takes a piece from the player's hand."""
+
+TYPECODE = "H"
+"""The array typecode of a move."""
+
+MAX_MOVES = 3 * 9 + 6 * 8
+"""More than the number of moves in any position: each of the three sizes can be
+put on at most nine squares from the hand, and at most six pieces are on top of a
+square with eight squares to move to."""
+
+
+def encode_move(plane: int, from_cell: int, to_cell: int) -> int:
+    """Packs a move into an integer. plane is the index of the piece in
+    bitboard.PIECE_VALUES and from_cell is HAND for pieces taken from the hand."""
+    return (plane << 8) | ((from_cell + 1) << 4) | to_cell
+
+
+def decode_move(move: int) -> tuple[int, int, int]:
+    """Returns (plane, from_cell, to_cell) for a move."""
+    return DECODED[move]
+
+
+_DECODED_BY_MOVE = {
+    encode_move(plane, from_cell, to_cell): (plane, from_cell, to_cell)
+    for plane in range(6)
+    for from_cell in range(HAND, 9)
+    for to_cell in range(9)
+}
+
+DECODED = tuple(_DECODED_BY_MOVE.get(move) for move in range(max(_DECODED_BY_MOVE) + 1))
+"""decode_move as a tuple indexed by the move, for loops where the cost of the call
+matters."""
+
+
+def image(move: int, permutation: list) -> int:
+    """Returns the same move on an equivalent board, where permutation is the
+    symmetry that gives the equivalent board, see State.symmetries."""
+    plane, from_cell, to_cell = DECODED[move]
+    if from_cell != HAND:
+        from_cell = permutation.index(from_cell)
+    return encode_move(plane, from_cell, permutation.index(to_cell))
+
+
+def to_tuple(move: int) -> tuple:
+    """Converts a move to the format of State.valid_moves."""
+    plane, from_cell, to_cell = DECODED[move]
+    piece = Piece(bitboard.PIECE_VALUES[plane])
+    if from_cell == HAND:
+        return (piece, None, None, to_cell // 3, to_cell % 3)
+
+    return (piece, from_cell // 3, from_cell % 3, to_cell // 3, to_cell % 3)
+
+
+def from_tuple(move: tuple) -> int:
+    """Converts a move in the format of State.valid_moves."""
+    piece, from_row, from_col, to_row, to_col = move
+    from_cell = HAND if from_row is None else 3 * from_row + from_col
+    return encode_move(
+        bitboard.PLANE_OF_VALUE[piece.value], from_cell, 3 * to_row + to_col
+    )
+
+
+class MoveList:
+    """A list of moves kept in a preallocated array. clear() only resets the
+    length, so filling the same MoveList again doesn't allocate memory."""
+
+    __slots__ = ("buffer", "count")
+
+    buffer: array
+    """The moves, in the first count entries."""
+
+    count: int
+
+    def __init__(self, capacity: int = MAX_MOVES):
+        self.buffer = array(TYPECODE, bytes(2 * capacity))
+        self.count = 0
+
+    def clear(self):
+        self.count = 0
+
+    def append(self, move: int):
+        self.buffer[self.count] = move
+        self.count += 1
+
+    def extend(self, moves: array):
+        """Appends the moves in an array with the same typecode."""
+        start = self.count
+        self.count = start + len(moves)
+        self.buffer[start : self.count] = moves
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> int:
+        if not -self.count <= i < self.count:
+            raise IndexError("move index out of range")
+        return self.buffer[i % self.count]
+
+    def __iter__(self):
+        buffer = self.buffer
+        for i in range(self.count):
+            yield buffer[i]
+
+    def __contains__(self, move: int) -> bool:
+        # Search the buffer in place, since a slice or a list would be a new object.
+        try:
+            self.buffer.index(move, 0, self.count)
+        except ValueError:
+            return False
+        return True
+
+    def tolist(self) -> list[int]:
+        return self.buffer[: self.count].tolist()
+
+    def __repr__(self):
+        return f"MoveList({self.tolist()})"
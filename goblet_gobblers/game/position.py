@@ -0,0 +1,293 @@
+"""A mutable position for depth first search.
+
+State is immutable and every call to State.play() builds a new object. Position
+instead changes a single board in place with make_move() and puts it back with
+unmake_move(), so a search can walk the game tree without creating an object per
+node. The board is not canonicalized after each move, so all moves of a Position
+are relative to the board it was created from.
+
+Moves are small integers, see the moves module. The moves of a position are taken
+from tables built when the module is loaded, so generating them doesn't create new
+objects either."""
+
+from array import array
+
+from goblet_gobblers.game import bitboard, symmetry, zobrist
+from goblet_gobblers.game.moves import (
+    DECODED,
+    HAND,
+    TYPECODE,
+    MoveList,
+    decode_move,
+    encode_move,
+    from_tuple,
+    image,
+    to_tuple,
+)
+from goblet_gobblers.game.state import State, Player
+
+# For each plane and set of target squares, the moves from the hand.
+_HAND_MOVES = tuple(
+    tuple(
+        tuple(encode_move(plane, HAND, cell) for cell in bitboard.CELLS_OF_MASK[mask])
+        for mask in range(bitboard.FULL + 1)
+    )
+    for plane in range(6)
+)
+
+# For each plane, from square and set of target squares, the moves on the board.
+_BOARD_MOVES = tuple(
+    tuple(
+        tuple(
+            tuple(
+                encode_move(plane, from_cell, cell)
+                for cell in bitboard.CELLS_OF_MASK[mask]
+                if cell != from_cell
+            )
+            for mask in range(bitboard.FULL + 1)
+        )
+        for from_cell in range(9)
+    )
+    for plane in range(6)
+)
+
+# The same tables as arrays, for filling a MoveList.
+_HAND_ARRAYS = tuple(
+    tuple(array(TYPECODE, moves) for moves in by_mask) for by_mask in _HAND_MOVES
+)
+_BOARD_ARRAYS = tuple(
+    tuple(tuple(array(TYPECODE, moves) for moves in by_mask) for by_mask in by_cell)
+    for by_cell in _BOARD_MOVES
+)
+
+# The planes of each player's pieces, biggest first, in the order of
+# State.valid_moves.
+_PLAYER_PLANES = (
+    (bitboard.BIG, bitboard.MEDIUM, bitboard.SMALL),
+    (3 + bitboard.BIG, 3 + bitboard.MEDIUM, 3 + bitboard.SMALL),
+)
+
+_PLAYERS = (Player.ORANGE, Player.BLUE)
+
+
+class Position:
+    _planes: list
+    """The board as six bitboards, see the bitboard module."""
+
+    _player: int
+    """The player to play, bitboard.ORANGE or bitboard.BLUE."""
+
+    _images: int
+    """The keys of the eight boards equivalent to the board, packed into one integer
+    as returned by SymmetryTables.packed_images. They are updated with each move,
+    so the cannonical board is always known without canonicalizing."""
+
+    _zobrist: list
+    """The Zobrist keys of the boards equivalent to this one, in symmetry order."""
+
+    _undo: list
+    """The moves played so far, most recent last."""
+
+    def __init__(self, state: State = None):
+        """Creates a position with the same board as a State, by default the empty
+        board with orange to play."""
+        if state is None:
+            state = State(Player.ORANGE, pieces=[])
+
+        self._symmetry_tables = state._symmetry_tables
+        self._zobrist_tables = state._zobrist_tables
+
+        self._planes = list(state._planes)
+        self._player = (
+            bitboard.ORANGE if state.to_play == Player.ORANGE else bitboard.BLUE
+        )
+        self._images = self._symmetry_tables.packed_images(state._key)
+        self._zobrist = list(state.zobrist_keys())
+        self._undo = []
+
+    @property
+    def to_play(self) -> Player:
+        return _PLAYERS[self._player]
+
+    @property
+    def _board_key(self) -> int:
+        """The board packed into a key, see the symmetry module. This is not the key
+        of the cannonical board. The first symmetry is the identity, so this is the
+        first lane of _images."""
+        return self._images & symmetry.LANE_MASK
+
+    @property
+    def ply(self) -> int:
+        """The number of moves made since the position was created."""
+        return len(self._undo)
+
+    def valid_moves(self, moves: MoveList = None):
+        """Returns all valid moves, in the same order as State.valid_moves. If moves
+        is given the moves are put in it instead of in a new list."""
+        planes = self._planes
+        covering = bitboard.covering_masks(planes)
+        tops = bitboard.top_masks(planes)
+        player_planes = _PLAYER_PLANES[self._player]
+
+        if moves is None:
+            moves = []
+            hand_moves = _HAND_MOVES
+            board_moves = _BOARD_MOVES
+        else:
+            moves.clear()
+            hand_moves = _HAND_ARRAYS
+            board_moves = _BOARD_ARRAYS
+
+        # Moving pieces from the players hand onto the board
+        for plane in player_planes:
+            if planes[plane].bit_count() < 2:
+                targets = bitboard.FULL & ~covering[plane % 3]
+                moves.extend(hand_moves[plane][targets])
+
+        # Moving pieces that aren't covered to another square
+        for from_cell in range(9):
+            from_bit = 1 << from_cell
+            for plane in player_planes:
+                if tops[plane] & from_bit:
+                    targets = bitboard.FULL & ~covering[plane % 3]
+                    moves.extend(board_moves[plane][from_cell][targets])
+
+        return moves
+
+    def stabilizer(self) -> list[int]:
+        """Returns the symmetries that leave the board unchanged. The identity,
+        symmetry 0, is always one of them."""
+        keys = self._symmetry_tables.unpack_images(self._images)
+        return [s for s, key in enumerate(keys) if key == keys[0]]
+
+    def distinct_moves(self, first: int = None) -> list[tuple[int, int]]:
+        """Returns one move for each distinct cannonical child as (move, count),
+        where count is the number of valid moves that reach the child. The moves
+        are in the order of valid_moves, except that first, if it is a valid move,
+        comes first.
+
+        Moves that are the same up to a symmetry in the stabilizer reach the same
+        child, so only one move of each such group is played to find its child.
+        Moves in different groups can still reach equivalent children, e.g., when
+        the child is more symmetric than the board, so the children are also
+        compared by key."""
+        moves = self.valid_moves()
+        if first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+
+        permutations = [
+            self._symmetry_tables.symmetries[s] for s in self.stabilizer()[1:]
+        ]
+
+        result = []
+        index_of_child = {}
+        grouped = set()
+        for move in moves:
+            if move in grouped:
+                continue
+
+            group = {move}
+            for permutation in permutations:
+                group.add(image(move, permutation))
+            grouped.update(group)
+
+            self.make_move(move)
+            child = self.key()
+            self.unmake_move()
+
+            i = index_of_child.get(child)
+            if i is None:
+                index_of_child[child] = len(result)
+                result.append((move, len(group)))
+            else:
+                result[i] = (result[i][0], result[i][1] + len(group))
+
+        return result
+
+    def make_move(self, move: int):
+        """Plays a move and switches the player to play."""
+        self._apply(move)
+        self._undo.append(move)
+
+    def unmake_move(self) -> int:
+        """Takes back the last move and returns it."""
+        move = self._undo.pop()
+        self._apply(move)
+        return move
+
+    def _apply(self, move: int):
+        # Moving the piece and moving it back flip the same bits, so this both makes
+        # and unmakes a move.
+        plane, from_cell, to_cell = DECODED[move]
+        value = bitboard.PIECE_VALUES[plane]
+        lanes = self._symmetry_tables.lanes
+        zobrist_keys = self._zobrist_tables.keys
+
+        self._planes[plane] ^= 1 << to_cell
+        self._images ^= lanes[to_cell][value]
+        for s in range(8):
+            self._zobrist[s] ^= zobrist.SIDE ^ zobrist_keys[s][to_cell][plane]
+
+        if from_cell != HAND:
+            self._planes[plane] ^= 1 << from_cell
+            self._images ^= lanes[from_cell][value]
+            for s in range(8):
+                self._zobrist[s] ^= zobrist_keys[s][from_cell][plane]
+
+        self._player ^= 1
+
+    def winner(self) -> int:
+        """Returns the winner as a bitboard owner, i.e., bitboard.NOBODY,
+        bitboard.ORANGE + 1 or bitboard.BLUE + 1."""
+        return bitboard.winner(self._planes, self._player)
+
+    def is_win(self) -> Player:
+        """Returns the winner, or None if nobody has won. See State.is_win."""
+        winner = self.winner()
+        return None if winner == bitboard.NOBODY else _PLAYERS[winner - 1]
+
+    def covers(self, move: int) -> bool:
+        """Checks if a move puts a piece on top of another piece."""
+        _, _, to_cell = DECODED[move]
+        size_masks = bitboard.covering_masks(self._planes)
+        return size_masks[bitboard.SMALL] & (1 << to_cell) != 0
+
+    def zobrist_hash(self) -> int:
+        """Returns the same hash as State.zobrist_hash for the position."""
+        return min(self._zobrist)
+
+    def canonical_symmetry(self) -> int:
+        """Returns the index of the symmetry whose Zobrist key is the hash."""
+        return self._zobrist.index(min(self._zobrist))
+
+    def key(self) -> int:
+        """Returns the same key as State.key for the position."""
+        key, _ = self._symmetry_tables.canonical_image(self._images)
+        if self._player == bitboard.BLUE:
+            key |= symmetry.TO_PLAY_BIT
+        return key
+
+    def to_state(self) -> State:
+        key, _ = self._symmetry_tables.canonical_image(self._images)
+        return State(self.to_play, board_key=key)
+
+    def move_to_tuple(self, move: int) -> tuple:
+        """Converts a move to the format of State.valid_moves."""
+        return to_tuple(move)
+
+    def move_from_tuple(self, move: tuple) -> int:
+        """Converts a move in the format of State.valid_moves."""
+        return from_tuple(move)
+
+    def move_to_symmetry(self, move: int, s: int) -> int:
+        """Converts a move on this board to the same move on equivalent board s."""
+        return image(move, self._symmetry_tables.symmetries[s])
+
+    def move_from_symmetry(self, move: int, s: int) -> int:
+        """Converts a move on equivalent board s to the same move on this board."""
+        plane, from_cell, to_cell = DECODED[move]
+        permutation = self._symmetry_tables.symmetries[s]
+        if from_cell != HAND:
+            from_cell = permutation[from_cell]
+        return encode_move(plane, from_cell, permutation[to_cell])
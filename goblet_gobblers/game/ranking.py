@@ -0,0 +1,183 @@
+"""A numbering of the positions by consecutive integers.
+
+The pieces of one size form a layer, which is a pair of orange and blue masks with
+at most two squares each and no square in common, since each player has two of
+each piece and pieces of the same size can't be stacked. There are LAYER_COUNT
+such layers, and a board is a small, a medium and a big layer.
+
+The eight symmetries of the board are used to shrink the big layer: a board is
+turned so that its big layer is the representative of its orbit under the
+symmetries, and if several symmetries do that the one with the smallest rank is
+used. The rank of a position is then
+
+    ((big orbit * LAYER_COUNT + medium layer) * LAYER_COUNT + small layer) * 2
+    + 1 if blue is to play
+
+which is less than RANK_COUNT. Equivalent positions have the same rank and
+unrank(rank(state)) == state. Not every integer less than RANK_COUNT is the rank
+of a position, since boards whose big layer is symmetric can be turned into
+several boards with the same big layer."""
+
+import itertools
+
+import numpy as np
+
+from goblet_gobblers.game import bitboard
+from goblet_gobblers.game.state import State, Player
+
+
+def _create_layers() -> np.ndarray:
+    masks = [mask for mask in range(bitboard.FULL + 1) if bin(mask).count("1") <= 2]
+    return np.array(
+        [
+            (orange, blue)
+            for orange, blue in itertools.product(masks, masks)
+            if orange & blue == 0
+        ],
+        dtype=np.int16,
+    )
+
+
+LAYERS = _create_layers()
+"""The (orange mask, blue mask) of each layer, indexed by layer number."""
+
+LAYER_COUNT = len(LAYERS)
+
+# The layer number of orange mask * 512 + blue mask, or -1 if it isn't a layer.
+_LAYER_OF_MASKS = np.full((bitboard.FULL + 1) ** 2, -1, dtype=np.int32)
+_LAYER_OF_MASKS[LAYERS[:, 0].astype(np.int32) * (bitboard.FULL + 1) + LAYERS[:, 1]] = (
+    np.arange(LAYER_COUNT)
+)
+
+
+def _create_mask_images() -> np.ndarray:
+    """Returns an array where images[s][mask] is the mask of the board given by
+    symmetry s, see State.symmetries."""
+    if State.symmetries is None:
+        State(Player.ORANGE)
+
+    masks = np.arange(bitboard.FULL + 1)
+    images = np.zeros(shape=(len(State.symmetries), len(masks)), dtype=np.int32)
+    for s, symmetry in enumerate(State.symmetries):
+        for target, source in enumerate(symmetry):
+            images[s] |= ((masks >> source) & 1) << target
+
+    return images
+
+
+_MASK_IMAGES = _create_mask_images()
+
+
+def _layer_images(orange: np.ndarray, blue: np.ndarray) -> np.ndarray:
+    """Returns an array of shape (8, N) with the layer number of each layer under
+    each symmetry."""
+    return _LAYER_OF_MASKS[
+        _MASK_IMAGES[:, orange] * (bitboard.FULL + 1) + _MASK_IMAGES[:, blue]
+    ]
+
+
+_REPRESENTATIVE = _layer_images(LAYERS[:, 0], LAYERS[:, 1]).min(axis=0)
+"""The layer number of the representative of the orbit of each layer."""
+
+BIG_ORBITS = np.unique(_REPRESENTATIVE)
+"""The layer numbers of the representatives of the big layers."""
+
+_ORBIT_OF_LAYER = np.full(LAYER_COUNT, -1, dtype=np.int64)
+_ORBIT_OF_LAYER[BIG_ORBITS] = np.arange(len(BIG_ORBITS))
+
+RANK_COUNT = len(BIG_ORBITS) * LAYER_COUNT * LAYER_COUNT * 2
+"""The ranks are less than this."""
+
+
+def rank_boards(boards: np.ndarray, to_play: np.ndarray) -> np.ndarray:
+    """Returns the ranks of a batch of boards, see the batch module, as an array with
+    dtype np.int64."""
+    boards = boards.view(np.uint8)
+    bits = 1 << np.arange(9)
+    planes = [((boards & value) != 0) @ bits for value in bitboard.PIECE_VALUES]
+
+    small = _layer_images(planes[bitboard.SMALL], planes[3 + bitboard.SMALL])
+    medium = _layer_images(planes[bitboard.MEDIUM], planes[3 + bitboard.MEDIUM])
+    big = _layer_images(planes[bitboard.BIG], planes[3 + bitboard.BIG])
+    if np.any(big < 0) or np.any(medium < 0) or np.any(small < 0):
+        raise ValueError("A board has more than two of a piece or a stacked size")
+
+    # Use the symmetries that turn the big layer into its representative, and pick
+    # the one with the smallest rank.
+    representative = _REPRESENTATIVE[big[0]]
+    rest = np.where(
+        big == representative,
+        medium.astype(np.int64) * LAYER_COUNT + small,
+        LAYER_COUNT * LAYER_COUNT,
+    ).min(axis=0)
+
+    blue = (to_play == Player.BLUE.value).astype(np.int64)
+    return (
+        _ORBIT_OF_LAYER[representative] * LAYER_COUNT * LAYER_COUNT + rest
+    ) * 2 + blue
+
+
+# The tables used by rank, as lists, since indexing NumPy arrays one element at a
+# time is slow.
+_LAYER_OF_MASKS_LIST = _LAYER_OF_MASKS.tolist()
+_MASK_IMAGES_LIST = _MASK_IMAGES.tolist()
+_ORBIT_OF_LAYER_LIST = _ORBIT_OF_LAYER.tolist()
+
+
+def rank(state: State) -> int:
+    """Returns the rank of a position. This is rank_boards for one position, without
+    the cost of building arrays."""
+    planes = state._planes
+    layer_of = _LAYER_OF_MASKS_LIST
+    scale = bitboard.FULL + 1
+    orange_big, blue_big = planes[bitboard.BIG], planes[3 + bitboard.BIG]
+    orange_medium, blue_medium = planes[bitboard.MEDIUM], planes[3 + bitboard.MEDIUM]
+    orange_small, blue_small = planes[bitboard.SMALL], planes[3 + bitboard.SMALL]
+
+    # As in rank_boards, use the symmetry that turns the big layer into its
+    # representative with the smallest rank.
+    best = None
+    for images in _MASK_IMAGES_LIST:
+        big = layer_of[images[orange_big] * scale + images[blue_big]]
+        if best is not None and big > best[0]:
+            continue
+
+        layers = (
+            big,
+            layer_of[images[orange_medium] * scale + images[blue_medium]],
+            layer_of[images[orange_small] * scale + images[blue_small]],
+        )
+        if best is None or layers < best:
+            best = layers
+
+    # A board that isn't a layer under one symmetry isn't a layer under any.
+    if min(best) < 0:
+        raise ValueError("A board has more than two of a piece or a stacked size")
+
+    big, medium, small = best
+    blue = 1 if state.to_play == Player.BLUE else 0
+    return (
+        (_ORBIT_OF_LAYER_LIST[big] * LAYER_COUNT + medium) * LAYER_COUNT + small
+    ) * 2 + blue
+
+
+def unrank(index: int) -> State:
+    """Returns the position with the given rank."""
+    if not 0 <= index < RANK_COUNT:
+        raise ValueError(f"Rank {index} is not less than {RANK_COUNT}")
+
+    to_play = Player.BLUE if index & 1 else Player.ORANGE
+    index >>= 1
+    big = BIG_ORBITS[index // (LAYER_COUNT * LAYER_COUNT)]
+    medium = index // LAYER_COUNT % LAYER_COUNT
+    small = index % LAYER_COUNT
+
+    planes = [0] * 6
+    for size, layer in [
+        (bitboard.SMALL, small),
+        (bitboard.MEDIUM, medium),
+        (bitboard.BIG, big),
+    ]:
+        planes[size], planes[3 + size] = LAYERS[layer].tolist()
+
+    return State(to_play, initial_board=bitboard.board_from_planes(tuple(planes)))
@@ -4,6 +4,9 @@ from enum import Enum
 
 import numpy as np
 import copy
+import weakref
+
+from goblet_gobblers.game import bitboard, symmetry, zobrist
 
 
 class Piece(Enum):
@@ -25,60 +28,124 @@ class Source(Enum):
     BLUE = 0x70
 
 
+_PLAYER_OF_OWNER = (None, Player.ORANGE, Player.BLUE)
+
+
+_interned = weakref.WeakValueDictionary()
+"""The interned States, by key. See State.intern()."""
+
+
 class State:
-    _board: np.ndarray
-    """The board. This is an array of size nine, one for each square of the board. The array is np.int8, with
-    each the first six bits of the value indicating if the given piece is in the square. The bit to piece mapping 
-    is given by the Pieces enum."""
+    """A position of the game. States are immutable and only store the player to
+    play and the packed cannonical board, plus caches that are filled the first time
+    they are needed, so a State takes a few tens of bytes. Everything that only
+    depends on the rules is stored at class level and shared by all instances."""
+
+    __slots__ = ("to_play", "_key", "_zobrist", "_plane_cache", "__weakref__")
 
     to_play: Player
     """Which player should play next."""
 
+    _key: int
+    """The board packed into a single integer. See the symmetry module for the
+    layout."""
+
+    _zobrist: tuple
+    """The Zobrist keys of the boards equivalent to _board, in symmetry order, or
+    None if they haven't been needed yet. See the zobrist module."""
+
+    _plane_cache: tuple
+    """The value of _planes, or None if it hasn't been needed yet."""
+
     symmetries = None
 
+    _symmetry_tables: symmetry.SymmetryTables = None
+    """Tables for picking the cannonical board. These are shared by all instances."""
+
+    _zobrist_tables: zobrist.ZobristTables = None
+    """Tables for the Zobrist keys. These are shared by all instances."""
+
     win_indices: list[list[int]] = None
 
     _cannot_place_pieces: np.ndarray = None
+    """Indexed by the value of a Piece. The pieces that stop the piece from being put
+    on a square."""
 
     _cannot_move_pieces: np.ndarray = None
+    """Indexed by the value of a Piece. The pieces that stop the piece from being
+    moved off of a square, i.e., the larger pieces that can cover it."""
 
-    _pieces_by_player: dict = None
+    _pieces_by_player: dict = {
+        Player.BLUE: [Piece.BLUE_BIG, Piece.BLUE_MEDIUM, Piece.BLUE_SMALL],
+        Player.ORANGE: [Piece.ORANGE_BIG, Piece.ORANGE_MEDIUM, Piece.ORANGE_SMALL],
+    }
 
     def __init__(
         self,
         to_play: Player,
         initial_board: np.ndarray = None,
         pieces: list[tuple[int, int, Piece]] = None,
+        zobrist_keys: tuple = None,
+        board_key: int = None,
     ):
+        """Creates a state from a board and a list of pieces to add to it. The board
+        can be given either as an array in initial_board or as a packed key in
+        board_key, see the symmetry module, and defaults to the empty board. If the
+        Zobrist keys of the equivalent boards of the result are known, e.g., in
+        play(), they can be passed in zobrist_keys in symmetry order."""
         self.to_play = to_play
 
-        # Initilize the symmetries, if necessary
-        if self.symmetries == None:
-            self.create_symmetries()
-
-        if initial_board is None:
-            initial_board = np.zeros(shape=9, dtype=np.int8)
+        # Initialize the tables shared by all instances, if necessary.
+        if State._zobrist_tables is None:
+            State._create_tables()
 
-        # Initialize _pieces_by_player
-        self._pieces_by_player = {
-            Player.BLUE: [Piece.BLUE_BIG, Piece.BLUE_MEDIUM, Piece.BLUE_SMALL],
-            Player.ORANGE: [Piece.ORANGE_BIG, Piece.ORANGE_MEDIUM, Piece.ORANGE_SMALL],
-        }
+        if initial_board is not None:
+            board_key = symmetry.pack(initial_board)
+        elif board_key is None:
+            board_key = 0
 
-        # Initialize _cannot_place_pieces
-        self._cannot_place_pieces = np.zeros(
+        # Add the pieces to the board
+        if pieces is not None:
+            for row, col, piece in pieces:
+                board_key |= piece.value << symmetry.SHIFTS[3 * row + col]
+
+        # Check all the boards that equivalent by symmetery and pick the cannonical one,
+        # which is the one with the largest key.
+        self._key, g = self._symmetry_tables.canonical(board_key)
+
+        # The cannonical board is equivalent board g, so the keys of its equivalent
+        # boards are the same keys in a different order.
+        if zobrist_keys is not None:
+            zobrist_keys = zobrist.reorder(
+                zobrist_keys, self._symmetry_tables.compose, g
+            )
+        self._zobrist = zobrist_keys
+        self._plane_cache = None
+
+    @classmethod
+    def _create_tables(cls):
+        """Creates the tables that only depend on the rules. These are shared by all
+        instances."""
+        if State.symmetries is None:
+            State.create_symmetries()
+
+        State._symmetry_tables = symmetry.SymmetryTables(State.symmetries)
+
+        # Initialize _cannot_place_pieces and _cannot_move_pieces. These only depend on
+        # the rules, so they are shared by all instances.
+        State._cannot_place_pieces = np.zeros(
             Player.BLUE.value + Player.ORANGE.value + 1, dtype=np.int8
         )
-        self._cannot_place_pieces[Piece.ORANGE_BIG.value] = (
+        State._cannot_place_pieces[Piece.ORANGE_BIG.value] = (
             Piece.BLUE_BIG.value + Piece.ORANGE_BIG.value
         )
-        self._cannot_place_pieces[Piece.ORANGE_MEDIUM.value] = (
+        State._cannot_place_pieces[Piece.ORANGE_MEDIUM.value] = (
             Piece.BLUE_BIG.value
             + Piece.ORANGE_BIG.value
             + Piece.BLUE_MEDIUM.value
             + Piece.ORANGE_MEDIUM.value
         )
-        self._cannot_place_pieces[Piece.ORANGE_SMALL.value] = (
+        State._cannot_place_pieces[Piece.ORANGE_SMALL.value] = (
             Piece.BLUE_BIG.value
             + Piece.ORANGE_BIG.value
             + Piece.BLUE_MEDIUM.value
@@ -86,16 +153,16 @@ class State:
             + Piece.BLUE_SMALL.value
             + Piece.ORANGE_SMALL.value
         )
-        self._cannot_place_pieces[Piece.BLUE_BIG.value] = (
+        State._cannot_place_pieces[Piece.BLUE_BIG.value] = (
             Piece.BLUE_BIG.value + Piece.ORANGE_BIG.value
         )
-        self._cannot_place_pieces[Piece.BLUE_MEDIUM.value] = (
+        State._cannot_place_pieces[Piece.BLUE_MEDIUM.value] = (
             Piece.BLUE_BIG.value
             + Piece.ORANGE_BIG.value
             + Piece.BLUE_MEDIUM.value
             + Piece.ORANGE_MEDIUM.value
         )
-        self._cannot_place_pieces[Piece.BLUE_SMALL.value] = (
+        State._cannot_place_pieces[Piece.BLUE_SMALL.value] = (
             Piece.BLUE_BIG.value
             + Piece.ORANGE_BIG.value
             + Piece.BLUE_MEDIUM.value
@@ -104,25 +171,24 @@ class State:
             + Piece.ORANGE_SMALL.value
         )
 
-        # Initialize _cannot_move_pieces
-        self._cannot_move_pieces = np.zeros(
+        State._cannot_move_pieces = np.zeros(
             Player.BLUE.value + Player.ORANGE.value + 1, dtype=np.int8
         )
-        self._cannot_move_pieces[Piece.ORANGE_BIG.value] = 0
-        self._cannot_move_pieces[Piece.ORANGE_MEDIUM.value] = (
+        State._cannot_move_pieces[Piece.ORANGE_BIG.value] = 0
+        State._cannot_move_pieces[Piece.ORANGE_MEDIUM.value] = (
             Piece.BLUE_BIG.value + Piece.ORANGE_BIG.value
         )
-        self._cannot_move_pieces[Piece.ORANGE_SMALL.value] = (
+        State._cannot_move_pieces[Piece.ORANGE_SMALL.value] = (
             Piece.BLUE_BIG.value
             + Piece.ORANGE_BIG.value
             + Piece.BLUE_MEDIUM.value
             + Piece.ORANGE_MEDIUM.value
         )
-        self._cannot_move_pieces[Piece.BLUE_BIG.value] = 0
-        self._cannot_move_pieces[Piece.BLUE_MEDIUM.value] = (
+        State._cannot_move_pieces[Piece.BLUE_BIG.value] = 0
+        State._cannot_move_pieces[Piece.BLUE_MEDIUM.value] = (
             Piece.BLUE_BIG.value + Piece.ORANGE_BIG.value
         )
-        self._cannot_move_pieces[Piece.BLUE_SMALL.value] = (
+        State._cannot_move_pieces[Piece.BLUE_SMALL.value] = (
             Piece.BLUE_BIG.value
             + Piece.ORANGE_BIG.value
             + Piece.BLUE_MEDIUM.value
@@ -130,8 +196,8 @@ class State:
         )
 
         # Initialize win_indices, if necessary
-        if self.win_indices == None:
-            self.win_indices = [
+        if State.win_indices is None:
+            State.win_indices = [
                 # Diagonals
                 [3 * 0 + 0, 3 * 1 + 1, 3 * 2 + 2],
                 [3 * 2 + 0, 3 * 1 + 1, 3 * 0 + 2],
@@ -145,33 +211,43 @@ class State:
                 [3 * 0 + 2, 3 * 1 + 2, 3 * 2 + 2],
             ]
 
-        # Add the pieces to the board
-        if pieces is not None:
-            for row, col, piece in pieces:
-                initial_board[3 * row + col] |= piece.value
-
-        # Check all the boards that equivalent by symmetery and pick the cannonical one.
-        # We don't need to create an equivalent board using the identity.
-        equivalent_boards = []
-        equivalent_boards.append(initial_board)
-        for i in range(1, len(self.symmetries)):
-            symmetry = self.symmetries[i]
-
-            equivalent_board = np.zeros(shape=9, dtype=np.int8)
-            for cell in range(9):
-                equivalent_board[cell] = initial_board[symmetry[cell]]
-
-            equivalent_boards.append(equivalent_board)
-
-        largest = None
-        for board in equivalent_boards:
-            if largest is None:
-                largest = board
-            elif self._lexographic_greater_than(board, largest):
-                largest = board
-
-        # Save off the cannonical board
-        self._board = largest
+        State._zobrist_tables = zobrist.ZobristTables(State.symmetries)
+
+    @classmethod
+    def from_key(cls, key: int) -> "State":
+        """Returns the interned State with the given key, see key() and intern()."""
+        state = _interned.get(key)
+        if state is None:
+            to_play = Player.BLUE if key & symmetry.TO_PLAY_BIT else Player.ORANGE
+            state = cls(to_play, board_key=key & ~symmetry.TO_PLAY_BIT).intern()
+
+        return state
+
+    def intern(self) -> "State":
+        """Returns the shared State equal to this one. The first State interned for
+        a position becomes the shared one and later calls for an equal State return
+        it, so a program that keeps many States can intern them to keep one object
+        per position. The shared States are only weakly referenced, so one is freed
+        once nothing else uses it."""
+        return _interned.setdefault(self.key(), self)
+
+    @property
+    def _board(self) -> np.ndarray:
+        """The board. This is an array of size nine, one for each square of the board. The array is np.int8, with
+        each the first six bits of the value indicating if the given piece is in the square. The bit to piece mapping
+        is given by the Pieces enum. A new array is unpacked from _key on each use."""
+        return symmetry.unpack(self._key)
+
+    @property
+    def _planes(self) -> tuple:
+        """The same board as _board stored as six bitboards, one for each piece. See
+        the bitboard module for the layout."""
+        if self._plane_cache is None:
+            self._plane_cache = bitboard.planes_from_values(
+                (self._key >> shift) & symmetry.CELL_MASK for shift in symmetry.SHIFTS
+            )
+
+        return self._plane_cache
 
     def play(
         self, piece: Piece, from_row: int, from_col: int, to_row: int, to_col: int
@@ -186,107 +262,114 @@ class State:
         next_player = Player.ORANGE if self.to_play == Player.BLUE else Player.BLUE
 
         # Create the board for the new state
-        initial_board = self._board.copy()
+        board_key = self._key
 
+        from_cell = None
         if from_row is not None:
-            assert initial_board[3 * from_row + from_col] & piece.value != 0
-            initial_board[3 * from_row + from_col] &= ~piece.value
+            from_cell = 3 * from_row + from_col
+            shift = symmetry.SHIFTS[from_cell]
+            assert (board_key >> shift) & piece.value != 0
+            board_key &= ~(piece.value << shift)
+
+        to_cell = 3 * to_row + to_col
+        board_key |= piece.value << symmetry.SHIFTS[to_cell]
+
+        # Update the Zobrist keys for the moved piece. This is only done if they are
+        # already known, so States that never need them stay small.
+        zobrist_keys = None
+        if self._zobrist is not None:
+            zobrist_keys = self._zobrist_tables.play(
+                self._zobrist,
+                bitboard.PLANE_OF_VALUE[piece.value],
+                from_cell,
+                to_cell,
+            )
 
         return State(
-            to_play=next_player,
-            initial_board=initial_board,
-            pieces=[(to_row, to_col, piece)],
+            to_play=next_player, board_key=board_key, zobrist_keys=zobrist_keys
         )
 
     def is_win(self) -> Player:
         """Checks to see if a state is a win for a player. If it is a win, the
         winner is returned. Otherwise None is returned."""
 
-        # Calculate who owns each square of the board
-        owner = np.zeros(shape=9, dtype=np.int8)
-        for i in range(9):
-            square_state = self._board[i]
-            orange_state = square_state & Player.ORANGE.value
-            blue_state = (square_state & Player.BLUE.value) >> 3
-
-            if orange_state > blue_state:
-                owner[i] = Player.ORANGE.value
-            elif orange_state < blue_state:
-                owner[i] = Player.BLUE.value
-
-        # Check each possible win
-        blue_win = False
-        orange_win = False
-        for indices in self.win_indices:
-            if owner[indices[0]] == owner[indices[1]] == owner[indices[2]]:
-                if owner[indices[0]] == Player.ORANGE.value:
-                    orange_win = True
-                elif owner[indices[0]] == Player.BLUE.value:
-                    blue_win = True
-
-        if blue_win and orange_win:
-            return Player.BLUE if self.to_play == Player.ORANGE else Player.ORANGE
-        elif blue_win:
-            return Player.BLUE
-        elif orange_win:
-            return Player.ORANGE
-        else:
-            return None
+        # Look up the winner of the pattern of square owners.
+        planes = self._plane_cache
+        if planes is None:
+            planes = self._planes
+
+        to_play = bitboard.ORANGE if self.to_play == Player.ORANGE else bitboard.BLUE
+        return _PLAYER_OF_OWNER[bitboard.winner(planes, to_play)]
 
     def valid_moves(self):
         """Returns all valid moves in the current state."""
 
-        # Find the pieces in the players hand
         player_pieces = self._pieces_by_player[self.to_play]
-        piece_counts = [0] * 3
-
-        for row in range(3):
-            for col in range(3):
-                current_pieces = self._board[3 * row + col]
-                for i in range(len(player_pieces)):
-                    if current_pieces & player_pieces[i].value > 0:
-                        piece_counts[i] += 1
+        planes = self._planes
+        covering = bitboard.covering_masks(planes)
+        tops = bitboard.top_masks(planes)
 
-        # Moving pieces from the players hand onto the board.
+        # Moving pieces from the players hand onto the board. There are two of each
+        # piece, so a piece is in the hand unless both are on the board.
         ret = []
-        for piece, piece_count in zip(player_pieces, piece_counts):
-            if piece_count == 2:
+        for piece in player_pieces:
+            plane = bitboard.PLANE_OF_VALUE[piece.value]
+            if planes[plane].bit_count() == 2:
                 continue
 
-            for row in range(3):
-                for col in range(3):
-                    current_pieces = self._board[3 * row + col]
-                    if (current_pieces & self._cannot_place_pieces[piece.value]) == 0:
-                        ret.append((piece, None, None, row, col))
-
-        # Moving pieces on the board to another square
-        for from_row in range(3):
-            for from_col in range(3):
-                from_pieces = self._board[3 * from_row + from_col]
-                for piece in player_pieces:
-                    if from_pieces & piece.value == 0:
-                        continue
-
-                    if (from_pieces & self._cannot_move_pieces[piece.value]) > 0:
-                        continue
-
-                    for to_row in range(3):
-                        for to_col in range(3):
-                            if to_row == from_row and to_col == from_col:
-                                continue
-
-                            to_pieces = self._board[3 * to_row + to_col]
-                            if (
-                                to_pieces & self._cannot_place_pieces[piece.value]
-                            ) == 0:
-                                ret.append((piece, from_row, from_col, to_row, to_col))
+            for cell in bitboard.CELLS_OF_MASK[bitboard.FULL & ~covering[plane % 3]]:
+                ret.append((piece, None, None, cell // 3, cell % 3))
+
+        # Moving pieces on the board to another square. Only pieces that are not
+        # covered by a larger piece can be moved.
+        for from_cell in range(9):
+            from_bit = 1 << from_cell
+            for piece in player_pieces:
+                plane = bitboard.PLANE_OF_VALUE[piece.value]
+                if tops[plane] & from_bit == 0:
+                    continue
+
+                from_row, from_col = divmod(from_cell, 3)
+                targets = bitboard.FULL & ~covering[plane % 3] & ~from_bit
+                for to_cell in bitboard.CELLS_OF_MASK[targets]:
+                    ret.append((piece, from_row, from_col, to_cell // 3, to_cell % 3))
 
         return ret
 
+    def key(self) -> int:
+        """Returns a 64-bit integer that identifies the position. This is the packed
+        cannonical board with symmetry.TO_PLAY_BIT set if blue is to play."""
+        if self.to_play == Player.BLUE:
+            return self._key | symmetry.TO_PLAY_BIT
+
+        return self._key
+
+    def zobrist_keys(self) -> tuple:
+        """Returns the Zobrist keys of the boards equivalent to this one, in
+        symmetry order."""
+        if self._zobrist is None:
+            self._zobrist = self._zobrist_tables.board_keys(
+                self._planes, self.to_play == Player.BLUE
+            )
+
+        return self._zobrist
+
+    def zobrist_hash(self) -> int:
+        """Returns a 64-bit hash of the position that is the same for all equivalent
+        boards."""
+        return min(self.zobrist_keys())
+
     def __eq__(self, o):
-        assert isinstance(o, State)
+        if self is o:
+            return True
+
+        if not isinstance(o, State):
+            return NotImplemented
 
-        return np.array_equal(self._board, o._board)
+        return self._key == o._key and self.to_play == o.to_play
+
+    def __hash__(self):
+        return hash(self.key())
 
     def __nq__(self, o):
         return not self.__eq__(o)
@@ -300,7 +383,8 @@ class State:
 
         return False
 
-    def create_symmetries(self):
+    @classmethod
+    def create_symmetries(cls):
         # The symmetries can be generated from a rotation and a diagonal reflection
         identity = [0, 1, 2, 3, 4, 5, 6, 7, 8]
 
@@ -331,45 +415,48 @@ class State:
         #  - Three rotations
         #  - One reflection
         #  - Three combinations of rotation and reflection
-        self.symmetries = []
+        symmetries = []
 
         r1 = identity
-        self.symmetries.append(r1)
+        symmetries.append(r1)
 
-        r2 = self._mult_symmetry(rotate, r1)
-        self.symmetries.append(r2)
+        r2 = cls._mult_symmetry(rotate, r1)
+        symmetries.append(r2)
 
-        r3 = self._mult_symmetry(rotate, r2)
-        self.symmetries.append(r3)
+        r3 = cls._mult_symmetry(rotate, r2)
+        symmetries.append(r3)
 
-        r4 = self._mult_symmetry(rotate, r3)
-        self.symmetries.append(r4)
+        r4 = cls._mult_symmetry(rotate, r3)
+        symmetries.append(r4)
 
         if False:
-            for i in range(len(self.symmetries)):
-                self._print_symmetry(self.symmetries[i])
+            for i in range(len(symmetries)):
+                cls._print_symmetry(symmetries[i])
 
         # The next four include a reflection
         for i in range(4):
-            sym = self._mult_symmetry(self.symmetries[i], reflect)
-            self.symmetries.append(sym)
+            sym = cls._mult_symmetry(symmetries[i], reflect)
+            symmetries.append(sym)
 
         # Validate that we have eight distinct symmetries.
-        assert len(self.symmetries) == 8
+        assert len(symmetries) == 8
 
-        for i in range(len(self.symmetries)):
-            for j in range(len(self.symmetries)):
+        for i in range(len(symmetries)):
+            for j in range(len(symmetries)):
                 if i == j:
                     continue
 
-                if self.symmetries[i] == self.symmetries[j]:
+                if symmetries[i] == symmetries[j]:
                     print(f"Equal symmetries {i} {j}")
-                    print(self.symmetries[i])
-                    print(self.symmetries[j])
+                    print(symmetries[i])
+                    print(symmetries[j])
+
+                assert symmetries[i] != symmetries[j]
 
-                assert self.symmetries[i] != self.symmetries[j]
+        cls.symmetries = symmetries
 
-    def _mult_symmetry(self, s1: list, s2: list):
+    @staticmethod
+    def _mult_symmetry(s1: list, s2: list):
         result = [0] * 9
 
         for i in range(9):
@@ -377,7 +464,8 @@ class State:
 
         return result
 
-    def _print_symmetry(self, sym: list):
+    @staticmethod
+    def _print_symmetry(sym: list):
         base = [0, 3, 6, 1, 4, 7, 2, 5, 8]
 
         for i in range(3):
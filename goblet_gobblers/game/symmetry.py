@@ -0,0 +1,124 @@
+"""Table driven canonicalization of boards under the eight symmetries of the square.
+
+A board is packed into a single integer key with seven bits per square. Square 0 is
+stored in the most significant bits, so comparing keys as integers compares the
+boards lexicographically and the cannonical board, the lexicographically largest
+equivalent board, is the one with the largest key."""
+
+import numpy as np
+
+CELL_BITS = 7
+CELL_MASK = 0x7F
+
+LANE_BITS = 64
+LANE_MASK = (1 << LANE_BITS) - 1
+
+TO_PLAY_BIT = 1 << 63
+"""The bit set in the key of a position, as opposed to a board, when blue is to
+play. Board keys only use the low 63 bits."""
+
+SHIFTS = tuple(CELL_BITS * (8 - cell) for cell in range(9))
+"""The position of each square in a packed key."""
+
+
+def pack(board: np.ndarray) -> int:
+    """Packs a board stored as an array of nine piece values into a key."""
+    key = 0
+    for value in board.tolist():
+        key = (key << CELL_BITS) | value
+
+    return key
+
+
+def unpack(key: int) -> np.ndarray:
+    """Converts a key back to a board stored as an array of nine piece values."""
+    return np.array([(key >> shift) & CELL_MASK for shift in SHIFTS], dtype=np.int8)
+
+
+class SymmetryTables:
+    """Lookup tables that apply all the symmetries to a key at once.
+
+    Equivalent board s has the value of square symmetries[s][cell] in square cell.
+    lanes[cell][value] is an integer with one 64-bit lane per symmetry, where lane s
+    holds the contribution of a square with the given value to the key of
+    equivalent board s. Adding up the entries for the nine squares of a board gives
+    the keys of all eight equivalent boards."""
+
+    symmetries: list
+
+    lanes: tuple
+    """The per square tables described above, as Python integers."""
+
+    compose: tuple
+    """compose[t][g] is the index of the symmetry that gives the same board as
+    applying symmetry g and then symmetry t."""
+
+    images: np.ndarray
+    """The same tables as an array of shape (8, 9, 128) with dtype np.uint64, where
+    images[s][cell][value] is the contribution to the key of equivalent board s."""
+
+    def __init__(self, symmetries: list):
+        self.symmetries = symmetries
+
+        # Applying g and then t moves the value of square symmetries[g][symmetries[t][i]]
+        # to square i.
+        self.compose = tuple(
+            tuple(
+                symmetries.index([symmetries[g][symmetries[t][i]] for i in range(9)])
+                for g in range(len(symmetries))
+            )
+            for t in range(len(symmetries))
+        )
+
+        self.images = np.zeros(shape=(len(symmetries), 9, 128), dtype=np.uint64)
+        for s, symmetry in enumerate(symmetries):
+            for target, source in enumerate(symmetry):
+                self.images[s, source] = np.arange(128, dtype=np.uint64) << np.uint64(
+                    SHIFTS[target]
+                )
+
+        self.lanes = tuple(
+            tuple(
+                sum(
+                    int(self.images[s, cell, value]) << (LANE_BITS * s)
+                    for s in range(len(symmetries))
+                )
+                for value in range(128)
+            )
+            for cell in range(9)
+        )
+
+    def packed_images(self, key: int) -> int:
+        """Returns the keys of the boards equivalent to key packed into one integer,
+        with the key of equivalent board s in lane s. Adding or removing a piece
+        with value v in square c changes the result by lanes[c][v], so it can be
+        kept up to date as pieces are moved."""
+        lanes = self.lanes
+        total = 0
+        for cell in range(9):
+            total += lanes[cell][(key >> SHIFTS[cell]) & CELL_MASK]
+
+        return total
+
+    def unpack_images(self, images: int) -> list[int]:
+        """Returns the keys in the lanes of the result of packed_images(), in
+        symmetry order."""
+        return [
+            (images >> (LANE_BITS * s)) & LANE_MASK for s in range(len(self.symmetries))
+        ]
+
+    def canonical_image(self, images: int) -> tuple[int, int]:
+        """Returns the key of the cannonical board and the index of the first
+        symmetry that produces it, given the result of packed_images()."""
+        keys = self.unpack_images(images)
+        largest = max(keys)
+        return largest, keys.index(largest)
+
+    def equivalent_keys(self, key: int) -> list[int]:
+        """Returns the keys of the boards equivalent to key, in symmetry order."""
+        return self.unpack_images(self.packed_images(key))
+
+    def canonical(self, key: int) -> tuple[int, int]:
+        """Returns the key of the cannonical equivalent board and the index of the
+        first symmetry that produces it."""
+        return self.canonical_image(self.packed_images(key))
@@ -0,0 +1,80 @@
+"""Zobrist hashing of positions.
+
+The Zobrist key of a board is the XOR of a random 64-bit number for each piece on
+each square, XORed with SIDE when blue is to play. Since the board of a State is
+only known up to symmetry, a position has eight keys, one for each of the boards
+equivalent by symmetry, and the hash of the position is the smallest of them. The
+eight keys are updated by XOR when a piece is played, so hashing a child position
+doesn't look at the whole board."""
+
+import numpy as np
+
+from goblet_gobblers.game import bitboard
+
+SEED = 0x60B1E7
+"""The seed of the random numbers. Changing it changes every stored hash."""
+
+
+def _create_random_keys():
+    rng = np.random.default_rng(SEED)
+    pieces = rng.integers(0, 1 << 64, size=(9, 6), dtype=np.uint64, endpoint=False)
+    side = rng.integers(0, 1 << 64, dtype=np.uint64, endpoint=False)
+    return [[int(k) for k in row] for row in pieces], int(side)
+
+
+PIECE_KEYS, SIDE = _create_random_keys()
+"""PIECE_KEYS[cell][plane] is the random number for a piece in a square, where the
+plane is the index of the piece in bitboard.PIECE_VALUES."""
+
+
+class ZobristTables:
+    """The random numbers for each of the boards equivalent by symmetry.
+
+    Symmetry s puts the value of square symmetries[s][i] in square i, so a piece in
+    square c of a board ends up in the square i with symmetries[s][i] == c of
+    equivalent board s. keys[s][c][plane] is the random number for that square."""
+
+    symmetries: list
+
+    keys: tuple
+
+    def __init__(self, symmetries: list):
+        self.symmetries = symmetries
+        self.keys = tuple(
+            tuple(
+                tuple(PIECE_KEYS[symmetry.index(cell)][plane] for plane in range(6))
+                for cell in range(9)
+            )
+            for symmetry in symmetries
+        )
+
+    def board_keys(self, planes: tuple, blue_to_play: bool) -> tuple:
+        """Returns the keys of the equivalent boards of a position."""
+        side = SIDE if blue_to_play else 0
+        result = []
+        for keys in self.keys:
+            key = side
+            for plane, mask in enumerate(planes):
+                for cell in bitboard.CELLS_OF_MASK[mask]:
+                    key ^= keys[cell][plane]
+            result.append(key)
+
+        return tuple(result)
+
+    def play(self, board_keys: tuple, plane: int, from_cell: int, to_cell: int):
+        """Returns the keys after a piece is played from from_cell, or from the hand
+        if from_cell is None, to to_cell. The player to play changes."""
+        result = []
+        for keys, key in zip(self.keys, board_keys):
+            key ^= SIDE ^ keys[to_cell][plane]
+            if from_cell is not None:
+                key ^= keys[from_cell][plane]
+            result.append(key)
+
+        return tuple(result)
+
+
+def reorder(board_keys: tuple, compose: tuple, g: int) -> tuple:
+    """Returns the keys of the equivalent boards after the board is replaced by its
+    equivalent board g. compose is SymmetryTables.compose."""
+    return tuple(board_keys[compose[t][g]] for t in range(len(board_keys)))
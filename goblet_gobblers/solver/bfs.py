@@ -0,0 +1,202 @@
+"""Breadth first enumeration of the canonical positions reachable from a root.
+
+Each ply, the frontier is expanded with the batch versions of valid_moves and play,
+and the children that haven't been seen before become the next frontier. The keys
+of the positions seen so far are kept in one sorted NumPy array, so memory grows by
+eight bytes per position. For larger enumerations the keys can be kept on disk in a
+FrontierStore instead. The statistics of each ply are yielded as soon as it is
+expanded."""
+
+import argparse
+import time
+
+import numpy as np
+
+from goblet_gobblers.game.moves import MAX_MOVES
+from goblet_gobblers.game.state import State, Player
+from goblet_gobblers.solver.frontier import DEFAULT_MEMORY_BUDGET, FrontierStore
+from goblet_gobblers.solver.retrograde import (
+    EXPAND_BYTES_PER_MOVE,
+    FULL_INVENTORY,
+    expand,
+    position_key,
+)
+
+
+class PlyStats:
+    """The positions first reached at one ply."""
+
+    ply: int
+
+    positions: int
+    """The number of positions first reached at this ply."""
+
+    keys: np.ndarray
+    """The sorted keys of the positions first reached at this ply, or None if they
+    are kept in a FrontierStore."""
+
+    terminal: int
+    """The number of the positions where the game is over."""
+
+    children: int
+    """The number of distinct (position, child) pairs, counting children that were
+    reached at an earlier ply."""
+
+    max_children: int
+    """The largest number of distinct children of a position."""
+
+    total: int
+    """The number of positions reached at this or an earlier ply."""
+
+    seconds: float
+    """The time taken to expand the ply."""
+
+    def __init__(
+        self, ply, positions, keys, terminal, children, max_children, total, seconds
+    ):
+        self.ply = ply
+        self.positions = positions
+        self.keys = keys
+        self.terminal = terminal
+        self.children = children
+        self.max_children = max_children
+        self.total = total
+        self.seconds = seconds
+
+    @property
+    def branching(self) -> float:
+        """The average number of distinct children of the positions where the game
+        isn't over."""
+        playing = self.positions - self.terminal
+        return self.children / playing if playing > 0 else 0.0
+
+    def __repr__(self):
+        return (
+            f"ply {self.ply} positions {self.positions} terminal {self.terminal}"
+            f" branching {self.branching:.2f} max {self.max_children}"
+            f" total {self.total} seconds {self.seconds:.2f}"
+        )
+
+
+def plies(
+    root: State = None,
+    inventory: tuple = FULL_INVENTORY,
+    max_ply: int = None,
+    store: FrontierStore = None,
+):
+    """Yields a PlyStats for each ply, starting with the root, which defaults to the
+    empty board with orange to play. Stops when no new positions are found or after
+    max_ply, if given. If store is given, the keys are kept in it and the
+    frontiers are expanded a chunk at a time."""
+
+    if root is None:
+        root = State(Player.ORANGE, pieces=[])
+
+    if store is not None:
+        yield from _plies_with_store(root, inventory, max_ply, store)
+        return
+
+    frontier = np.array([position_key(root)], dtype=np.uint64)
+    seen = frontier
+    ply = 0
+    while len(frontier) > 0:
+        start = time.perf_counter()
+        terminal, parents, child_keys = expand(frontier, inventory)
+        counts = np.bincount(parents, minlength=len(frontier))
+
+        yield PlyStats(
+            ply,
+            len(frontier),
+            frontier,
+            int(np.count_nonzero(terminal)),
+            len(child_keys),
+            int(counts.max(initial=0)),
+            len(seen),
+            time.perf_counter() - start,
+        )
+
+        ply += 1
+        if max_ply is not None and ply > max_ply:
+            break
+
+        frontier = np.setdiff1d(child_keys, seen)
+        seen = np.union1d(seen, frontier)
+
+
+def expand_size(memory_budget: int) -> int:
+    """Returns the number of positions to expand at once so that expanding them uses
+    at most half of memory_budget, leaving the rest for the keys buffered in a
+    FrontierStore."""
+    return max(1, memory_budget // 2 // (EXPAND_BYTES_PER_MOVE * MAX_MOVES))
+
+
+def _plies_with_store(root, inventory, max_ply, store: FrontierStore):
+    store.add(np.array([position_key(root)], dtype=np.uint64))
+    frontier = store.advance()
+    ply = 0
+    while len(frontier) > 0:
+        start = time.perf_counter()
+        terminal = 0
+        children = 0
+        max_children = 0
+        for chunk in frontier.chunks(expand_size(store.memory_budget)):
+            chunk_terminal, parents, child_keys = expand(chunk, inventory)
+            store.add(child_keys)
+
+            terminal += int(np.count_nonzero(chunk_terminal))
+            children += len(child_keys)
+            counts = np.bincount(parents, minlength=len(chunk))
+            max_children = max(max_children, int(counts.max(initial=0)))
+
+        yield PlyStats(
+            ply,
+            len(frontier),
+            None,
+            terminal,
+            children,
+            max_children,
+            len(store.seen),
+            time.perf_counter() - start,
+        )
+
+        ply += 1
+        if max_ply is not None and ply > max_ply:
+            break
+
+        frontier = store.advance()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Count the positions reachable from the empty board by ply."
+    )
+    parser.add_argument("--max-ply", type=int, default=None)
+    parser.add_argument(
+        "--spill-directory", help="Keep the positions in files in this directory."
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=DEFAULT_MEMORY_BUDGET >> 20,
+        help="The memory used for positions in MB, with --spill-directory.",
+    )
+    args = parser.parse_args()
+
+    store = None
+    if args.spill_directory is not None:
+        store = FrontierStore(args.spill_directory, args.memory_budget << 20)
+
+    total = 0
+    try:
+        for stats in plies(max_ply=args.max_ply, store=store):
+            print(stats, flush=True)
+            total = stats.total
+    finally:
+        if store is not None:
+            store.close()
+
+    print(f"{total} positions")
+
+
+if __name__ == "__main__":
+    main()
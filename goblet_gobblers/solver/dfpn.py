@@ -0,0 +1,352 @@
+"""Depth-first proof-number search for a forced win from one position.
+
+The retrograde solver labels every position reachable from a root, which takes
+memory for all of them. Proof-number search instead only answers one question,
+whether the attacker, the player to play at the root, can force a win, and only
+looks at as much of the game as it needs. Each node has a proof number, the least
+number of leaves that would have to be wins for the attacker to prove the node,
+and a disproof number, the least number that would have to be shown not to be
+wins to disprove it. Df-pn explores the tree depth first, always expanding the
+most proving child, and only returns to the parent when the child's numbers pass
+thresholds set by the parent. The numbers of searched nodes are kept in a
+ProofTable of fixed size, so the memory used doesn't depend on the size of the
+game.
+
+Pieces can move between squares, so the game graph has cycles. A position that is
+already on the path from the root is disproved: a game that repeats forever isn't
+a win, and if the attacker can force a win there is a way to force it that never
+repeats a position. Such a disproof depends on the path and would be wrong if it
+were reused on another path, so it is kept by the parent but never stored in the
+table. Proofs never depend on a repetition, since a repeated position is never
+proved."""
+
+import argparse
+import sys
+from enum import Enum
+
+import numpy as np
+
+from goblet_gobblers.game.state import State, Player
+from goblet_gobblers.solver.hashing import mix
+from goblet_gobblers.solver.instrumentation import Instrumentation, JsonLinesEmitter
+from goblet_gobblers.solver.retrograde import Value
+
+INFINITY = (1 << 31) - 1
+"""The proof number of a disproved node and the disproof number of a proved
+node."""
+
+
+class Result(Enum):
+    """The outcome of a search for a forced win."""
+
+    PROVEN = "proven"
+    """The attacker can force a win."""
+
+    DISPROVEN = "disproven"
+    """The attacker can't force a win, i.e., the position is a draw or a loss."""
+
+    UNKNOWN = "unknown"
+    """The node limit was reached first."""
+
+
+class ProofTable:
+    """A fixed size table of the proof and disproof numbers of searched positions.
+
+    Each position maps to one slot, by its key, see State.key. The full key is
+    stored, so a lookup never returns the numbers of another position. When two
+    positions map to the same slot the one that took more work to search is
+    kept."""
+
+    capacity: int
+
+    lookups: int
+    """The number of calls to lookup."""
+
+    hits: int
+    """The number of calls to lookup that found an entry."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._keys = np.zeros(self.capacity, dtype=np.uint64)
+        self._proof = np.zeros(self.capacity, dtype=np.int32)
+        self._disproof = np.zeros(self.capacity, dtype=np.int32)
+        self._work = np.zeros(self.capacity, dtype=np.int64)
+        self._used = np.zeros(self.capacity, dtype=bool)
+
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self._used))
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the entries."""
+        return sum(
+            a.nbytes
+            for a in [self._keys, self._proof, self._disproof, self._work, self._used]
+        )
+
+    def clear(self):
+        self._used[:] = False
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, key: int) -> tuple[int, int]:
+        """Returns (proof, disproof) for a position, or None if the table doesn't
+        hold it."""
+        self.lookups += 1
+
+        slot = mix(key) % self.capacity
+        if not self._used[slot] or self._keys[slot] != key:
+            return None
+
+        self.hits += 1
+        return int(self._proof[slot]), int(self._disproof[slot])
+
+    def store(self, key: int, proof: int, disproof: int, work: int):
+        """Stores the numbers of a position found with the given number of
+        expansions, unless the slot holds a position that took more work."""
+        slot = mix(key) % self.capacity
+        if self._used[slot] and self._keys[slot] != key and self._work[slot] > work:
+            return
+
+        self._keys[slot] = key
+        self._proof[slot] = proof
+        self._disproof[slot] = disproof
+        self._work[slot] = work
+        self._used[slot] = True
+
+
+def _add(a: int, b: int) -> int:
+    """Adds proof or disproof numbers, keeping INFINITY for infinite sums and
+    keeping finite sums below it."""
+    if a == INFINITY or b == INFINITY:
+        return INFINITY
+    return min(a + b, INFINITY - 1)
+
+
+class DfpnSolver:
+    table: ProofTable
+
+    nodes: int
+    """The number of expansions done by the current solve."""
+
+    max_nodes: int
+    """The most expansions a solve may do before giving up, or None."""
+
+    instrumentation: Instrumentation
+    """Counts the work done by the solver, or None."""
+
+    def __init__(
+        self,
+        table_capacity: int = 1 << 20,
+        max_nodes: int = None,
+        instrumentation: Instrumentation = None,
+    ):
+        self.table = ProofTable(table_capacity)
+        self.max_nodes = max_nodes
+        self.instrumentation = instrumentation
+        self.nodes = 0
+        self._attacker = None
+
+    def prove(self, state: State, attacker: Player = None) -> Result:
+        """Searches for a forced win for attacker, by default the player to play in
+        state."""
+        self.nodes = 0
+        if attacker is None:
+            attacker = state.to_play
+
+        # The numbers in the table are only valid for one attacker.
+        if attacker != self._attacker:
+            self.table.clear()
+            self._attacker = attacker
+
+        # _search expands every node it is given, so a game that is already over is
+        # answered here.
+        winner = state.is_win()
+        if winner is not None:
+            return Result.PROVEN if winner == attacker else Result.DISPROVEN
+
+        # The keys of the positions on the path from the root to the current node.
+        self._path = set()
+
+        proof, disproof, _, _ = self._search(state, state.key(), INFINITY, INFINITY)
+        if self.instrumentation is not None:
+            self.instrumentation.event(
+                "dfpn", nodes=self.nodes, proof=proof, disproof=disproof
+            )
+
+        if proof == 0:
+            return Result.PROVEN
+        if disproof == 0:
+            return Result.DISPROVEN
+        return Result.UNKNOWN
+
+    def value(self, state: State) -> Value:
+        """Returns the value of a position for the player to play, by searching for
+        a forced win for each player in turn, or None if the node limit was
+        reached first."""
+        result = self.prove(state)
+        if result == Result.PROVEN:
+            return Value.WIN
+        if result == Result.UNKNOWN:
+            return None
+
+        other = Player.BLUE if state.to_play == Player.ORANGE else Player.ORANGE
+        result = self.prove(state, other)
+        if result == Result.UNKNOWN:
+            return None
+        return Value.LOSS if result == Result.PROVEN else Value.DRAW
+
+    def _numbers(self, child: State, key: int) -> tuple[int, int, bool]:
+        """Returns (proof, disproof, path dependent) for a child before searching
+        it."""
+        winner = child.is_win()
+        if winner == self._attacker:
+            return 0, INFINITY, False
+        if winner is not None:
+            return INFINITY, 0, False
+
+        if key in self._path:
+            if self.instrumentation is not None:
+                self.instrumentation.count("repetitions")
+            return INFINITY, 0, True
+
+        numbers = self.table.lookup(key)
+        if numbers is None:
+            return 1, 1, False
+        return numbers[0], numbers[1], False
+
+    def _search(self, state: State, key: int, proof_threshold, disproof_threshold):
+        """Searches a node that isn't over until its proof number reaches
+        proof_threshold or its disproof number reaches disproof_threshold. Returns
+        (proof, disproof, path dependent, work)."""
+        self.nodes += 1
+        work = 1
+
+        stats = self.instrumentation
+        if stats is not None:
+            stats.count("nodes")
+            if self.nodes & 0x3FF == 0:
+                stats.tick(nodes=self.nodes)
+
+        attacking = state.to_play == self._attacker
+
+        # Find the distinct children. Equivalent moves give the same cannonical
+        # State, so the keys tell them apart.
+        children = {}
+        for move in state.valid_moves():
+            child = state.play(*move)
+            children.setdefault(child.key(), child)
+
+        keys = list(children)
+        states = [children[k] for k in keys]
+        numbers = [self._numbers(child, k) for k, child in zip(keys, states)]
+
+        self._path.add(key)
+        while True:
+            proof, disproof, dependent = _combine(numbers, attacking)
+            if proof >= proof_threshold or disproof >= disproof_threshold:
+                break
+            if self.max_nodes is not None and self.nodes >= self.max_nodes:
+                break
+
+            # Expand the most proving child: the one with the least proof number at
+            # an attacker node and the least disproof number at a defender node.
+            best, second = _best_two(numbers, 0 if attacking else 1)
+            child_proof, child_disproof, _ = numbers[best]
+            if attacking:
+                child_proof_threshold = min(proof_threshold, second + 1)
+                child_disproof_threshold = _add(
+                    disproof_threshold - disproof, child_disproof
+                )
+            else:
+                child_proof_threshold = _add(proof_threshold - proof, child_proof)
+                child_disproof_threshold = min(disproof_threshold, second + 1)
+
+            child_proof, child_disproof, child_dependent, child_work = self._search(
+                states[best],
+                keys[best],
+                child_proof_threshold,
+                child_disproof_threshold,
+            )
+            numbers[best] = (child_proof, child_disproof, child_dependent)
+            work += child_work
+        self._path.remove(key)
+
+        # A disproof that depends on a repetition is only true on this path.
+        if not (disproof == 0 and dependent):
+            self.table.store(key, proof, disproof, work)
+
+        return proof, disproof, dependent, work
+
+
+def _combine(numbers: list, attacking: bool) -> tuple[int, int, bool]:
+    """Returns (proof, disproof, path dependent) of a node from the numbers of its
+    children. The attacker needs one proved child and the defender needs one
+    disproved child."""
+    if not numbers:
+        # There is always a move, but a node without one couldn't be won.
+        return INFINITY, 0, False
+
+    if attacking:
+        proof = min(n[0] for n in numbers)
+        disproof = 0
+        for n in numbers:
+            disproof = _add(disproof, n[1])
+    else:
+        proof = 0
+        for n in numbers:
+            proof = _add(proof, n[0])
+        disproof = min(n[1] for n in numbers)
+
+    dependent = disproof == 0 and any(n[2] for n in numbers if n[1] == 0)
+    return proof, disproof, dependent
+
+
+def _best_two(numbers: list, index: int) -> tuple[int, int]:
+    """Returns the child with the smallest numbers[i][index] and the second
+    smallest value."""
+    best = 0
+    best_value = INFINITY
+    second = INFINITY
+    for i, n in enumerate(numbers):
+        if n[index] < best_value:
+            second = best_value
+            best = i
+            best_value = n[index]
+        elif n[index] < second:
+            second = n[index]
+
+    return best, second
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Search for a forced win from the empty board with df-pn."
+    )
+    parser.add_argument("--table-size", type=int, default=1 << 20)
+    parser.add_argument("--max-nodes", type=int, default=None)
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="Write progress events as JSON lines to stderr.",
+    )
+    args = parser.parse_args()
+
+    instrumentation = None
+    if args.progress:
+        instrumentation = Instrumentation([JsonLinesEmitter(sys.stderr)])
+
+    solver = DfpnSolver(args.table_size, args.max_nodes, instrumentation)
+    root = State(Player.ORANGE, pieces=[])
+    result = solver.prove(root)
+    print(
+        f"Forced win for {root.to_play.name}: {result.name} after {solver.nodes}"
+        f" nodes, {len(solver.table)} table entries"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""A disk backed store for the frontiers of a breadth first enumeration.
+
+Keys added to the store are buffered in memory until the buffer reaches a quarter
+of the memory budget, and then sorted, deduplicated and written to a run file. When a level is
+finished the runs are merged, the keys seen at earlier levels are removed, and the
+result is written as the next frontier. Every step reads and writes the files
+sequentially a chunk at a time, so the memory used stays within the budget no
+matter how large the levels get.
+
+Run files hold sorted, distinct np.uint64 keys in little endian order with nothing
+else in the file."""
+
+import os
+
+import numpy as np
+
+DEFAULT_MEMORY_BUDGET = 1 << 28
+"""The default memory budget, 256 MB."""
+
+_DTYPE = np.dtype("<u8")
+
+_MIN_READ = 256
+"""The fewest keys read from a run at once while merging. When there are more runs
+than the chunk size allows at that size, they are merged in several passes."""
+
+
+class KeyRun:
+    """A file of sorted, distinct keys."""
+
+    path: str
+    count: int
+
+    def __init__(self, path: str, count: int):
+        self.path = path
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def chunks(self, size: int):
+        """Yields the keys in arrays of at most size keys."""
+        with open(self.path, "rb") as file:
+            while True:
+                chunk = np.fromfile(file, dtype=_DTYPE, count=size)
+                if len(chunk) == 0:
+                    return
+                yield chunk.astype(np.uint64, copy=False)
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def write_run(path: str, chunks) -> KeyRun:
+    """Writes sorted chunks of keys, where every key is larger than the keys in the
+    chunks before it, to a run file."""
+    count = 0
+    with open(path, "wb") as file:
+        for chunk in chunks:
+            chunk.astype(_DTYPE, copy=False).tofile(file)
+            count += len(chunk)
+
+    return KeyRun(path, count)
+
+
+def merge(streams: list):
+    """Merges several streams of sorted, distinct chunks of keys. Yields sorted
+    chunks of the distinct keys in any of the streams."""
+    iterators = [iter(stream) for stream in streams]
+    buffers = [_next_chunk(iterator) for iterator in iterators]
+
+    while any(buffer is not None for buffer in buffers):
+        # Every key up to the smallest last key of the buffers has been read.
+        limit = min(buffer[-1] for buffer in buffers if buffer is not None)
+
+        parts = []
+        for i, buffer in enumerate(buffers):
+            if buffer is None:
+                continue
+
+            end = int(np.searchsorted(buffer, limit, side="right"))
+            parts.append(buffer[:end])
+            buffers[i] = buffer[end:] if end < len(buffer) else None
+            if buffers[i] is None:
+                buffers[i] = _next_chunk(iterators[i])
+
+        yield np.unique(np.concatenate(parts))
+
+
+def difference(stream, removed):
+    """Yields the keys of a stream of sorted chunks that are not in the stream of
+    sorted chunks removed."""
+    removed = iter(removed)
+    buffer = _next_chunk(removed)
+
+    for chunk in stream:
+        # Compare the chunk with one chunk of removed keys at a time, so at most one
+        # chunk of each stream is in memory.
+        while len(chunk) > 0:
+            if buffer is None:
+                yield chunk
+                break
+
+            end = int(np.searchsorted(chunk, buffer[-1], side="right"))
+            kept = np.setdiff1d(chunk[:end], buffer, assume_unique=True)
+            if len(kept) > 0:
+                yield kept
+
+            chunk = chunk[end:]
+            if len(chunk) > 0:
+                buffer = _next_chunk(removed)
+
+
+def _next_chunk(iterator):
+    """Returns the next non empty chunk, or None."""
+    for chunk in iterator:
+        if len(chunk) > 0:
+            return chunk
+
+    return None
+
+
+class FrontierStore:
+    """Finds the new keys of each level of a breadth first enumeration."""
+
+    directory: str
+
+    memory_budget: int
+    """The number of bytes the store may use. Sorting and merging keys takes a few
+    times the memory of the keys, so at most a quarter of it holds keys."""
+
+    seen: KeyRun
+    """All keys returned by advance so far."""
+
+    def __init__(self, directory: str, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        os.makedirs(directory, exist_ok=True)
+
+        self.seen = write_run(self._path("seen", 0), [])
+        self._level = 0
+        self._runs = []
+        self._run_number = 0
+        self._buffer = []
+        self._buffered = 0
+        self._frontier = None
+
+    @property
+    def chunk_size(self) -> int:
+        """The number of keys buffered before they are written to a run, and the
+        number of keys read from the runs at once."""
+        return max(1024, self.memory_budget // _DTYPE.itemsize // 4)
+
+    def _path(self, kind: str, number: int) -> str:
+        return os.path.join(self.directory, f"{kind}_{number}.keys")
+
+    def add(self, keys: np.ndarray):
+        """Adds keys to the next level."""
+        self._buffer.append(keys)
+        self._buffered += len(keys)
+        if self._buffered >= self.chunk_size:
+            self._spill()
+
+    def _spill(self):
+        if self._buffered == 0:
+            return
+
+        keys = np.unique(np.concatenate(self._buffer))
+        self._buffer = []
+        self._buffered = 0
+
+        self._runs.append(write_run(self._next_run_path(), [keys]))
+
+    def _next_run_path(self) -> str:
+        self._run_number += 1
+        return self._path("run", self._run_number)
+
+    def _merge_runs(self):
+        """Merges the runs in passes until there are few enough to read them all at
+        once with at least _MIN_READ keys from each."""
+        fan_in = max(2, self.chunk_size // _MIN_READ - 2)
+        while len(self._runs) > fan_in:
+            merged = []
+            for start in range(0, len(self._runs), fan_in):
+                group = self._runs[start : start + fan_in]
+                size = max(1, self.chunk_size // len(group))
+                merged.append(
+                    write_run(
+                        self._next_run_path(),
+                        merge([run.chunks(size) for run in group]),
+                    )
+                )
+                for run in group:
+                    run.delete()
+            self._runs = merged
+
+    def advance(self) -> KeyRun:
+        """Finishes the level. Returns the run of the keys added since the last call
+        that weren't returned before."""
+        self._spill()
+        if self._frontier is not None:
+            self._frontier.delete()
+
+        # Merge the runs and remove the keys of the earlier levels.
+        self._merge_runs()
+        size = max(1, self.chunk_size // (len(self._runs) + 2))
+        added = merge([run.chunks(size) for run in self._runs])
+        self._level += 1
+        frontier = write_run(
+            self._path("frontier", self._level),
+            difference(added, self.seen.chunks(size)),
+        )
+        for run in self._runs:
+            run.delete()
+        self._runs = []
+
+        seen = write_run(
+            self._path("seen", self._level),
+            merge([self.seen.chunks(size), frontier.chunks(size)]),
+        )
+        self.seen.delete()
+        self.seen = seen
+
+        self._frontier = frontier
+        return frontier
+
+    def close(self):
+        """Deletes the files of the store."""
+        for run in self._runs + [self.seen, self._frontier]:
+            if run is not None:
+                run.delete()
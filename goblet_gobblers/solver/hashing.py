@@ -0,0 +1,22 @@
+"""Spreading position keys over the slots of a table or the shards of a solve.
+
+The keys of similar boards differ in few bits, see State.key, so they are mixed
+before they are reduced to a slot. mix and mix_keys give the same result for the
+same key."""
+
+import numpy as np
+
+_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK_64 = (1 << 64) - 1
+_SHIFT = 20
+
+
+def mix(key: int) -> int:
+    """Returns a number whose low bits depend on every bit of a 64-bit key. Take it
+    modulo the number of slots to find the slot of the key."""
+    return ((key * _MULTIPLIER) & _MASK_64) >> _SHIFT
+
+
+def mix_keys(keys: np.ndarray) -> np.ndarray:
+    """mix for an array of np.uint64 keys."""
+    return (keys * np.uint64(_MULTIPLIER)) >> np.uint64(_SHIFT)
@@ -0,0 +1,107 @@
+"""Counters, timers and progress events for the search and the solvers.
+
+The search and solvers take an optional Instrumentation. When none is given they
+only pay for a check against None at each place that would be counted, so
+instrumentation costs close to nothing when it is disabled.
+
+Progress events are dictionaries with the name of the event, the seconds since the
+Instrumentation was created, a copy of the counters and any fields the event adds.
+They are passed to every registered callback. JsonLinesEmitter is a callback that
+writes the events to a file as JSON lines."""
+
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROGRESS = "progress"
+"""The event sent by tick() at most once every interval."""
+
+
+class Instrumentation:
+    counters: Counter
+    """The counts of events, by name. The search counts nodes, valid_moves, is_win,
+    canonicalizations, duplicate_children, repetitions, tt_probes, tt_hits and
+    tt_collisions. The solvers count the same things for each board they handle in
+    a batch."""
+
+    nodes_by_depth: list
+    """The number of search nodes visited at each ply from the root."""
+
+    timers: dict
+    """The total seconds spent in each timed section, by name."""
+
+    interval: float
+    """The least number of seconds between two PROGRESS events."""
+
+    def __init__(self, callbacks: list = None, interval: float = 1.0):
+        self.counters = Counter()
+        self.nodes_by_depth = []
+        self.timers = {}
+        self.interval = interval
+
+        self._callbacks = list(callbacks) if callbacks is not None else []
+        self._start = time.perf_counter()
+        self._last_progress = self._start
+
+    def add_callback(self, callback):
+        """Registers a function that is called with each event."""
+        self._callbacks.append(callback)
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    def count_depth(self, depth: int, amount: int = 1):
+        """Counts nodes visited at a ply from the root."""
+        if depth >= len(self.nodes_by_depth):
+            self.nodes_by_depth.extend([0] * (depth + 1 - len(self.nodes_by_depth)))
+        self.nodes_by_depth[depth] += amount
+
+    @contextmanager
+    def timer(self, name: str):
+        """Adds the time spent in a with block to the timer with the given name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] = self.timers.get(name, 0.0) + (
+                time.perf_counter() - start
+            )
+
+    def snapshot(self) -> dict:
+        """Returns a copy of the counters, timers and per depth node counts."""
+        return {
+            "seconds": time.perf_counter() - self._start,
+            "counters": dict(self.counters),
+            "timers": dict(self.timers),
+            "nodes_by_depth": list(self.nodes_by_depth),
+        }
+
+    def event(self, name: str, **fields):
+        """Sends an event to the callbacks."""
+        if not self._callbacks:
+            return
+
+        record = {"event": name, **self.snapshot(), **fields}
+        for callback in self._callbacks:
+            callback(record)
+
+    def tick(self, **fields):
+        """Sends a PROGRESS event if interval seconds have passed since the last
+        one. Long running loops call this regularly."""
+        now = time.perf_counter()
+        if now - self._last_progress >= self.interval:
+            self._last_progress = now
+            self.event(PROGRESS, **fields)
+
+
+class JsonLinesEmitter:
+    """A callback that writes each event as one line of JSON."""
+
+    def __init__(self, file):
+        """file is an open text file, e.g., sys.stderr."""
+        self.file = file
+
+    def __call__(self, record: dict):
+        self.file.write(json.dumps(record, sort_keys=True) + "\n")
+        self.file.flush()
@@ -0,0 +1,354 @@
+"""Retrograde analysis spread over several processes.
+
+Each worker process owns the canonical positions whose key hashes to its shard. The
+positions are found a ply at a time: each worker expands the new positions of its
+shard and the edges to the children are sent, in one batch per shard, to the
+workers that own the children. The values are then propagated backwards one
+distance at a time, with the results of each resolved position sent to the owners
+of its parents. Working through the distances in order gives the same values and
+distances as retrograde.propagate.
+
+The workers write the batches to files that the other workers read, so no batch
+passes through the driver process. The driver only tells the workers when to start
+each step and hears back how many positions or results they sent."""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import traceback
+
+import numpy as np
+
+from goblet_gobblers.game.state import State, Player
+from goblet_gobblers.solver.hashing import mix_keys
+from goblet_gobblers.solver.instrumentation import Instrumentation
+from goblet_gobblers.solver.retrograde import (
+    FULL_INVENTORY,
+    NO_DISTANCE,
+    Solution,
+    edge_ranges,
+    expand,
+    position_key,
+    resolve,
+)
+
+
+def shard_of(keys: np.ndarray, shards: int) -> np.ndarray:
+    """Returns the shard that owns each position key."""
+    return mix_keys(keys) % np.uint64(shards)
+
+
+def _split_by_shard(keys: np.ndarray, shards: int, *columns) -> list:
+    """Splits the rows of keys and the other columns by the shard that owns each
+    key. Returns one tuple of arrays for each shard."""
+    owners = shard_of(keys, shards)
+    order = np.argsort(owners, kind="stable")
+    bounds = np.searchsorted(owners[order], np.arange(shards + 1))
+    return [
+        tuple(column[order[bounds[i] : bounds[i + 1]]] for column in (keys,) + columns)
+        for i in range(shards)
+    ]
+
+
+class _Shard:
+    """The positions owned by one worker."""
+
+    keys: np.ndarray
+    """The sorted keys of the positions found so far."""
+
+    levels: list
+    """For each ply, the arrays (keys, terminal, child counts) of the positions
+    expanded in that ply."""
+
+    edges: list
+    """The edges to positions in this shard, as the arrays (child keys, parent
+    keys)."""
+
+    def __init__(self, shard: int, shards: int, inventory: tuple):
+        self.shard = shard
+        self.shards = shards
+        self.inventory = inventory
+
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.levels = []
+        self.edges = []
+
+    def expand(self, incoming: list, roots: np.ndarray = None) -> tuple:
+        """Adds the edges sent by the other shards and expands the new positions,
+        along with roots, if given. Returns the number of new positions and the
+        outgoing edges for each shard."""
+        child_keys = np.concatenate([np.zeros(0, np.uint64)] + [c for c, _ in incoming])
+        parent_keys = np.concatenate(
+            [np.zeros(0, np.uint64)] + [p for _, p in incoming]
+        )
+        self.edges.append((child_keys, parent_keys))
+
+        if roots is not None:
+            child_keys = np.concatenate([child_keys, roots])
+        frontier = np.setdiff1d(child_keys, self.keys)
+        self.keys = np.union1d(self.keys, frontier)
+
+        terminal, parents, children = expand(frontier, self.inventory)
+        counts = np.bincount(parents, minlength=len(frontier)).astype(np.int32)
+        self.levels.append((frontier, terminal, counts))
+
+        return len(frontier), _split_by_shard(children, self.shards, frontier[parents])
+
+    def start_propagation(self) -> np.ndarray:
+        """Builds the arrays used to propagate values and returns the terminal
+        positions."""
+        position_count = len(self.keys)
+        self.values = np.zeros(position_count, dtype=np.int8)
+        self.distances = np.full(position_count, NO_DISTANCE, dtype=np.int32)
+        self.unresolved = np.zeros(position_count, dtype=np.int32)
+
+        terminal = np.zeros(position_count, dtype=np.int8)
+        for level_keys, level_terminal, counts in self.levels:
+            index = np.searchsorted(self.keys, level_keys)
+            terminal[index] = level_terminal
+            self.unresolved[index] = counts
+        self.levels = None
+
+        # The parents of each position, which may be owned by other shards.
+        child_keys = np.concatenate([c for c, _ in self.edges])
+        parent_keys = np.concatenate([p for _, p in self.edges])
+        self.edges = None
+
+        children = np.searchsorted(self.keys, child_keys)
+        order = np.argsort(children, kind="stable")
+        self.parent_keys = parent_keys[order]
+        self.parent_offsets = np.zeros(position_count + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(children, minlength=position_count),
+            out=self.parent_offsets[1:],
+        )
+
+        resolved = np.flatnonzero(terminal)
+        self.values[resolved] = terminal[resolved]
+        self.distances[resolved] = 0
+        return resolved
+
+    def messages(self, resolved: np.ndarray) -> list:
+        """Returns the results of the resolved positions for the owners of their
+        parents, as the arrays (parent keys, child values) for each shard."""
+        edge = edge_ranges(self.parent_offsets, resolved)
+        counts = np.diff(self.parent_offsets)[resolved]
+        child_values = np.repeat(self.values[resolved], counts)
+        return _split_by_shard(self.parent_keys[edge], self.shards, child_values)
+
+    def propagate(self, incoming: list, distance: int) -> np.ndarray:
+        """Applies the results sent by the other shards. Returns the positions
+        resolved at distance."""
+        parent_keys = np.concatenate(
+            [np.zeros(0, np.uint64)] + [p for p, _ in incoming]
+        )
+        child_values = np.concatenate([np.zeros(0, np.int8)] + [v for _, v in incoming])
+        parents = np.searchsorted(self.keys, parent_keys)
+        return resolve(
+            self.values,
+            self.distances,
+            self.unresolved,
+            parents,
+            child_values,
+            distance,
+        )
+
+
+class _Exchange:
+    """Passes batches of arrays from one worker to the others through files in a
+    directory. Each round every worker writes one file for each worker, and the
+    files are read in the next round. The driver only starts a round once every
+    worker has finished the one before, so the files are complete when they are
+    read."""
+
+    def __init__(self, directory: str, shard: int, shards: int):
+        self.directory = directory
+        self.shard = shard
+        self.shards = shards
+        self.round = 0
+
+    def _path(self, round: int, source: int, target: int) -> str:
+        return os.path.join(self.directory, f"{round}_{source}_{target}.npy")
+
+    def send(self, batches: list) -> int:
+        """Writes one batch, a tuple of arrays, for each worker. Returns the number
+        of rows written."""
+        for target, batch in enumerate(batches):
+            with open(self._path(self.round, self.shard, target), "wb") as file:
+                for column in batch:
+                    np.save(file, column)
+
+        self.round += 1
+        return sum(len(batch[0]) for batch in batches)
+
+    def receive(self, columns: int) -> list:
+        """Reads and deletes the batches the workers sent to this one in the last
+        round."""
+        batches = []
+        for source in range(self.shards if self.round > 0 else 0):
+            path = self._path(self.round - 1, source, self.shard)
+            with open(path, "rb") as file:
+                batches.append(tuple(np.load(file) for _ in range(columns)))
+            os.remove(path)
+
+        return batches
+
+
+def _worker(shard: int, shards: int, inventory: tuple, directory: str, connection):
+    """Runs the commands sent by the driver on one shard. The batches for the other
+    shards go through an _Exchange, and the replies to the driver are only
+    counts."""
+    try:
+        data = _Shard(shard, shards, inventory)
+        exchange = _Exchange(directory, shard, shards)
+        while True:
+            command, *args = connection.recv()
+            if command == "expand":
+                count, outgoing = data.expand(exchange.receive(2), *args)
+                connection.send((count, exchange.send(outgoing)))
+            elif command == "start":
+                resolved = data.start_propagation()
+                connection.send(exchange.send(data.messages(resolved)))
+            elif command == "propagate":
+                resolved = data.propagate(exchange.receive(2), *args)
+                connection.send(exchange.send(data.messages(resolved)))
+            elif command == "result":
+                path = os.path.join(directory, f"result_{shard}.npy")
+                with open(path, "wb") as file:
+                    for column in [data.keys, data.values, data.distances]:
+                        np.save(file, column)
+                connection.send(path)
+                return
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+
+
+class _Driver:
+    """Sends commands to the workers and waits for all of them to finish each
+    one."""
+
+    def __init__(self, shards: int, inventory: tuple, directory: str):
+        context = multiprocessing.get_context()
+        self.connections = []
+        self.processes = []
+        for shard in range(shards):
+            parent_end, child_end = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(shard, shards, inventory, directory, child_end),
+                daemon=True,
+            )
+            process.start()
+            self.connections.append(parent_end)
+            self.processes.append(process)
+
+    def run(self, commands: list) -> list:
+        """Sends one command to each worker and returns their replies."""
+        for connection, command in zip(self.connections, commands):
+            connection.send(command)
+
+        replies = [connection.recv() for connection in self.connections]
+        for reply in replies:
+            if isinstance(reply, tuple) and isinstance(reply[0], str):
+                raise RuntimeError(f"Solver worker failed:\n{reply[1]}")
+
+        return replies
+
+    def close(self):
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+
+def solve(
+    root: State = None,
+    workers: int = None,
+    inventory: tuple = FULL_INVENTORY,
+    instrumentation: Instrumentation = None,
+    directory: str = None,
+) -> Solution:
+    """Solves every position reachable from root, which defaults to the empty board
+    with orange to play, using the given number of processes. The result is the
+    same as retrograde.solve. The workers exchange batches through files in
+    directory, by default a new temporary directory."""
+
+    if root is None:
+        root = State(Player.ORANGE, pieces=[])
+    if workers is None:
+        workers = os.cpu_count()
+
+    with tempfile.TemporaryDirectory(dir=directory) as exchange_directory:
+        driver = _Driver(workers, inventory, exchange_directory)
+        try:
+            shards = _run(driver, root, workers, instrumentation)
+        finally:
+            driver.close()
+
+        columns = []
+        for path in shards:
+            with open(path, "rb") as file:
+                columns.append(tuple(np.load(file) for _ in range(3)))
+
+    keys = np.concatenate([keys for keys, _, _ in columns])
+    order = np.argsort(keys)
+    return Solution(
+        root,
+        keys[order],
+        np.concatenate([values for _, values, _ in columns])[order],
+        np.concatenate([distances for _, _, distances in columns])[order],
+    )
+
+
+def _run(driver: _Driver, root: State, workers: int, instrumentation) -> list:
+    """Runs the solve on the workers. Returns the files with the result of each
+    shard."""
+
+    # Find the positions a ply at a time, starting with the owner of the root.
+    root_key = np.array([position_key(root)], dtype=np.uint64)
+    replies = driver.run(
+        [("expand", keys) for (keys,) in _split_by_shard(root_key, workers)]
+    )
+    ply = 0
+    while sum(count for count, _ in replies) > 0:
+        if instrumentation is not None:
+            positions = sum(count for count, _ in replies)
+            instrumentation.count("nodes", positions)
+            instrumentation.event("ply", ply=ply, positions=positions)
+            ply += 1
+
+        replies = driver.run([("expand",)] * workers)
+
+    # Propagate the values a distance at a time.
+    sent = driver.run([("start",)] * workers)
+    distance = 1
+    while sum(sent) > 0:
+        sent = driver.run([("propagate", distance)] * workers)
+        if instrumentation is not None:
+            instrumentation.event("distance", distance=distance)
+        distance += 1
+
+    return driver.run([("result",)] * workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Solve the game with several processes."
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    solution = solve(workers=args.workers)
+
+    for value, count in solution.counts().items():
+        print(f"{value.name}: {count}")
+
+    print(
+        f"Empty board: {solution.root_value().name} for {solution.root.to_play.name}"
+        f" in {solution.distance(solution.root)} plies"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+"""Retrograde analysis of the game graph.
+
+The solver first walks every canonical position reachable from a root, expanding a
+whole ply at a time with the batch module. It then works backwards from the
+terminal positions (the ones where State.is_win() returns a player) to label each
+position as a win, loss or draw for the player to play."""
+
+import argparse
+import sys
+from enum import Enum
+
+import numpy as np
+
+from goblet_gobblers.game import batch, bitboard, symmetry
+from goblet_gobblers.game.state import State, Player
+from goblet_gobblers.solver.instrumentation import Instrumentation, JsonLinesEmitter
+
+
+class Value(Enum):
+    """The game theoretic value of a position from the point of view of the player
+    who plays next."""
+
+    DRAW = 0
+    WIN = 1
+    LOSS = 2
+
+
+NO_DISTANCE = -1
+"""The distance stored for positions that are draws."""
+
+
+class Solution:
+    """The result of solving all positions reachable from a root."""
+
+    keys: np.ndarray
+    """The sorted keys of the positions, see position_key. The values and distances
+    of a position are stored at the index of its key."""
+
+    values: np.ndarray
+    """The Value of each position, stored as np.int8."""
+
+    distances: np.ndarray
+    """The number of plies until the game ends with best play, or NO_DISTANCE for
+    draws. The winner plays to finish as fast as possible and the loser plays to
+    finish as slowly as possible."""
+
+    root: State
+
+    def __init__(self, root: State, keys: np.ndarray, values: np.ndarray, distances):
+        self.root = root
+        self.keys = keys
+        self.values = values
+        self.distances = distances
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _index(self, state: State) -> int:
+        key = position_key(state)
+        i = int(np.searchsorted(self.keys, np.uint64(key)))
+        if i == len(self.keys) or self.keys[i] != key:
+            raise KeyError(f"Position not reachable from the root: {state}")
+
+        return i
+
+    def value(self, state: State) -> Value:
+        """Returns the value of a position reachable from the root."""
+        return Value(int(self.values[self._index(state)]))
+
+    def distance(self, state: State) -> int:
+        """Returns the number of plies until the game ends with best play."""
+        return int(self.distances[self._index(state)])
+
+    def root_value(self) -> Value:
+        return self.value(self.root)
+
+    def counts(self) -> dict:
+        """Returns the number of positions with each Value."""
+        return {
+            value: int(np.count_nonzero(self.values == value.value)) for value in Value
+        }
+
+
+TO_PLAY_BIT = np.uint64(symmetry.TO_PLAY_BIT)
+
+FULL_INVENTORY = (2, 2, 2, 2, 2, 2)
+"""The number of each piece a player has at the start of the game, in the order of
+bitboard.PIECE_VALUES. Solving with a smaller inventory solves a smaller version of
+the game, where some pieces can't be taken from the hand as often."""
+
+_PLANE_OF_VALUE = np.zeros(128, dtype=np.int8)
+for _value, _plane in bitboard.PLANE_OF_VALUE.items():
+    _PLANE_OF_VALUE[_value] = _plane
+
+
+def position_key(state: State) -> int:
+    """Returns an integer identifying a canonical position, see State.key."""
+    return state.key()
+
+
+def position_keys(board_keys: np.ndarray, to_play: np.ndarray) -> np.ndarray:
+    """Returns the position keys for arrays of board keys and Player values."""
+    return np.where(to_play == Player.BLUE.value, board_keys | TO_PLAY_BIT, board_keys)
+
+
+def split_keys(keys: np.ndarray):
+    """Converts position keys back to a batch of boards and Player values."""
+    boards = batch.boards_from_keys(keys & ~TO_PLAY_BIT)
+    to_play = np.where(
+        (keys & TO_PLAY_BIT) != 0, Player.BLUE.value, Player.ORANGE.value
+    ).astype(np.int8)
+    return boards, to_play
+
+
+def terminal_value(state: State) -> Value:
+    """Returns the Value of a position where the game is over, or None if the game
+    is not over."""
+    winner = state.is_win()
+    if winner is None:
+        return None
+
+    return Value.WIN if winner == state.to_play else Value.LOSS
+
+
+def terminal_values(boards: np.ndarray, to_play: np.ndarray) -> np.ndarray:
+    """Returns the Value of each position in a batch where the game is over and 0
+    for the other positions."""
+    winner = batch.is_win(boards, to_play)
+    return np.where(
+        winner == 0, 0, np.where(winner == to_play, Value.WIN.value, Value.LOSS.value)
+    ).astype(np.int8)
+
+
+def piece_counts(boards: np.ndarray) -> np.ndarray:
+    """Returns an array of shape (N, 6) with the number of each piece on each board,
+    in the order of bitboard.PIECE_VALUES. Covered pieces are counted."""
+    boards = boards.view(np.uint8)
+    counts = np.empty(shape=(len(boards), 6), dtype=np.int8)
+    for plane, value in enumerate(bitboard.PIECE_VALUES):
+        counts[:, plane] = np.count_nonzero(boards & value, axis=1)
+
+    return counts
+
+
+EXPAND_BYTES_PER_MOVE = 64
+"""About the most memory expand uses for each move it plays, for sizing the batches
+of positions passed to it."""
+
+
+def expand(
+    keys: np.ndarray,
+    inventory: tuple = FULL_INVENTORY,
+    instrumentation: Instrumentation = None,
+):
+    """Expands a frontier of positions. Returns the arrays (terminal, parents,
+    children), where terminal holds the Value of each terminal position in keys,
+    and the other two arrays list each distinct (parent index, child key) pair.
+    Terminal positions are not expanded."""
+
+    boards, to_play = split_keys(keys)
+    terminal = terminal_values(boards, to_play)
+
+    # Play every move from the positions where the game is not over.
+    playing = np.flatnonzero(terminal == 0)
+    moves = batch.valid_moves(boards[playing], to_play[playing])
+
+    if instrumentation is not None:
+        instrumentation.count("nodes", len(keys))
+        instrumentation.count("is_win", len(keys))
+        instrumentation.count("valid_moves", len(playing))
+
+    # Drop the moves that take a piece from the hand when the player doesn't have
+    # any more of them.
+    if tuple(inventory) != FULL_INVENTORY:
+        parent, piece, from_cell, _ = moves
+        plane = _PLANE_OF_VALUE[piece.view(np.uint8)]
+        on_board = piece_counts(boards[playing])[parent, plane]
+        allowed = (from_cell != batch.HAND) | (
+            on_board < np.array(inventory, dtype=np.int8)[plane]
+        )
+        moves = tuple(column[allowed] for column in moves)
+
+    child_boards, child_to_play = batch.play(boards[playing], to_play[playing], *moves)
+    child_keys = position_keys(batch.canonical_keys(child_boards), child_to_play)
+    if instrumentation is not None:
+        instrumentation.count("canonicalizations", len(child_boards))
+
+    # Several moves can lead to the same canonical position, so only record each
+    # child once.
+    parents = playing[moves[0]]
+    order = np.lexsort((child_keys, parents))
+    parents = parents[order]
+    child_keys = child_keys[order]
+    distinct = np.ones(len(order), dtype=bool)
+    distinct[1:] = (parents[1:] != parents[:-1]) | (child_keys[1:] != child_keys[:-1])
+
+    return terminal, parents[distinct], child_keys[distinct]
+
+
+def enumerate_positions(
+    root: State,
+    inventory: tuple = FULL_INVENTORY,
+    instrumentation: Instrumentation = None,
+):
+    """Finds every canonical position reachable from root. Returns a tuple
+    (keys, offsets, children, terminal) where keys is the sorted array of position
+    keys, the children of position i are children[offsets[i]:offsets[i + 1]] and
+    terminal holds the Value of each terminal position and 0 for all other
+    positions. Play stops at terminal positions, so they have no children."""
+
+    frontier = np.array([position_key(root)], dtype=np.uint64)
+    seen = frontier
+    levels = []
+
+    # Expand the positions one ply at a time.
+    while len(frontier) > 0:
+        terminal, parents, child_keys = expand(frontier, inventory, instrumentation)
+        levels.append((frontier, terminal, parents, child_keys))
+        if instrumentation is not None:
+            instrumentation.event(
+                "ply", ply=len(levels) - 1, positions=len(frontier), total=len(seen)
+            )
+
+        frontier = np.setdiff1d(child_keys, seen)
+        seen = np.union1d(seen, frontier)
+
+    # Number the positions by the order of their keys.
+    keys = seen
+    terminal = np.zeros(len(keys), dtype=np.int8)
+    parents = []
+    children = []
+    while levels:
+        # Drop the keys of each ply once they are numbered, so the edges are never
+        # all held both as keys and as indices.
+        level_keys, level_terminal, level_parents, level_children = levels.pop()
+        index = np.searchsorted(keys, level_keys)
+        terminal[index] = level_terminal
+        parents.append(index[level_parents])
+        children.append(np.searchsorted(keys, level_children))
+
+    parents = np.concatenate(parents)
+    children = np.concatenate(children)
+
+    order = np.argsort(parents, kind="stable")
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(parents, minlength=len(keys)), out=offsets[1:])
+
+    return keys, offsets, children[order], terminal
+
+
+def resolve(values, distances, unresolved, parents, child_values, distance: int):
+    """Applies the values of children resolved at distance - 1 to their parents.
+    parents holds the index of the parent for each child. Returns the indices of
+    the positions resolved at distance."""
+
+    # A child that is a loss makes the parent a win.
+    wins = np.unique(parents[child_values == Value.LOSS.value])
+    wins = wins[values[wins] == Value.DRAW.value]
+    values[wins] = Value.WIN.value
+    distances[wins] = distance
+
+    # The parent is a loss once all of its children are wins. A parent with a child
+    # that is a loss still counts that child, so it can't also become a loss.
+    won, counts = np.unique(
+        parents[child_values == Value.WIN.value], return_counts=True
+    )
+    unresolved[won] -= counts.astype(unresolved.dtype)
+    losses = won[(unresolved[won] == 0) & (values[won] == Value.DRAW.value)]
+    values[losses] = Value.LOSS.value
+    distances[losses] = distance
+
+    return np.concatenate([wins, losses])
+
+
+def edge_ranges(offsets: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Returns the indices offsets[i] to offsets[i + 1] - 1 for each i in rows, one
+    range after the other."""
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(
+        counts.sum()
+    )
+
+
+def propagate(
+    offsets: np.ndarray,
+    children: np.ndarray,
+    terminal: np.ndarray,
+    outside: tuple = None,
+    instrumentation: Instrumentation = None,
+):
+    """Runs the retrograde analysis over a game graph in the format returned by
+    enumerate_positions. Returns the arrays (values, distances).
+
+    A position is a win if some child is a loss, and is a loss if every child is a
+    win. Positions are resolved in order of increasing distance, one distance at a
+    time, so the first loss among the children of a position gives the fastest
+    win and the last win gives the slowest loss. Whatever is never resolved, e.g.,
+    positions on a cycle that neither player can be forced off of, is a draw.
+
+    outside, if given, lists children that are not part of the graph and have
+    already been solved, as the arrays (parents, values, distances). Each of them
+    is handled along with the positions of the graph at the same distance."""
+
+    position_count = len(terminal)
+    values = np.zeros(position_count, dtype=np.int8)
+    distances = np.full(position_count, NO_DISTANCE, dtype=np.int32)
+
+    # Build the reverse graph, so we can find the parents of a resolved position.
+    child_counts = np.diff(offsets)
+    order = np.argsort(children, kind="stable")
+    parents = np.repeat(np.arange(position_count), child_counts)[order]
+    del order
+    parent_counts = np.bincount(children, minlength=position_count)
+    parent_offsets = np.zeros(position_count + 1, dtype=np.int64)
+    np.cumsum(parent_counts, out=parent_offsets[1:])
+
+    # The number of children of each position that are not known to be wins.
+    unresolved = child_counts.astype(np.int32)
+
+    if outside is None:
+        outside = (np.zeros(0, np.int64), np.zeros(0, np.int8), np.zeros(0, np.int32))
+    outside_parents, outside_values, outside_distances = outside
+    unresolved += np.bincount(outside_parents, minlength=position_count).astype(
+        np.int32
+    )
+
+    # Outside children that are draws never resolve their parents.
+    decided = np.flatnonzero(outside_values != Value.DRAW.value)
+    decided = decided[np.argsort(outside_distances[decided], kind="stable")]
+    outside_parents = outside_parents[decided]
+    outside_values = outside_values[decided]
+    outside_distances = outside_distances[decided]
+    last_outside = outside_distances[-1] if len(decided) > 0 else -1
+
+    # Start from the terminal positions.
+    resolved = np.flatnonzero(terminal)
+    values[resolved] = terminal[resolved]
+    distances[resolved] = 0
+
+    # Handle one distance at a time.
+    distance = 0
+    while len(resolved) > 0 or distance <= last_outside:
+        start, stop = np.searchsorted(outside_distances, [distance, distance + 1])
+        edges = edge_ranges(parent_offsets, resolved)
+        resolved = resolve(
+            values,
+            distances,
+            unresolved,
+            np.concatenate([parents[edges], outside_parents[start:stop]]),
+            np.concatenate(
+                [
+                    np.repeat(values[resolved], parent_counts[resolved]),
+                    outside_values[start:stop],
+                ]
+            ),
+            distance + 1,
+        )
+
+        distance += 1
+        if instrumentation is not None:
+            instrumentation.count("resolved", len(resolved))
+            instrumentation.event("distance", distance=distance, resolved=len(resolved))
+
+    return values, distances
+
+
+def solve(
+    root: State = None,
+    inventory: tuple = FULL_INVENTORY,
+    instrumentation: Instrumentation = None,
+) -> Solution:
+    """Solves every position reachable from root, which defaults to the empty board
+    with orange to play. inventory limits the pieces the players have, see
+    FULL_INVENTORY."""
+
+    if root is None:
+        root = State(Player.ORANGE, pieces=[])
+
+    if instrumentation is None:
+        keys, offsets, children, terminal = enumerate_positions(root, inventory)
+        values, distances = propagate(offsets, children, terminal)
+    else:
+        with instrumentation.timer("enumerate"):
+            keys, offsets, children, terminal = enumerate_positions(
+                root, inventory, instrumentation
+            )
+        with instrumentation.timer("propagate"):
+            values, distances = propagate(
+                offsets, children, terminal, instrumentation=instrumentation
+            )
+        instrumentation.event("solved", positions=len(keys))
+
+    return Solution(root, keys, values, distances)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve the game.")
+    parser.add_argument("--output", help="Write the solution to a tablebase file.")
+    parser.add_argument(
+        "--no-distances",
+        action="store_true",
+        help="Leave the distances out of the tablebase file.",
+    )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="Write progress events as JSON lines to stderr.",
+    )
+    args = parser.parse_args()
+
+    instrumentation = None
+    if args.progress:
+        instrumentation = Instrumentation([JsonLinesEmitter(sys.stderr)])
+
+    solution = solve(instrumentation=instrumentation)
+    if args.output is not None:
+        # Imported here since the tablebase module depends on this one.
+        from goblet_gobblers.solver import tablebase
+
+        tablebase.write(args.output, solution, distances=not args.no_distances)
+
+    for value, count in solution.counts().items():
+        print(f"{value.name}: {count}")
+
+    print(
+        f"Empty board: {solution.root_value().name} for {solution.root.to_play.name}"
+        f" in {solution.distance(solution.root)} plies"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""Alpha-beta search for the best move in a position.
+
+The search is a depth limited negamax with alpha-beta pruning, iterative deepening
+and a transposition table. It walks the tree with a single Position, making and
+unmaking moves, rather than creating a State for every node. Positions that aren't
+decided within the depth limit score 0, so a nonzero score is always a proven
+result: WIN_SCORE minus the number of plies to the win, or its negation for a
+loss.
+
+Pieces can move between squares, so the game graph has cycles. A position that is
+already on the path from the root is scored as a draw, as in the retrograde solver,
+where positions that can't be forced off of a cycle are draws. Such a score
+depends on how the position was reached, so results that depend on a repetition
+are not stored in the transposition table unless they are proven. A proven result
+never depends on one: the losing side would have taken the repetition instead."""
+
+import argparse
+import sys
+import time
+
+from goblet_gobblers.game.moves import MAX_MOVES, MoveList
+from goblet_gobblers.game.position import Position
+from goblet_gobblers.game.state import State, Player
+from goblet_gobblers.solver.instrumentation import Instrumentation, JsonLinesEmitter
+from goblet_gobblers.solver.transposition import (
+    EXACT,
+    LOWER,
+    NO_MOVE,
+    UPPER,
+    Replacement,
+    TranspositionTable,
+)
+
+WIN_SCORE = 10000
+"""The score of a position where the player to play has won."""
+
+MAX_PLY = 1000
+
+WIN_BOUND = WIN_SCORE - MAX_PLY
+"""Scores larger than this are wins and scores less than -WIN_BOUND are losses."""
+
+INFINITY = WIN_SCORE + 1
+
+# How _ordered_moves marks the moves it adds after the wins.
+_NOT_DEFERRED = 0
+_COVER = 1
+_REST = 2
+
+
+def is_proven(score: int) -> bool:
+    """Checks if a score is a forced win or loss."""
+    return abs(score) > WIN_BOUND
+
+
+def _to_table(score: int, ply: int) -> int:
+    # Wins are stored as the distance from the position rather than from the root.
+    if score > WIN_BOUND:
+        return score + ply
+    if score < -WIN_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score: int, ply: int) -> int:
+    if score > WIN_BOUND:
+        return score - ply
+    if score < -WIN_BOUND:
+        return score + ply
+    return score
+
+
+class SearchResult:
+    """The result of searching a position to a given depth."""
+
+    score: int
+    """The score for the player to play. See the module documentation."""
+
+    best_move: tuple
+    """The best move, in the format returned by State.valid_moves."""
+
+    principal_variation: list[tuple]
+    """The expected line of play, starting with best_move. The moves are in the
+    format returned by State.valid_moves, and all of them are relative to the board
+    of the State that was searched, i.e., the board is not canonicalized between
+    moves."""
+
+    depth: int
+
+    nodes: int
+    """The number of positions visited."""
+
+    seconds: float
+
+    def __init__(self, score, best_move, principal_variation, depth, nodes, seconds):
+        self.score = score
+        self.best_move = best_move
+        self.principal_variation = principal_variation
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self):
+        return (
+            f"depth {self.depth} score {self.score} nodes {self.nodes}"
+            f" nps {self.nodes_per_second:.0f} pv {self.principal_variation}"
+        )
+
+
+class Searcher:
+    table: TranspositionTable
+    """The results of searched positions. The best move of an entry is stored
+    relative to the equivalent board whose Zobrist key is the hash of the position,
+    so that it can be used for any equivalent board."""
+
+    position: Position
+    """The position being searched."""
+
+    nodes: int
+    """The number of positions visited by the current search."""
+
+    repetitions: int
+    """The number of times the current search reached a position that was already
+    on the path from the root."""
+
+    instrumentation: Instrumentation
+    """Counts the work done by the search, or None."""
+
+    def __init__(
+        self,
+        table_capacity: int = 1 << 20,
+        replacement: Replacement = Replacement.TWO_TIER,
+        instrumentation: Instrumentation = None,
+    ):
+        self.table = TranspositionTable(table_capacity, replacement)
+        self.nodes = 0
+        self.repetitions = 0
+        self._path = set()
+        self.instrumentation = instrumentation
+
+    def search(
+        self,
+        state: State,
+        max_depth: int,
+        time_limit: float = None,
+        callback=None,
+    ) -> SearchResult:
+        """Searches with iterative deepening until max_depth is reached, the result
+        is proven or more than time_limit seconds have passed. The time limit is
+        only checked between iterations. callback, if given, is called with the
+        SearchResult of each iteration."""
+
+        start = time.perf_counter()
+        self.nodes = 0
+        self.repetitions = 0
+        self.position = Position(state)
+
+        # The hashes of the positions on the path from the root to the current node.
+        self._path = set()
+
+        # The moves of each ply, reused by every node at that ply.
+        self._generated = [MoveList() for _ in range(max_depth + 1)]
+        self._ordered = [MoveList() for _ in range(max_depth + 1)]
+        self._deferred = [bytearray(MAX_MOVES) for _ in range(max_depth + 1)]
+
+        self._table_counts = (
+            self.table.probes,
+            self.table.hits,
+            self.table.collisions,
+        )
+
+        result = None
+        for depth in range(1, max_depth + 1):
+            score = self._negamax(depth, -INFINITY, INFINITY, 0)
+            pv = [self.position.move_to_tuple(m) for m in self.principal_variation()]
+
+            result = SearchResult(
+                score,
+                pv[0] if pv else None,
+                pv,
+                depth,
+                self.nodes,
+                time.perf_counter() - start,
+            )
+            if callback is not None:
+                callback(result)
+            if self.instrumentation is not None:
+                self._count_table()
+                self.instrumentation.event(
+                    "iteration", depth=depth, score=score, nodes=self.nodes
+                )
+
+            if is_proven(score):
+                break
+            if time_limit is not None and result.seconds > time_limit:
+                break
+
+        return result
+
+    def _count_table(self):
+        """Copies the table counters for this search to the instrumentation."""
+        probes, hits, collisions = self._table_counts
+        counters = self.instrumentation.counters
+        counters["tt_probes"] = self.table.probes - probes
+        counters["tt_hits"] = self.table.hits - hits
+        counters["tt_collisions"] = self.table.collisions - collisions
+
+    def principal_variation(self) -> list[int]:
+        """Follows the best moves stored in the transposition table from the
+        current position."""
+        position = self.position
+        pv = []
+        seen = set()
+        while position.is_win() is None:
+            key = position.zobrist_hash()
+            entry = self.table.probe(key)
+            if entry is None or entry.move == NO_MOVE or key in seen:
+                break
+
+            move = position.move_from_symmetry(
+                entry.move, position.canonical_symmetry()
+            )
+            if move not in position.valid_moves():
+                break
+
+            seen.add(key)
+            pv.append(move)
+            position.make_move(move)
+
+        for _ in pv:
+            position.unmake_move()
+
+        return pv
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int):
+        position = self.position
+        self.nodes += 1
+
+        stats = self.instrumentation
+        if stats is not None:
+            stats.count("nodes")
+            stats.count("is_win")
+            stats.count_depth(ply)
+            if self.nodes & 0x3FF == 0:
+                self._count_table()
+                stats.tick(nodes=self.nodes, depth=depth, ply=ply)
+
+        winner = position.is_win()
+        if winner is not None:
+            return WIN_SCORE - ply if winner == position.to_play else ply - WIN_SCORE
+
+        if depth == 0:
+            return 0
+
+        key = position.zobrist_hash()
+        if key in self._path:
+            self.repetitions += 1
+            if stats is not None:
+                stats.count("repetitions")
+            return 0
+
+        # Use the stored result of an earlier search of the position, if it went at
+        # least as deep.
+        symmetry = position.canonical_symmetry()
+        if stats is not None:
+            stats.count("canonicalizations")
+        original_alpha = alpha
+        table_move = NO_MOVE
+        entry = self.table.probe(key)
+        if entry is not None:
+            if entry.move != NO_MOVE:
+                table_move = position.move_from_symmetry(entry.move, symmetry)
+
+            if entry.depth >= depth:
+                value = _from_table(entry.value, ply)
+                if entry.flag == EXACT:
+                    return value
+                elif entry.flag == LOWER:
+                    alpha = max(alpha, value)
+                elif entry.flag == UPPER:
+                    beta = min(beta, value)
+
+                if alpha >= beta:
+                    return value
+
+        best = -INFINITY
+        best_move = NO_MOVE
+        repetitions = self.repetitions
+        self._path.add(key)
+        for move in self._ordered_moves(table_move, ply):
+            position.make_move(move)
+            score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            position.unmake_move()
+
+            if score > best:
+                best = score
+                best_move = move
+
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        self._path.remove(key)
+
+        # A result that depends on the path to the position can't be reused.
+        if self.repetitions != repetitions and not is_proven(best):
+            return best
+
+        if best <= original_alpha:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(
+            key,
+            _to_table(best, ply),
+            depth,
+            flag,
+            position.move_to_symmetry(best_move, symmetry),
+        )
+
+        return best
+
+    def _ordered_moves(self, table_move: int, ply: int) -> MoveList:
+        """Returns the moves in the order they should be searched: the best move
+        from the transposition table, then moves that win, then moves that cover a
+        piece, then the rest, keeping only one move for each distinct child. The
+        moves are put in the MoveList of the ply."""
+        position = self.position
+        player = position.to_play
+
+        stats = self.instrumentation
+        if stats is not None:
+            stats.count("valid_moves")
+
+        moves = position.valid_moves(self._generated[ply])
+        ordered = self._ordered[ply]
+        ordered.clear()
+
+        # Moves that reach a child equivalent to the child of an earlier move are
+        # skipped, which mostly happens on symmetric boards early in the game. The
+        # children are compared by Zobrist hash, which the table already trusts.
+        children = set()
+        if table_move != NO_MOVE and table_move in moves:
+            position.make_move(table_move)
+            children.add(position.zobrist_hash())
+            position.unmake_move()
+            ordered.append(table_move)
+
+        # Add the wins right away and mark the other moves as covers or the rest.
+        deferred = self._deferred[ply]
+        for i, move in enumerate(moves):
+            deferred[i] = _NOT_DEFERRED
+            if move == table_move:
+                continue
+
+            position.make_move(move)
+            child = position.zobrist_hash()
+            if child in children:
+                position.unmake_move()
+                if stats is not None:
+                    stats.count("duplicate_children")
+                continue
+
+            children.add(child)
+            wins_now = position.is_win() == player
+            position.unmake_move()
+            if stats is not None:
+                stats.count("is_win")
+
+            if wins_now:
+                ordered.append(move)
+            elif position.covers(move):
+                deferred[i] = _COVER
+            else:
+                deferred[i] = _REST
+
+        for kind in (_COVER, _REST):
+            for i, move in enumerate(moves):
+                if deferred[i] == kind:
+                    ordered.append(move)
+
+        return ordered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the empty board.")
+    parser.add_argument("--depth", type=int, default=7)
+    parser.add_argument("--time-limit", type=float, default=None)
+    parser.add_argument("--table-size", type=int, default=1 << 20)
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="Write progress events as JSON lines to stderr.",
+    )
+    args = parser.parse_args()
+
+    instrumentation = None
+    if args.progress:
+        instrumentation = Instrumentation([JsonLinesEmitter(sys.stderr)])
+
+    searcher = Searcher(table_capacity=args.table_size, instrumentation=instrumentation)
+    searcher.search(
+        State(Player.ORANGE, pieces=[]),
+        args.depth,
+        time_limit=args.time_limit,
+        callback=print,
+    )
+
+
+if __name__ == "__main__":
+    main()
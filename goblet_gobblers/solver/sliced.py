@@ -0,0 +1,346 @@
+"""Retrograde analysis one inventory slice at a time.
+
+Pieces are never taken off of the board, so every move either keeps the number of
+each piece on the board the same or adds one piece from the hand. The positions
+with the same count of each of the six pieces on the board form an inventory slice,
+and the children of a position are either in its own slice or in a slice with one
+more piece. The slices are solved from the fullest board to the emptiest, so when
+a slice is solved every position outside of it that it can reach has already been
+solved.
+
+Each finished slice is written to a directory and only the slice being solved and
+the slices with one more piece that it can reach are kept in memory. Slices that are
+already in the directory are not solved again, so an interrupted solve can be
+restarted."""
+
+import argparse
+import itertools
+import os
+
+import numpy as np
+
+from goblet_gobblers.game import batch, bitboard
+from goblet_gobblers.game.state import State, Player
+from goblet_gobblers.solver.instrumentation import Instrumentation
+from goblet_gobblers.solver.retrograde import (
+    FULL_INVENTORY,
+    Value,
+    expand,
+    piece_counts,
+    position_key,
+    position_keys,
+    propagate,
+    split_keys,
+)
+
+_SLICE_DIGITS = 3 ** np.arange(6)
+
+
+def slice_index(counts) -> int:
+    """Returns a number identifying the slice with the given piece counts, in the
+    order of bitboard.PIECE_VALUES."""
+    return int(np.dot(counts, _SLICE_DIGITS))
+
+
+def slices(inventory: tuple = FULL_INVENTORY, smallest: tuple = None) -> list:
+    """Returns the piece counts of the slices that can be reached in a game where
+    the players have the given inventory, starting from a board with the counts in
+    smallest. The slices are ordered from the fullest board to the emptiest."""
+    if smallest is None:
+        smallest = (0,) * 6
+
+    counts = itertools.product(
+        *(range(low, high + 1) for low, high in zip(smallest, inventory))
+    )
+    return sorted(counts, key=lambda c: (-sum(c), c))
+
+
+def _plane_pairs(orange_count: int, blue_count: int) -> np.ndarray:
+    """Returns every way to put the orange and blue pieces of one size on the board,
+    as an array of (orange mask, blue mask) rows. Pieces of the same size can't be
+    in the same square."""
+    masks = np.arange(bitboard.FULL + 1)
+    sizes = np.array([bin(mask).count("1") for mask in masks])
+    orange = masks[sizes == orange_count]
+    blue = masks[sizes == blue_count]
+    pairs = np.array(list(itertools.product(orange, blue)), dtype=np.int16)
+    return pairs[(pairs[:, 0] & pairs[:, 1]) == 0]
+
+
+def _boards_from_masks(masks: np.ndarray) -> np.ndarray:
+    """Converts an array of shape (N, 6) of planes into a batch of boards."""
+    cells = np.arange(9)
+    boards = np.zeros(shape=(len(masks), 9), dtype=np.uint8)
+    for plane, value in enumerate(bitboard.PIECE_VALUES):
+        boards |= (((masks[:, plane, None] >> cells) & 1) * value).astype(np.uint8)
+
+    return boards.view(np.int8)
+
+
+def successors(counts: tuple, inventory: tuple = FULL_INVENTORY) -> list:
+    """Returns the counts of the slices with one more piece that can be reached from
+    the slice with the given counts, i.e., the ones that can have children of its
+    positions."""
+    return [
+        counts[:plane] + (counts[plane] + 1,) + counts[plane + 1 :]
+        for plane in range(6)
+        if counts[plane] < inventory[plane]
+    ]
+
+
+def slice_keys(counts: tuple) -> np.ndarray:
+    """Returns the sorted keys of every canonical position in a slice, with either
+    player to play. This includes positions that can't be reached in a game."""
+    pairs = [_plane_pairs(counts[size], counts[3 + size]) for size in range(3)]
+
+    # Build the boards a group at a time, one group for each way to place the small
+    # pieces, to bound the size of the temporary arrays. Symmetric groups give the
+    # same keys, so the groups are merged into the distinct keys whenever they
+    # hold as many keys as have been found so far.
+    small, medium, big = pairs
+    rest = np.array(list(itertools.product(range(len(medium)), range(len(big)))))
+    keys = np.zeros(0, dtype=np.uint64)
+    pending = []
+    pending_count = 0
+    for orange_small, blue_small in small:
+        masks = np.zeros(shape=(len(rest), 6), dtype=np.int16)
+        masks[:, bitboard.SMALL] = orange_small
+        masks[:, 3 + bitboard.SMALL] = blue_small
+        masks[:, bitboard.MEDIUM] = medium[rest[:, 0], 0]
+        masks[:, 3 + bitboard.MEDIUM] = medium[rest[:, 0], 1]
+        masks[:, bitboard.BIG] = big[rest[:, 1], 0]
+        masks[:, 3 + bitboard.BIG] = big[rest[:, 1], 1]
+
+        board_keys = np.unique(batch.canonical_keys(_boards_from_masks(masks)))
+        pending.append(board_keys)
+        pending_count += len(board_keys)
+        if pending_count >= len(keys):
+            keys = np.unique(np.concatenate([keys] + pending))
+            pending = []
+            pending_count = 0
+
+    board_keys = np.unique(np.concatenate([keys] + pending))
+    return np.concatenate(
+        [
+            position_keys(board_keys, np.full(len(board_keys), player.value, np.int8))
+            for player in [Player.ORANGE, Player.BLUE]
+        ]
+    )
+
+
+class SliceStore:
+    """The solved slices, stored in a directory with one file per slice."""
+
+    directory: str
+
+    inventory: tuple
+    """The inventory of the game the slices were solved for. A slice depends on the
+    inventory, since it decides which pieces can still be taken from the hand."""
+
+    def __init__(self, directory: str, inventory: tuple = FULL_INVENTORY):
+        self.directory = directory
+        self.inventory = tuple(inventory)
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, counts: tuple) -> str:
+        name = "slice_" + "".join(str(count) for count in counts) + ".npz"
+        return os.path.join(self.directory, name)
+
+    def __contains__(self, counts: tuple) -> bool:
+        return os.path.exists(self.path(counts))
+
+    def save(self, counts: tuple, keys: np.ndarray, values, distances):
+        # Write to a temporary file first, so an interrupted solve never leaves a
+        # partial slice behind.
+        path = self.path(counts)
+        temporary = path + ".tmp.npz"
+        np.savez(
+            temporary,
+            inventory=np.array(self.inventory, dtype=np.int8),
+            keys=keys,
+            values=values,
+            distances=distances,
+        )
+        os.replace(temporary, path)
+
+    def load(self, counts: tuple):
+        """Returns the arrays (keys, values, distances) of a solved slice."""
+        with np.load(self.path(counts)) as data:
+            if tuple(data["inventory"].tolist()) != self.inventory:
+                raise ValueError(
+                    f"Slice {counts} was solved for inventory"
+                    f" {tuple(data['inventory'].tolist())}, not {self.inventory}"
+                )
+
+            return data["keys"], data["values"], data["distances"]
+
+
+class SlicedSolution:
+    """Looks up the values of positions in the slices of a SliceStore."""
+
+    store: SliceStore
+
+    def __init__(self, store: SliceStore):
+        self.store = store
+        self._slices = {}
+
+    def _lookup(self, state: State):
+        counts = tuple(piece_counts(state._board[None, :])[0].tolist())
+        if counts not in self._slices:
+            self._slices[counts] = self.store.load(counts)
+
+        keys, values, distances = self._slices[counts]
+        key = position_key(state)
+        i = int(np.searchsorted(keys, np.uint64(key)))
+        if i == len(keys) or keys[i] != key:
+            raise KeyError(f"Position not in its slice: {state}")
+
+        return Value(int(values[i])), int(distances[i])
+
+    def value(self, state: State) -> Value:
+        value, _ = self._lookup(state)
+        return value
+
+    def distance(self, state: State) -> int:
+        """Returns the number of plies until the game ends with best play, see
+        Solution.distances."""
+        _, distance = self._lookup(state)
+        return distance
+
+
+class _SliceCache:
+    """The solved slices that are kept in memory."""
+
+    def __init__(self, store: SliceStore):
+        self.store = store
+        self.slices = {}
+
+    def keep_only(self, wanted: list):
+        """Drops the slices that aren't in wanted."""
+        for counts in list(self.slices):
+            if counts not in wanted:
+                del self.slices[counts]
+
+    def lookup(self, keys: np.ndarray):
+        """Returns the values and distances of positions in solved slices."""
+        values = np.zeros(len(keys), dtype=np.int8)
+        distances = np.zeros(len(keys), dtype=np.int32)
+
+        boards, _ = split_keys(keys)
+        indices = np.dot(piece_counts(boards).astype(np.int64), _SLICE_DIGITS)
+        for index in np.unique(indices):
+            counts = tuple(int(index // 3**plane % 3) for plane in range(6))
+            if counts not in self.slices:
+                self.slices[counts] = self.store.load(counts)
+
+            slice_keys, slice_values, slice_distances = self.slices[counts]
+            rows = np.flatnonzero(indices == index)
+            found = np.searchsorted(slice_keys, keys[rows])
+            values[rows] = slice_values[found]
+            distances[rows] = slice_distances[found]
+
+        return values, distances
+
+
+CHUNK_POSITIONS = 1 << 16
+"""The number of positions of a slice that are expanded at once."""
+
+
+def solve_slice(
+    counts: tuple,
+    inventory: tuple,
+    cache: _SliceCache,
+    instrumentation: Instrumentation = None,
+    chunk_size: int = CHUNK_POSITIONS,
+):
+    """Solves the positions of one slice, using the solved slices in cache for the
+    children in other slices. Returns the arrays (keys, values, distances)."""
+    keys = slice_keys(counts)
+    terminal = np.zeros(len(keys), dtype=np.int8)
+    child_counts = np.zeros(len(keys), dtype=np.int64)
+    inside_children = [np.zeros(0, dtype=np.int64)]
+    outside = [(np.zeros(0, np.int64), np.zeros(0, np.int8), np.zeros(0, np.int32))]
+
+    # Expand a chunk of the slice at a time, so only the edges of one chunk are
+    # ever held as keys.
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start : start + chunk_size]
+        chunk_terminal, parents, child_keys = expand(chunk, inventory, instrumentation)
+        terminal[start : start + len(chunk)] = chunk_terminal
+
+        # Split the children into the ones in this slice and the ones in fuller
+        # slices.
+        found = np.searchsorted(keys, child_keys)
+        found[found == len(keys)] = 0
+        inside = keys[found] == child_keys
+
+        child_counts[start : start + len(chunk)] = np.bincount(
+            parents[inside], minlength=len(chunk)
+        )
+        inside_children.append(found[inside])
+
+        outside_values, outside_distances = cache.lookup(child_keys[~inside])
+        outside.append((parents[~inside] + start, outside_values, outside_distances))
+
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(child_counts, out=offsets[1:])
+    children = np.concatenate(inside_children)
+    outside = tuple(np.concatenate(column) for column in zip(*outside))
+
+    values, distances = propagate(offsets, children, terminal, outside)
+    return keys, values, distances
+
+
+def solve(
+    directory: str,
+    root: State = None,
+    inventory: tuple = FULL_INVENTORY,
+    callback=None,
+    instrumentation: Instrumentation = None,
+) -> SlicedSolution:
+    """Solves every slice that can be reached from root, which defaults to the empty
+    board, and writes them to directory. callback, if given, is called with the
+    counts of each slice after it is solved."""
+
+    if root is None:
+        root = State(Player.ORANGE, pieces=[])
+
+    store = SliceStore(directory, inventory)
+    cache = _SliceCache(store)
+    smallest = tuple(piece_counts(root._board[None, :])[0].tolist())
+
+    for counts in slices(inventory, smallest):
+        if counts in store:
+            continue
+
+        # Only the slices with one more piece can be reached from this slice.
+        cache.keep_only(successors(counts, inventory))
+        keys, values, distances = solve_slice(counts, inventory, cache, instrumentation)
+        store.save(counts, keys, values, distances)
+        if instrumentation is not None:
+            instrumentation.event("slice", counts=list(counts), positions=len(keys))
+
+        if callback is not None:
+            callback(counts)
+
+    return SlicedSolution(store)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Solve the game one inventory slice at a time."
+    )
+    parser.add_argument("directory", help="Where the solved slices are written.")
+    args = parser.parse_args()
+
+    solution = solve(args.directory, callback=lambda counts: print(counts, flush=True))
+
+    root = State(Player.ORANGE, pieces=[])
+    print(
+        f"Empty board: {solution.value(root).name} for {root.to_play.name}"
+        f" in {solution.distance(root)} plies"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""A file format for solved positions that is read with numpy.memmap.
+
+The file starts with a fixed size header followed by arrays indexed by the rank of
+a position, see ranking.rank:
+
+    header     HEADER_SIZE bytes, see _HEADER
+    values     RANK_COUNT values of 2 bits, four to a byte, padded to 8 bytes
+    distances  RANK_COUNT distances, np.uint8, padded to 8 bytes
+    overflow   the sorted ranks, np.uint64, and then the distances, np.int32, of the
+               positions whose distance doesn't fit in a byte
+
+A value is stored as Value.value + 1, so 0 marks a rank that isn't in the
+tablebase. The distances of draws and missing ranks aren't used and are stored as
+0, and a distance of OVERFLOW or more is stored as OVERFLOW with the real distance
+in the overflow arrays. The distances and the overflow arrays are only in the file
+if the HAS_DISTANCES flag is set in the header.
+
+A lookup reads one byte of each array, without a search, except for the rare
+distances in the overflow arrays. Opening a Tablebase only reads the header, and
+the arrays are mapped into memory, so a lookup only reads the pages it touches and
+processes that open the same file share the operating system's page cache. The
+ranks of a partial solve are written into a sparse file, so the pages that no
+position touches take no disk space."""
+
+import argparse
+import struct
+
+import numpy as np
+
+from goblet_gobblers.game import ranking
+from goblet_gobblers.game.state import State, Player
+from goblet_gobblers.solver.retrograde import NO_DISTANCE, Solution, Value, split_keys
+
+MAGIC = b"GOBBLETB"
+
+RULES_VERSION = 1
+"""Must be changed when a change to the rules changes the values of positions."""
+
+ENCODING_VERSION = 3
+"""Must be changed when the ranks of positions or the layout of the file change."""
+
+_HEADER = struct.Struct("<8sHHQQQQ")
+"""The magic bytes, RULES_VERSION, ENCODING_VERSION, the number of ranks, the
+number of positions, the flags and the number of overflow distances."""
+
+HEADER_SIZE = 64
+"""The size reserved for the header, which keeps the arrays aligned."""
+
+HAS_DISTANCES = 1
+"""The flag of a file that holds the distances."""
+
+OVERFLOW = 255
+"""The stored distance of a position whose distance is in the overflow arrays."""
+
+_MISSING = 0
+"""The value code of a rank that isn't in the tablebase."""
+
+_VALUES_PER_BYTE = 4
+
+
+def _padded(size: int) -> int:
+    return -(-size // 8) * 8
+
+
+def _values_size(rank_count: int) -> int:
+    """Returns the bytes used by the packed values."""
+    return _padded(-(-rank_count // _VALUES_PER_BYTE))
+
+
+def write(path: str, solution: Solution, distances: bool = True):
+    """Writes the positions of a solution to a tablebase file, with their distances
+    unless distances is False."""
+    rank_count = ranking.RANK_COUNT
+    ranks = ranking.rank_boards(*split_keys(solution.keys))
+
+    decided = solution.values != Value.DRAW.value
+    overflow = decided & (solution.distances >= OVERFLOW)
+    order = np.argsort(ranks[overflow])
+    overflow_ranks = ranks[overflow][order].astype("<u8")
+    overflow_distances = solution.distances[overflow][order].astype("<i4")
+
+    flags = HAS_DISTANCES if distances else 0
+    values_offset = HEADER_SIZE
+    distances_offset = values_offset + _values_size(rank_count)
+    overflow_offset = distances_offset + _padded(rank_count)
+    with open(path, "wb") as file:
+        header = _HEADER.pack(
+            MAGIC,
+            RULES_VERSION,
+            ENCODING_VERSION,
+            rank_count,
+            len(solution.keys),
+            flags,
+            len(overflow_ranks) if distances else 0,
+        )
+        file.write(header.ljust(HEADER_SIZE, b"\0"))
+        if distances:
+            file.truncate(overflow_offset)
+            file.seek(overflow_offset)
+            file.write(overflow_ranks.tobytes())
+            file.write(overflow_distances.tobytes())
+        else:
+            file.truncate(distances_offset)
+
+    if len(solution.keys) == 0:
+        return
+
+    codes = solution.values.astype(np.uint8) + 1
+    shifts = (2 * (ranks % _VALUES_PER_BYTE)).astype(np.uint8)
+    packed = np.memmap(
+        path,
+        dtype="u1",
+        mode="r+",
+        offset=values_offset,
+        shape=_values_size(rank_count),
+    )
+    np.bitwise_or.at(packed, ranks // _VALUES_PER_BYTE, codes << shifts)
+    packed.flush()
+    del packed
+
+    if distances:
+        stored = np.memmap(
+            path, dtype="u1", mode="r+", offset=distances_offset, shape=rank_count
+        )
+        stored[ranks[decided]] = np.minimum(solution.distances[decided], OVERFLOW)
+        stored.flush()
+
+
+class Tablebase:
+    """A read only view of a tablebase file."""
+
+    path: str
+
+    values: np.memmap
+    """The packed value codes, see the module docstring."""
+
+    distances: np.memmap
+    """The stored distance of each rank, or None if the file has no distances."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(path, "rb") as file:
+            header = file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is not a tablebase")
+
+        magic, rules_version, encoding_version, rank_count, count, flags, overflow = (
+            _HEADER.unpack_from(header)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a tablebase")
+        if rules_version != RULES_VERSION or encoding_version != ENCODING_VERSION:
+            raise ValueError(
+                f"{path} has rules version {rules_version} and encoding version"
+                f" {encoding_version}, expected {RULES_VERSION} and {ENCODING_VERSION}"
+            )
+        if rank_count != ranking.RANK_COUNT:
+            raise ValueError(f"{path} has {rank_count} ranks, not {ranking.RANK_COUNT}")
+
+        self._count = count
+        offset = HEADER_SIZE
+        self.values = self._map("u1", offset, _values_size(rank_count))
+        offset += _values_size(rank_count)
+
+        self.distances = None
+        self._overflow_ranks = None
+        self._overflow_distances = None
+        if flags & HAS_DISTANCES:
+            self.distances = self._map("u1", offset, rank_count)
+            offset += _padded(rank_count)
+            self._overflow_ranks = self._map("<u8", offset, overflow)
+            offset += 8 * overflow
+            self._overflow_distances = self._map("<i4", offset, overflow)
+
+    def _map(self, dtype: str, offset: int, count: int) -> np.ndarray:
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=count)
+
+    def __len__(self):
+        """The number of positions in the tablebase."""
+        return self._count
+
+    @property
+    def has_distances(self) -> bool:
+        return self.distances is not None
+
+    def value_codes(self, ranks: np.ndarray) -> np.ndarray:
+        """Returns the value code of each rank in an array, see the module
+        docstring."""
+        shifts = (2 * (ranks % _VALUES_PER_BYTE)).astype(np.uint8)
+        return (self.values[ranks // _VALUES_PER_BYTE] >> shifts) & 3
+
+    def _code(self, index: int) -> int:
+        byte = int(self.values[index // _VALUES_PER_BYTE])
+        return (byte >> 2 * (index % _VALUES_PER_BYTE)) & 3
+
+    def lookup(self, state: State) -> Value:
+        """Returns the value of a position for the player to play, or None if the
+        position isn't in the tablebase."""
+        code = self._code(ranking.rank(state))
+        return None if code == _MISSING else Value(code - 1)
+
+    def distances_of(self, ranks: np.ndarray) -> np.ndarray:
+        """Returns the distance of each rank in an array, with NO_DISTANCE for draws
+        and ranks that aren't in the tablebase."""
+        if not self.has_distances:
+            raise ValueError(f"{self.path} was written without distances")
+
+        codes = self.value_codes(ranks)
+        decided = (codes != _MISSING) & (codes != Value.DRAW.value + 1)
+        result = self.distances[ranks].astype(np.int32)
+        result[~decided] = NO_DISTANCE
+        overflow = decided & (result == OVERFLOW)
+        slots = np.searchsorted(self._overflow_ranks, ranks[overflow].astype(np.uint64))
+        result[overflow] = self._overflow_distances[slots]
+        return result
+
+    def distance(self, state: State) -> int:
+        """Returns the number of plies until the game ends with best play,
+        NO_DISTANCE for draws, or None if the position isn't in the tablebase."""
+        if not self.has_distances:
+            raise ValueError(f"{self.path} was written without distances")
+
+        index = ranking.rank(state)
+        code = self._code(index)
+        if code == _MISSING:
+            return None
+        if code == Value.DRAW.value + 1:
+            return NO_DISTANCE
+
+        distance = int(self.distances[index])
+        if distance == OVERFLOW:
+            i = int(np.searchsorted(self._overflow_ranks, np.uint64(index)))
+            distance = int(self._overflow_distances[i])
+        return distance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up the empty board.")
+    parser.add_argument("path", help="The tablebase file.")
+    args = parser.parse_args()
+
+    tablebase = Tablebase(args.path)
+    root = State(Player.ORANGE, pieces=[])
+    print(f"{len(tablebase)} positions")
+    print(
+        f"Empty board: {tablebase.lookup(root).name} for {root.to_play.name}"
+        f" in {tablebase.distance(root)} plies"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""A fixed size transposition table for search results.
+
+Entries are stored in NumPy arrays that are allocated once, so the memory used by
+the table does not grow during a search. Each entry is found from the 64-bit key of
+a position, see State.key, and stores the full key so that a probe never returns
+the result of a different position."""
+
+from enum import Enum
+
+import numpy as np
+
+from goblet_gobblers.solver.hashing import mix
+
+EMPTY = 0
+"""The flag of a slot that does not hold an entry."""
+
+EXACT = 1
+"""The flag of an entry whose value is exact."""
+
+LOWER = 2
+"""The flag of an entry whose value is a lower bound, i.e., the search failed high."""
+
+UPPER = 3
+"""The flag of an entry whose value is an upper bound, i.e., the search failed low."""
+
+NO_MOVE = -1
+
+
+class Replacement(Enum):
+    """How the table decides which entry to keep when two positions map to the same
+    bucket."""
+
+    ALWAYS = "always"
+    """Each bucket has one slot and a new entry always replaces the old one."""
+
+    DEPTH = "depth"
+    """Each bucket has one slot and a new entry only replaces an entry for another
+    position if it was searched at least as deep."""
+
+    TWO_TIER = "two_tier"
+    """Each bucket has a depth preferred slot and an always replace slot. An entry
+    that is pushed out of the depth preferred slot moves to the always replace
+    slot."""
+
+
+class Entry:
+    """The result stored for a position."""
+
+    value: int
+    depth: int
+    flag: int
+    move: int
+
+    def __init__(self, value: int, depth: int, flag: int, move: int):
+        self.value = value
+        self.depth = depth
+        self.flag = flag
+        self.move = move
+
+    def __repr__(self):
+        return (
+            f"Entry(value={self.value}, depth={self.depth}, flag={self.flag},"
+            f" move={self.move})"
+        )
+
+
+class TranspositionTable:
+    capacity: int
+    """The number of entries the table can hold."""
+
+    replacement: Replacement
+
+    probes: int
+    """The number of calls to probe."""
+
+    hits: int
+    """The number of calls to probe that found an entry."""
+
+    collisions: int
+    """The number of calls to probe that didn't find an entry because the bucket
+    was holding other positions."""
+
+    def __init__(self, capacity: int, replacement: Replacement = Replacement.TWO_TIER):
+        self.replacement = replacement
+        self._ways = 2 if replacement == Replacement.TWO_TIER else 1
+        self._buckets = max(1, capacity // self._ways)
+        self.capacity = self._buckets * self._ways
+
+        self._keys = np.zeros(shape=(self._buckets, self._ways), dtype=np.uint64)
+        self._values = np.zeros(shape=(self._buckets, self._ways), dtype=np.int16)
+        self._depths = np.zeros(shape=(self._buckets, self._ways), dtype=np.int16)
+        self._flags = np.zeros(shape=(self._buckets, self._ways), dtype=np.uint8)
+        self._moves = np.zeros(shape=(self._buckets, self._ways), dtype=np.int32)
+
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self._flags))
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the entries."""
+        return sum(
+            a.nbytes
+            for a in [self._keys, self._values, self._depths, self._flags, self._moves]
+        )
+
+    def clear(self):
+        self._flags[:] = EMPTY
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+
+    def _bucket(self, key: int) -> int:
+        return mix(key) % self._buckets
+
+    def _find(self, bucket: int, key: int) -> int:
+        """Returns the slot in the bucket that holds key, or -1."""
+        for way in range(self._ways):
+            if self._flags[bucket, way] != EMPTY and self._keys[bucket, way] == key:
+                return way
+
+        return -1
+
+    def probe(self, key: int) -> Entry:
+        """Returns the Entry for a position, or None if the table does not hold
+        one."""
+        self.probes += 1
+
+        bucket = self._bucket(key)
+        way = self._find(bucket, key)
+        if way < 0:
+            if self._flags[bucket, 0] != EMPTY:
+                self.collisions += 1
+            return None
+
+        self.hits += 1
+        return Entry(
+            int(self._values[bucket, way]),
+            int(self._depths[bucket, way]),
+            int(self._flags[bucket, way]),
+            int(self._moves[bucket, way]),
+        )
+
+    def store(self, key: int, value: int, depth: int, flag: int, move: int = NO_MOVE):
+        """Stores the result of searching a position to the given depth. Depending
+        on the replacement policy the result may be dropped."""
+        bucket = self._bucket(key)
+        way = self._find(bucket, key)
+
+        if way < 0:
+            way = self._choose_slot(bucket, depth)
+            if way < 0:
+                return
+
+        self._keys[bucket, way] = key
+        self._values[bucket, way] = value
+        self._depths[bucket, way] = depth
+        self._flags[bucket, way] = flag
+        self._moves[bucket, way] = move
+
+    def _choose_slot(self, bucket: int, depth: int) -> int:
+        """Returns the slot to use for a position that is not in the bucket, or -1
+        if the new entry should be dropped."""
+        empty = self._flags[bucket, 0] == EMPTY
+        if self.replacement == Replacement.ALWAYS:
+            return 0
+
+        if self.replacement == Replacement.DEPTH:
+            return 0 if empty or depth >= self._depths[bucket, 0] else -1
+
+        # Two tier. Demote the entry in the depth preferred slot if the new one is at
+        # least as deep.
+        if empty:
+            return 0
+
+        if depth >= self._depths[bucket, 0]:
+            for a in [self._keys, self._values, self._depths, self._flags, self._moves]:
+                a[bucket, 1] = a[bucket, 0]
+            return 0
+
+        return 1
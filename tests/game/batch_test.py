@@ -0,0 +1,114 @@
+"""Tests for the vectorized batch operations."""
+
+import random
+
+import numpy as np
+
+from goblet_gobblers.game import batch
+from goblet_gobblers.game.state import State, Piece, Player
+
+
+def random_states(count: int, seed: int) -> list[State]:
+    """Returns states found by playing random games."""
+    rng = random.Random(seed)
+    states = []
+    while len(states) < count:
+        state = State(Player.ORANGE, pieces=[])
+        for _ in range(rng.randrange(30)):
+            if state.is_win() is not None:
+                break
+            state = state.play(*rng.choice(state.valid_moves()))
+        states.append(state)
+
+    return states
+
+
+def to_batch(states: list[State]):
+    boards = np.array([state._board for state in states], dtype=np.int8)
+    to_play = np.array([state.to_play.value for state in states], dtype=np.int8)
+    return boards, to_play
+
+
+def test_valid_moves_matches_state():
+    """The batch moves are the same as State.valid_moves, in the same order."""
+
+    states = random_states(200, seed=5)
+    boards, to_play = to_batch(states)
+    parent, piece, from_cell, to_cell = batch.valid_moves(boards, to_play)
+
+    expected = []
+    for i, state in enumerate(states):
+        for move_piece, from_row, from_col, to_row, to_col in state.valid_moves():
+            from_square = batch.HAND if from_row is None else 3 * from_row + from_col
+            expected.append((i, move_piece.value, from_square, 3 * to_row + to_col))
+
+    actual = list(
+        zip(parent.tolist(), piece.tolist(), from_cell.tolist(), to_cell.tolist())
+    )
+    assert actual == expected
+
+
+def test_valid_moves_empty_board():
+    """Test the moves on the empty board for each player."""
+
+    boards = np.zeros(shape=(2, 9), dtype=np.int8)
+    to_play = np.array([Player.ORANGE.value, Player.BLUE.value], dtype=np.int8)
+    parent, piece, from_cell, to_cell = batch.valid_moves(boards, to_play)
+
+    assert list(np.bincount(parent)) == [27, 27]
+    assert set(piece[parent == 1].tolist()) == {
+        Piece.BLUE_BIG.value,
+        Piece.BLUE_MEDIUM.value,
+        Piece.BLUE_SMALL.value,
+    }
+    assert np.all(from_cell == batch.HAND)
+
+    parent, piece, from_cell, to_cell = batch.valid_moves(boards[:0], to_play[:0])
+    assert len(parent) == 0
+
+
+def test_play_matches_state():
+    """Playing the batch moves gives the same positions as State.play."""
+
+    states = random_states(100, seed=11)
+    boards, to_play = to_batch(states)
+    moves = batch.valid_moves(boards, to_play)
+    children, next_to_play = batch.play(boards, to_play, *moves)
+    keys = batch.canonical_keys(children)
+
+    expected = [state.play(*move) for state in states for move in state.valid_moves()]
+    assert keys.tolist() == [child._key for child in expected]
+    assert next_to_play.tolist() == [child.to_play.value for child in expected]
+    assert np.array_equal(
+        batch.boards_from_keys(keys), np.array([child._board for child in expected])
+    )
+
+
+def test_is_win_matches_state():
+    """The batch win check gives the same result as State.is_win."""
+
+    states = random_states(300, seed=17)
+    states.append(
+        State(
+            Player.ORANGE,
+            pieces=[
+                (1, 0, Piece.BLUE_SMALL),
+                (1, 1, Piece.BLUE_SMALL),
+                (1, 2, Piece.BLUE_MEDIUM),
+                (2, 0, Piece.ORANGE_SMALL),
+                (2, 1, Piece.ORANGE_SMALL),
+                (2, 2, Piece.ORANGE_MEDIUM),
+            ],
+        )
+    )
+    boards, to_play = to_batch(states)
+    winner = batch.is_win(boards, to_play)
+
+    expected = [state.is_win() for state in states]
+    assert winner.tolist() == [0 if w is None else w.value for w in expected]
+    assert winner[-1] == Player.BLUE.value
+
+    # The same board with the other player to play
+    assert batch.is_win(boards[-1:], np.array([Player.BLUE.value]))[0] == (
+        Player.ORANGE.value
+    )
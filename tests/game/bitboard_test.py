@@ -0,0 +1,83 @@
+"""Tests for the bitboard helpers."""
+
+import numpy as np
+
+from goblet_gobblers.game import bitboard
+from goblet_gobblers.game.state import State, Piece, Player
+
+
+def test_planes_round_trip():
+    """Test converting between boards and planes."""
+
+    board = np.array([0x24, 0x42, 0, 0x01, 0x03, 0x40, 0x14, 0x20, 0], dtype=np.int8)
+    planes = bitboard.planes_from_board(board)
+
+    assert planes == (
+        0b000011000,
+        0b000010010,
+        0b001000001,
+        0b001000000,
+        0b010000001,
+        0b000100010,
+    )
+    assert np.array_equal(bitboard.board_from_planes(planes), board)
+
+
+def test_top_and_owner_masks():
+    """Test finding the visible pieces and who owns each square."""
+
+    # Square 0 has a blue small under an orange medium under a blue big. Square 1
+    # has an orange small under a blue medium. Square 2 has an orange small.
+    board = np.array([0x52, 0x21, 0x01, 0, 0, 0, 0, 0, 0], dtype=np.int8)
+    planes = bitboard.planes_from_board(board)
+
+    assert bitboard.top_masks(planes) == (0b100, 0, 0, 0, 0b010, 0b001)
+    assert bitboard.owner_masks(planes) == (0b100, 0b011)
+    assert bitboard.covering_masks(planes) == (0b111, 0b011, 0b001)
+
+
+def test_has_line():
+    """Test detecting lines of three."""
+
+    assert bitboard.has_line(0b000111000)
+    assert bitboard.has_line(0b101010100)
+    assert not bitboard.has_line(0b110110000)
+    assert not bitboard.has_line(0)
+
+
+def test_state_planes():
+    """Test that the planes of a State match its board."""
+
+    state = State(
+        Player.ORANGE,
+        pieces=[(0, 0, Piece.ORANGE_BIG), (1, 1, Piece.BLUE_SMALL)],
+    )
+    assert np.array_equal(bitboard.board_from_planes(state._planes), state._board)
+
+
+def test_owner_of_value():
+    """Test the owner of a square."""
+
+    assert bitboard.OWNER_OF_VALUE[0] == bitboard.NOBODY
+    assert bitboard.OWNER_OF_VALUE[0x01] == bitboard.ORANGE + 1
+    assert bitboard.OWNER_OF_VALUE[0x12] == bitboard.ORANGE + 1
+    assert bitboard.OWNER_OF_VALUE[0x24] == bitboard.ORANGE + 1
+    assert bitboard.OWNER_OF_VALUE[0x21] == bitboard.BLUE + 1
+    assert bitboard.OWNER_OF_VALUE[0x63] == bitboard.BLUE + 1
+
+
+def test_winner_of_pattern():
+    """Test the winner of owner patterns."""
+
+    orange_row = 1 + 3 + 9
+    blue_column = 2 * (3**2 + 3**5 + 3**8)
+
+    for to_play in [bitboard.ORANGE, bitboard.BLUE]:
+        assert bitboard.WINNER_OF_PATTERN[to_play, 0] == bitboard.NOBODY
+        assert bitboard.WINNER_OF_PATTERN[to_play, orange_row] == bitboard.ORANGE + 1
+        assert bitboard.WINNER_OF_PATTERN[to_play, blue_column] == bitboard.BLUE + 1
+
+    # Square 2 can't be owned by both players, so move the blue column over.
+    both = orange_row + 2 * (3**3 + 3**4 + 3**5)
+    assert bitboard.WINNER_OF_PATTERN[bitboard.ORANGE, both] == bitboard.BLUE + 1
+    assert bitboard.WINNER_OF_PATTERN[bitboard.BLUE, both] == bitboard.ORANGE + 1
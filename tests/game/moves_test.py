@@ -0,0 +1,66 @@
+"""Tests for the packed moves and MoveList."""
+
+import random
+from array import array
+
+import pytest
+
+from goblet_gobblers.game import moves
+from goblet_gobblers.game.moves import HAND, MAX_MOVES, MoveList
+from goblet_gobblers.game.position import Position
+from goblet_gobblers.game.state import State, Piece, Player
+
+
+def test_tuple_round_trip():
+    """Moves convert to and from the tuples of State.valid_moves."""
+    state = State(
+        Player.ORANGE,
+        pieces=[(0, 0, Piece.ORANGE_BIG), (1, 1, Piece.BLUE_MEDIUM)],
+    )
+    for move in state.valid_moves():
+        assert moves.to_tuple(moves.from_tuple(move)) == move
+
+    move = moves.from_tuple((Piece.BLUE_MEDIUM, None, None, 2, 1))
+    assert moves.decode_move(move) == (4, HAND, 7)
+
+
+def test_move_list():
+    """A MoveList behaves like a list of the moves put in it."""
+    move_list = MoveList()
+    assert len(move_list) == 0
+    assert list(move_list) == []
+
+    move_list.append(5)
+    move_list.extend(array(moves.TYPECODE, [7, 9]))
+    assert len(move_list) == 3
+    assert list(move_list) == [5, 7, 9]
+    assert move_list.tolist() == [5, 7, 9]
+    assert move_list[0] == 5
+    assert move_list[-1] == 9
+    assert 7 in move_list
+    assert 0 not in move_list
+    with pytest.raises(IndexError):
+        move_list[3]
+
+    move_list.clear()
+    assert len(move_list) == 0
+    assert 5 not in move_list
+
+
+def test_valid_moves_into_move_list():
+    """Position.valid_moves gives the same moves in a reused MoveList as in a new
+    list, and never more than MAX_MOVES."""
+    rng = random.Random(7)
+    move_list = MoveList()
+    for _ in range(20):
+        position = Position()
+        for _ in range(30):
+            if position.is_win() is not None:
+                break
+
+            expected = position.valid_moves()
+            assert len(expected) <= MAX_MOVES
+            assert position.valid_moves(move_list) is move_list
+            assert move_list.tolist() == expected
+
+            position.make_move(rng.choice(expected))
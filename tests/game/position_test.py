@@ -0,0 +1,184 @@
+"""Tests for the mutable Position."""
+
+import random
+
+from goblet_gobblers.game import bitboard, symmetry
+from goblet_gobblers.game.position import Position, decode_move, encode_move, HAND
+from goblet_gobblers.game.state import State, Piece, Player
+
+
+def test_encode_decode():
+    """Moves round trip through their integer encoding."""
+    for plane in range(6):
+        for from_cell in range(HAND, 9):
+            for to_cell in range(9):
+                move = encode_move(plane, from_cell, to_cell)
+                assert decode_move(move) == (plane, from_cell, to_cell)
+
+
+def test_matches_state():
+    """Making moves gives the same children, winner, key and hash as playing them
+    on States."""
+
+    rng = random.Random(31)
+    for _ in range(30):
+        state = State(Player.ORANGE, pieces=[])
+        position = Position(state)
+        for _ in range(25):
+            assert position.to_play == state.to_play
+            assert position.is_win() == state.is_win()
+            assert position.key() == state.key()
+            assert position.zobrist_hash() == state.zobrist_hash()
+
+            if state.is_win() is not None:
+                break
+
+            moves = position.valid_moves()
+            children = []
+            for move in moves:
+                assert position.move_from_tuple(position.move_to_tuple(move)) == move
+                position.make_move(move)
+                children.append(position.key())
+                assert position.unmake_move() == move
+
+            expected = [state.play(*move).key() for move in state.valid_moves()]
+            assert sorted(children) == sorted(expected)
+
+            # The position isn't canonicalized after a move, so the moves are only
+            # the same as the State's on the cannonical board.
+            if position._board_key == state._key:
+                tuples = [position.move_to_tuple(move) for move in moves]
+                assert tuples == state.valid_moves()
+
+            move = rng.choice(moves)
+            position.make_move(move)
+            state = position.to_state()
+
+
+def test_unmake_restores_position():
+    """Unmaking every move puts back the original board, player and keys."""
+
+    rng = random.Random(37)
+    state = State(
+        Player.BLUE,
+        pieces=[(0, 0, Piece.ORANGE_BIG), (1, 1, Piece.BLUE_SMALL)],
+    )
+    position = Position(state)
+    start = (
+        list(position._planes),
+        position._player,
+        position._board_key,
+        list(position._zobrist),
+    )
+
+    for _ in range(15):
+        if position.is_win() is not None:
+            break
+        position.make_move(rng.choice(position.valid_moves()))
+    assert position.ply > 0
+
+    while position.ply > 0:
+        position.unmake_move()
+
+    assert start == (
+        list(position._planes),
+        position._player,
+        position._board_key,
+        list(position._zobrist),
+    )
+
+
+def _with_board(key: int, to_play: Player) -> Position:
+    """Returns a Position with a board that isn't canonicalized."""
+    board = symmetry.unpack(key)
+    position = Position(State(to_play, initial_board=board.copy()))
+    position._images = position._symmetry_tables.packed_images(key)
+    position._planes = list(bitboard.planes_from_board(board))
+    return position
+
+
+def test_move_symmetry():
+    """A move converted to an equivalent board gives the equivalent child, and
+    converts back to the original move."""
+
+    state = State(
+        Player.ORANGE,
+        pieces=[(0, 1, Piece.ORANGE_MEDIUM), (2, 2, Piece.BLUE_BIG)],
+    )
+    position = Position(state)
+    tables = position._symmetry_tables
+    for s in range(8):
+        image = _with_board(
+            tables.equivalent_keys(position._board_key)[s], Player.ORANGE
+        )
+        for move in position.valid_moves():
+            moved = position.move_to_symmetry(move, s)
+            assert position.move_from_symmetry(moved, s) == move
+            assert moved in image.valid_moves()
+
+            position.make_move(move)
+            image.make_move(moved)
+            assert tables.equivalent_keys(position._board_key)[s] == image._board_key
+            position.unmake_move()
+            image.unmake_move()
+
+
+def test_images_follow_moves():
+    """The symmetric images kept by a Position are the ones computed from scratch
+    for its board after every move, and give the key of the cannonical board."""
+
+    rng = random.Random(41)
+    position = Position()
+    tables = position._symmetry_tables
+    for _ in range(40):
+        if position.is_win() is not None:
+            break
+
+        position.make_move(rng.choice(position.valid_moves()))
+        board_key = symmetry.pack(bitboard.board_from_planes(tuple(position._planes)))
+        assert position._images == tables.packed_images(board_key)
+        assert position.key() & ~symmetry.TO_PLAY_BIT == tables.canonical(board_key)[0]
+        assert position.to_state() == State(
+            position.to_play, initial_board=symmetry.unpack(board_key)
+        )
+
+
+def test_distinct_moves():
+    """distinct_moves keeps one move for each distinct child and counts the moves
+    that reach it."""
+
+    position = Position()
+    assert position.stabilizer() == list(range(8))
+
+    # On the empty board each piece can go in a corner, an edge or the center.
+    distinct = position.distinct_moves()
+    assert len(distinct) == 9
+    assert sorted(count for _, count in distinct) == [1, 1, 1, 4, 4, 4, 4, 4, 4]
+
+    last = position.valid_moves()[-1]
+    assert position.distinct_moves(first=last)[0] == (last, 4)
+
+    rng = random.Random(43)
+    for _ in range(20):
+        position = Position()
+        for _ in range(20):
+            if position.is_win() is not None:
+                break
+
+            moves = position.valid_moves()
+            children = {}
+            for move in moves:
+                position.make_move(move)
+                children[position.key()] = children.get(position.key(), 0) + 1
+                position.unmake_move()
+
+            distinct = position.distinct_moves()
+            found = {}
+            for move, count in distinct:
+                position.make_move(move)
+                found[position.key()] = count
+                position.unmake_move()
+            assert found == children
+            assert len(found) == len(distinct)
+
+            position.make_move(rng.choice(moves))
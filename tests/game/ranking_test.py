@@ -0,0 +1,62 @@
+"""Tests for ranking and unranking positions."""
+
+import numpy as np
+import pytest
+
+from goblet_gobblers.game import ranking
+from goblet_gobblers.game.ranking import rank, rank_boards, unrank, RANK_COUNT
+from goblet_gobblers.game.state import State, Piece, Player
+from tests.game.batch_test import random_states, to_batch
+
+
+def test_counts():
+    """Each size has 1423 layers, and 2-bit results for every rank fit in a few
+    hundred MB."""
+    assert ranking.LAYER_COUNT == 1423
+    assert RANK_COUNT == len(ranking.BIG_ORBITS) * 1423 * 1423 * 2
+    assert RANK_COUNT // 4 < 300 * 1024 * 1024
+
+
+def test_round_trip():
+    """unrank undoes rank, and the batch version gives the same ranks."""
+
+    states = random_states(500, seed=41)
+    ranks = [rank(state) for state in states]
+    for state, index in zip(states, ranks):
+        assert 0 <= index < RANK_COUNT
+        assert unrank(index) == state
+
+    assert rank_boards(*to_batch(states)).tolist() == ranks
+
+
+def test_equivalent_positions():
+    """Equivalent positions have the same rank and other positions differ."""
+
+    corners = [(0, 0), (0, 2), (2, 0), (2, 2)]
+    ranks = {
+        rank(
+            State(
+                Player.BLUE,
+                pieces=[(row, col, Piece.BLUE_BIG), (1, 1, Piece.ORANGE_SMALL)],
+            )
+        )
+        for row, col in corners
+    }
+    assert len(ranks) == 1
+
+    orange = State(Player.ORANGE, pieces=[(0, 0, Piece.BLUE_BIG)])
+    blue = State(Player.BLUE, pieces=[(0, 0, Piece.BLUE_BIG)])
+    assert rank(orange) + 1 == rank(blue)
+
+    empty = State(Player.ORANGE, pieces=[])
+    assert unrank(rank(empty)) == empty
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        unrank(RANK_COUNT)
+
+    board = np.zeros(shape=(1, 9), dtype=np.int8)
+    board[0, :3] = Piece.ORANGE_SMALL.value
+    with pytest.raises(ValueError):
+        rank_boards(board, np.array([Player.ORANGE.value], dtype=np.int8))
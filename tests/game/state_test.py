@@ -1,5 +1,9 @@
 """Tests for the game State."""
 
+import gc
+import sys
+import weakref
+
 from goblet_gobblers.game.state import State, Piece, Player
 
 
@@ -785,3 +789,79 @@ def test_is_win_other():
     # An empty board is not a win.
     state = State(Player.ORANGE, pieces=[])
     assert state.is_win() == None
+
+
+def test_is_win_gobbled():
+    """Tests the is_win method where pieces in the line cover pieces of the other
+    player. The owner of a square is the player whose piece is on top."""
+
+    # Orange big pieces cover a blue medium and a blue small.
+    state = State(
+        Player.BLUE,
+        pieces=[
+            (0, 0, Piece.BLUE_MEDIUM),
+            (0, 0, Piece.ORANGE_BIG),
+            (1, 0, Piece.ORANGE_SMALL),
+            (2, 0, Piece.BLUE_SMALL),
+            (2, 0, Piece.ORANGE_BIG),
+        ],
+    )
+    assert state.is_win() == Player.ORANGE
+
+    # An orange medium covers a blue small.
+    state = State(
+        Player.ORANGE,
+        pieces=[
+            (1, 0, Piece.BLUE_SMALL),
+            (1, 0, Piece.ORANGE_MEDIUM),
+            (1, 1, Piece.ORANGE_SMALL),
+            (1, 2, Piece.ORANGE_SMALL),
+        ],
+    )
+    assert state.is_win() == Player.ORANGE
+
+    # A blue big covers an orange medium and a blue small.
+    state = State(
+        Player.ORANGE,
+        pieces=[
+            (1, 0, Piece.BLUE_SMALL),
+            (1, 0, Piece.ORANGE_MEDIUM),
+            (1, 0, Piece.BLUE_BIG),
+            (1, 1, Piece.ORANGE_SMALL),
+            (1, 2, Piece.ORANGE_SMALL),
+        ],
+    )
+    assert state.is_win() == None
+
+
+def test_intern():
+    """Test that interned equal states are the same object and that the shared
+    object is only held weakly."""
+    state1 = State(Player.BLUE, pieces=[(0, 0, Piece.ORANGE_BIG)]).intern()
+    state2 = State(Player.BLUE, pieces=[(2, 2, Piece.ORANGE_BIG)]).intern()
+    assert state1 is state2
+    assert State.from_key(state1.key()) is state1
+
+    other = State(Player.ORANGE, pieces=[(0, 0, Piece.ORANGE_BIG)]).intern()
+    assert other is not state1
+
+    key = state1.key()
+    reference = weakref.ref(state1)
+    del state1, state2
+    gc.collect()
+    assert reference() is None
+
+    state3 = State.from_key(key)
+    assert state3 == State(Player.BLUE, pieces=[(0, 2, Piece.ORANGE_BIG)])
+    assert State.from_key(key) is state3
+
+
+def test_small_state():
+    """Test that a State only stores its slots, and that the cached planes match
+    the board."""
+    state = State(Player.ORANGE).play(Piece.ORANGE_BIG, None, None, 1, 1)
+    assert not hasattr(state, "__dict__")
+    assert sys.getsizeof(state) <= 80
+
+    assert state._planes == (0, 0, 1 << 4, 0, 0, 0)
+    assert state._board.tolist() == [0, 0, 0, 0, 0x04, 0, 0, 0, 0]
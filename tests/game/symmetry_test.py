@@ -0,0 +1,68 @@
+"""Tests for the table driven canonicalization."""
+
+import random
+
+import numpy as np
+
+from goblet_gobblers.game import symmetry
+from goblet_gobblers.game.state import State, Player
+
+
+def random_board(rng: random.Random) -> np.ndarray:
+    """Returns a board where each square holds a random subset of the pieces."""
+    values = [rng.choice([0, 0x01, 0x02, 0x04, 0x10, 0x20, 0x40]) for _ in range(9)]
+    values = [v | rng.choice([0, 0, 0x20, 0x04]) for v in values]
+    return np.array(values, dtype=np.int8)
+
+
+def test_pack_round_trip():
+    """Test packing boards into keys."""
+
+    board = np.array([0x77, 0, 0x01, 0x10, 0x24, 0x42, 0, 0, 0x40], dtype=np.int8)
+    key = symmetry.pack(board)
+
+    assert key >> 56 == 0x77
+    assert key & 0x7F == 0x40
+    assert np.array_equal(symmetry.unpack(key), board)
+
+
+def test_key_order_is_lexographic():
+    """Comparing keys gives the same result as comparing boards."""
+
+    rng = random.Random(3)
+    state = State(Player.ORANGE, pieces=[])
+    for _ in range(200):
+        b1 = random_board(rng)
+        b2 = random_board(rng)
+        assert (symmetry.pack(b1) > symmetry.pack(b2)) == (
+            state._lexographic_greater_than(b1, b2)
+        )
+
+
+def test_canonical_matches_brute_force():
+    """The tables pick the same cannonical board as comparing all the equivalent
+    boards."""
+
+    rng = random.Random(7)
+    state = State(Player.ORANGE, pieces=[])
+    tables = symmetry.SymmetryTables(state.symmetries)
+
+    for _ in range(200):
+        board = random_board(rng)
+
+        equivalent = [board[sym] for sym in state.symmetries]
+        assert tables.equivalent_keys(symmetry.pack(board)) == [
+            symmetry.pack(b) for b in equivalent
+        ]
+
+        largest = equivalent[0]
+        for b in equivalent[1:]:
+            if state._lexographic_greater_than(b, largest):
+                largest = b
+
+        key, index = tables.canonical(symmetry.pack(board))
+        assert np.array_equal(symmetry.unpack(key), largest)
+        assert np.array_equal(equivalent[index], largest)
+        assert np.array_equal(
+            State(Player.ORANGE, initial_board=board.copy())._board, largest
+        )
@@ -0,0 +1,56 @@
+"""Tests for Zobrist hashing."""
+
+import random
+
+from goblet_gobblers.game.state import State, Piece, Player
+
+
+def test_hash_is_symmetric():
+    """Equivalent boards have the same hash and the player to play matters."""
+
+    corners = [(0, 0), (0, 2), (2, 0), (2, 2)]
+    hashes = {
+        State(
+            Player.ORANGE,
+            pieces=[(row, col, Piece.ORANGE_BIG), (1, col, Piece.BLUE_SMALL)],
+        ).zobrist_hash()
+        for row, col in corners
+    }
+    assert len(hashes) == 1
+
+    orange = State(Player.ORANGE, pieces=[(0, 0, Piece.ORANGE_BIG)])
+    blue = State(Player.BLUE, pieces=[(0, 0, Piece.ORANGE_BIG)])
+    medium = State(Player.ORANGE, pieces=[(0, 0, Piece.ORANGE_MEDIUM)])
+    assert orange.zobrist_hash() != blue.zobrist_hash()
+    assert orange.zobrist_hash() != medium.zobrist_hash()
+
+
+def test_incremental_keys_match_full_keys():
+    """The keys updated in play() are the keys of the cannonical board, in the same
+    order as computing them from scratch."""
+
+    rng = random.Random(23)
+    for _ in range(30):
+        state = State(Player.ORANGE, pieces=[])
+        for _ in range(20):
+            if state.is_win() is not None:
+                break
+
+            state = state.play(*rng.choice(state.valid_moves()))
+            fresh = State(state.to_play, initial_board=state._board.copy())
+            assert state.zobrist_keys() == fresh.zobrist_keys()
+
+
+def test_compose():
+    """Test composing symmetries."""
+
+    state = State(Player.ORANGE, pieces=[])
+    symmetries = state.symmetries
+    compose = state._symmetry_tables.compose
+
+    for t in range(8):
+        assert compose[t][0] == t
+        assert compose[0][t] == t
+        for g in range(8):
+            composed = symmetries[compose[t][g]]
+            assert composed == [symmetries[g][symmetries[t][i]] for i in range(9)]
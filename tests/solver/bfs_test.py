@@ -0,0 +1,34 @@
+"""Tests for the breadth first enumeration."""
+
+import numpy as np
+
+from goblet_gobblers.game.state import State, Player
+from goblet_gobblers.solver import bfs, retrograde
+
+
+def test_first_plies():
+    """The first move puts one of three pieces in a corner, an edge or the
+    center."""
+
+    stats = list(bfs.plies(max_ply=2))
+    assert [s.ply for s in stats] == [0, 1, 2]
+    assert [s.positions for s in stats] == [1, 9, 117]
+    assert [s.total for s in stats] == [1, 10, 127]
+    assert stats[0].branching == 9
+    assert stats[1].terminal == 0
+
+
+def test_matches_retrograde():
+    """The plies hold every reachable position exactly once."""
+
+    inventory = (1, 0, 1, 1, 0, 1)
+    keys, _, _, terminal = retrograde.enumerate_positions(
+        State(Player.ORANGE, pieces=[]), inventory
+    )
+
+    stats = list(bfs.plies(inventory=inventory))
+    found = np.concatenate([s.keys for s in stats])
+    assert len(found) == len(keys)
+    assert np.array_equal(np.sort(found), keys)
+    assert sum(s.terminal for s in stats) == np.count_nonzero(terminal)
+    assert stats[-1].total == len(keys)
@@ -0,0 +1,127 @@
+"""Tests for the df-pn solver."""
+
+import numpy as np
+
+from goblet_gobblers.game.state import State, Piece, Player
+from goblet_gobblers.solver.dfpn import DfpnSolver, ProofTable, Result
+from goblet_gobblers.solver.retrograde import Value
+from goblet_gobblers.solver.search import Searcher
+
+
+def test_win_in_one():
+    """A move that completes a line proves the position after one expansion."""
+
+    state = State(
+        Player.ORANGE,
+        pieces=[
+            (0, 0, Piece.ORANGE_BIG),
+            (0, 1, Piece.ORANGE_BIG),
+            (1, 1, Piece.BLUE_BIG),
+            (2, 2, Piece.BLUE_BIG),
+        ],
+    )
+    solver = DfpnSolver(table_capacity=1 << 10)
+
+    assert solver.prove(state) == Result.PROVEN
+    assert solver.nodes == 1
+    assert solver.value(state) == Value.WIN
+
+
+def test_loss_in_two():
+    """If the opponent has two threats that can't both be stopped, the position is
+    disproved for the player to play and proved for the opponent."""
+
+    state = State(
+        Player.BLUE,
+        pieces=[
+            (0, 0, Piece.ORANGE_BIG),
+            (0, 1, Piece.ORANGE_BIG),
+            (1, 0, Piece.ORANGE_MEDIUM),
+            (1, 1, Piece.BLUE_MEDIUM),
+            (2, 2, Piece.BLUE_SMALL),
+            (2, 2, Piece.ORANGE_MEDIUM),
+        ],
+    )
+    solver = DfpnSolver(table_capacity=1 << 10)
+
+    assert solver.prove(state) == Result.DISPROVEN
+    assert solver.prove(state, Player.ORANGE) == Result.PROVEN
+    assert solver.value(state) == Value.LOSS
+
+
+def test_deeper_than_search():
+    """df-pn proves a win that the alpha-beta search only finds at depth 9."""
+
+    board = np.array([0x20, 0, 0x12, 0, 0, 0, 0, 0, 0], dtype=np.int8)
+    state = State(Player.ORANGE, initial_board=board)
+
+    assert Searcher().search(state, max_depth=6).score == 0
+    assert DfpnSolver(table_capacity=1 << 12).prove(state) == Result.PROVEN
+
+
+def test_cycles():
+    """With every piece on the board the players can only move pieces around, so
+    positions repeat. Repetitions are draws and a small table gives the same
+    results."""
+
+    # Orange wins in seven plies.
+    board = np.array([0x40, 0x16, 0x01, 0x06, 0, 0x30, 0, 0x40, 0x21], dtype=np.int8)
+    state = State(Player.ORANGE, initial_board=board)
+    assert DfpnSolver(table_capacity=1 << 12).value(state) == Value.WIN
+    assert DfpnSolver(table_capacity=64).value(state) == Value.WIN
+
+    # Neither player can force a win.
+    board = np.array([0x43, 0x04, 0x30, 0, 0x40, 0x25, 0x12, 0, 0], dtype=np.int8)
+    state = State(Player.ORANGE, initial_board=board)
+    assert DfpnSolver(table_capacity=1 << 12).value(state) == Value.DRAW
+    assert DfpnSolver(table_capacity=64).value(state) == Value.DRAW
+
+
+def test_node_limit():
+    """The solver gives up after max_nodes expansions."""
+
+    solver = DfpnSolver(table_capacity=1 << 12, max_nodes=50)
+    assert solver.prove(State(Player.ORANGE, pieces=[])) == Result.UNKNOWN
+    assert solver.nodes == 50
+
+
+def test_proof_table():
+    """The table keeps the entry that took more work when two positions share a
+    slot, and never returns the numbers of another position."""
+
+    table = ProofTable(1)
+    assert table.lookup(5) is None
+
+    table.store(5, 1, 2, work=10)
+    assert table.lookup(5) == (1, 2)
+    assert table.lookup(6) is None
+
+    table.store(6, 3, 4, work=1)
+    assert table.lookup(5) == (1, 2)
+
+    table.store(6, 3, 4, work=10)
+    assert table.lookup(6) == (3, 4)
+    assert table.lookup(5) is None
+    assert len(table) == 1
+
+
+def test_game_over():
+    """A root where a player already has a line is proved for that player without
+    any expansions."""
+
+    state = State(
+        Player.ORANGE,
+        pieces=[
+            (0, 0, Piece.BLUE_BIG),
+            (0, 1, Piece.BLUE_BIG),
+            (0, 2, Piece.BLUE_MEDIUM),
+            (1, 1, Piece.ORANGE_BIG),
+        ],
+    )
+    assert state.is_win() == Player.BLUE
+
+    solver = DfpnSolver(table_capacity=1 << 10)
+    assert solver.prove(state) == Result.DISPROVEN
+    assert solver.prove(state, Player.BLUE) == Result.PROVEN
+    assert solver.nodes == 0
+    assert solver.value(state) == Value.LOSS
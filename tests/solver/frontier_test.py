@@ -0,0 +1,119 @@
+"""Tests for the disk backed frontier store."""
+
+import tracemalloc
+
+import numpy as np
+
+from goblet_gobblers.solver import bfs
+from goblet_gobblers.solver.frontier import FrontierStore, difference, merge
+
+
+def chunked(keys: np.ndarray, size: int) -> list:
+    return [keys[i : i + size] for i in range(0, len(keys), size)]
+
+
+def random_keys(rng, count: int) -> np.ndarray:
+    return np.unique(rng.integers(0, 5000, size=count).astype(np.uint64))
+
+
+def test_merge_and_difference():
+    """Merging and subtracting chunked streams gives the same keys as working on
+    whole arrays."""
+
+    rng = np.random.default_rng(3)
+    runs = [random_keys(rng, 700) for _ in range(4)]
+    removed = random_keys(rng, 2000)
+
+    merged = list(merge([chunked(run, 37) for run in runs]))
+    assert all(len(chunk) > 0 for chunk in merged)
+    expected = np.unique(np.concatenate(runs))
+    assert np.array_equal(np.concatenate(merged), expected)
+
+    kept = np.concatenate(list(difference(merged, chunked(removed, 51))))
+    assert np.array_equal(kept, np.setdiff1d(expected, removed))
+
+    assert list(merge([[], chunked(runs[0], 10)]))[0][0] == runs[0][0]
+
+
+def test_store_levels(tmp_path):
+    """Each level holds the added keys that weren't in an earlier level, even when
+    the buffer is spilled to several runs."""
+
+    rng = np.random.default_rng(5)
+    store = FrontierStore(str(tmp_path), memory_budget=8 * 300)
+
+    seen = np.zeros(0, dtype=np.uint64)
+    for _ in range(4):
+        added = rng.integers(0, 3000, size=1000).astype(np.uint64)
+        for chunk in chunked(added, 128):
+            store.add(chunk)
+
+        frontier = store.advance()
+        expected = np.setdiff1d(added, seen)
+        assert np.array_equal(np.concatenate(list(frontier.chunks(100))), expected)
+
+        seen = np.union1d(seen, expected)
+        assert len(store.seen) == len(seen)
+
+    store.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_many_runs(tmp_path):
+    """Spilling more runs than the keys read from the runs at once loses no keys,
+    since the runs are then merged in passes."""
+
+    class SmallStore(FrontierStore):
+        chunk_size = 4
+
+    rng = np.random.default_rng(7)
+    store = SmallStore(str(tmp_path))
+
+    added = rng.integers(0, 1000, size=200).astype(np.uint64)
+    for chunk in chunked(added, 5):
+        store.add(chunk)
+    assert len(store._runs) > store.chunk_size
+
+    frontier = store.advance()
+    assert np.array_equal(np.concatenate(list(frontier.chunks(7))), np.unique(added))
+    assert len(store.seen) == len(np.unique(added))
+
+    store.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_bfs_with_store(tmp_path):
+    """The enumeration gives the same plies when the keys are kept on disk."""
+
+    inventory = (1, 1, 1, 1, 1, 0)
+    expected = list(bfs.plies(inventory=inventory))
+
+    store = FrontierStore(str(tmp_path), memory_budget=8 * 4096)
+    found = list(bfs.plies(inventory=inventory, store=store))
+
+    assert [s.positions for s in found] == [s.positions for s in expected]
+    assert [s.terminal for s in found] == [s.terminal for s in expected]
+    assert [s.children for s in found] == [s.children for s in expected]
+    assert [s.max_children for s in found] == [s.max_children for s in expected]
+    assert [s.total for s in found] == [s.total for s in expected]
+
+
+def test_bfs_within_budget(tmp_path):
+    """The enumeration with a store uses about its memory budget, however many
+    positions a ply has."""
+
+    inventory = (1, 1, 1, 1, 1, 1)
+    list(bfs.plies(inventory=inventory, max_ply=1))
+
+    budget = 1 << 20
+    store = FrontierStore(str(tmp_path), memory_budget=budget)
+    tracemalloc.start()
+    try:
+        stats = list(bfs.plies(inventory=inventory, store=store))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        store.close()
+
+    assert max(s.positions for s in stats) * 8 * 30 > 4 * budget
+    assert peak < 2 * budget
@@ -0,0 +1,21 @@
+"""Tests for mixing position keys."""
+
+import numpy as np
+
+from goblet_gobblers.solver.hashing import mix, mix_keys
+
+
+def test_mix_matches_mix_keys():
+    """The scalar and array versions give the same numbers."""
+
+    keys = np.array([0, 1, 0x7F, 1 << 63, (1 << 64) - 1], dtype=np.uint64)
+    assert mix_keys(keys).tolist() == [mix(int(key)) for key in keys]
+
+
+def test_mix_spreads_similar_keys():
+    """Keys that differ in one low bit land in different slots."""
+
+    keys = np.arange(1024, dtype=np.uint64)
+    slots = mix_keys(keys) % np.uint64(64)
+    assert len(np.unique(slots)) == 64
+    assert np.bincount(slots.astype(np.int64)).max() < 3 * 1024 // 64
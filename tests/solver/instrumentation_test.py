@@ -0,0 +1,91 @@
+"""Tests for the search and solver instrumentation."""
+
+import io
+import json
+
+from goblet_gobblers.game.state import State, Piece, Player
+from goblet_gobblers.solver import retrograde
+from goblet_gobblers.solver.instrumentation import (
+    PROGRESS,
+    Instrumentation,
+    JsonLinesEmitter,
+)
+from goblet_gobblers.solver.search import Searcher
+
+
+def test_counters_and_events():
+    """Counts, depth counts and timers show up in the events sent to callbacks."""
+
+    events = []
+    instrumentation = Instrumentation([events.append], interval=0.0)
+    instrumentation.count("nodes", 3)
+    instrumentation.count_depth(2)
+    with instrumentation.timer("work"):
+        pass
+    instrumentation.tick(extra=1)
+
+    (event,) = events
+    assert event["event"] == PROGRESS
+    assert event["counters"] == {"nodes": 3}
+    assert event["nodes_by_depth"] == [0, 0, 1]
+    assert event["timers"]["work"] >= 0
+    assert event["extra"] == 1
+
+    # Progress events are limited to one per interval.
+    instrumentation.interval = 1000.0
+    instrumentation.tick()
+    assert len(events) == 1
+
+
+def test_json_lines():
+    stream = io.StringIO()
+    instrumentation = Instrumentation([JsonLinesEmitter(stream)])
+    instrumentation.event("done", positions=5)
+    instrumentation.event("done", positions=6)
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["positions"] for line in lines] == [5, 6]
+
+
+def test_search_counts():
+    """The search counts its work without changing the result."""
+
+    state = State(
+        Player.ORANGE,
+        pieces=[(0, 0, Piece.ORANGE_BIG), (1, 1, Piece.BLUE_MEDIUM)],
+    )
+    plain = Searcher(table_capacity=1 << 12).search(state, 3)
+
+    events = []
+    instrumentation = Instrumentation([events.append])
+    searcher = Searcher(table_capacity=1 << 12, instrumentation=instrumentation)
+    result = searcher.search(state, 3)
+
+    assert result.score == plain.score
+    assert result.nodes == plain.nodes
+
+    counters = instrumentation.counters
+    assert counters["nodes"] == result.nodes
+    assert sum(instrumentation.nodes_by_depth) == result.nodes
+    assert instrumentation.nodes_by_depth[0] == 3
+    assert counters["is_win"] >= counters["nodes"]
+    assert counters["valid_moves"] > 0
+    assert counters["canonicalizations"] > 0
+    assert counters["tt_probes"] == searcher.table.probes
+    assert counters["tt_hits"] == searcher.table.hits
+    assert [e["depth"] for e in events if e["event"] == "iteration"] == [1, 2, 3]
+
+
+def test_solve_counts():
+    """The solver counts every position it expands once."""
+
+    events = []
+    instrumentation = Instrumentation([events.append])
+    solution = retrograde.solve(
+        inventory=(1, 0, 1, 1, 0, 1), instrumentation=instrumentation
+    )
+
+    assert instrumentation.counters["nodes"] == len(solution)
+    assert set(instrumentation.timers) == {"enumerate", "propagate"}
+    assert sum(e["positions"] for e in events if e["event"] == "ply") == len(solution)
+    assert events[-1]["event"] == "solved"
@@ -0,0 +1,87 @@
+"""Tests for the multi-process solver."""
+
+import numpy as np
+
+from goblet_gobblers.game.state import State, Piece, Player
+from goblet_gobblers.solver import parallel, retrograde
+
+
+def test_shards_cover_keys():
+    """Every key is owned by exactly one shard and the split keeps rows together."""
+
+    keys = np.arange(1000, dtype=np.uint64) * np.uint64(0x10001)
+    values = np.arange(1000)
+    batches = parallel._split_by_shard(keys, 3, values)
+
+    assert sum(len(batch_keys) for batch_keys, _ in batches) == len(keys)
+    for shard, (batch_keys, batch_values) in enumerate(batches):
+        assert np.all(parallel.shard_of(batch_keys, 3) == shard)
+        assert np.array_equal(keys[batch_values], batch_keys)
+
+
+def test_resolve_matches_propagate():
+    """Resolving a distance at a time gives the same result as the serial queue."""
+
+    # 0 -> 1, 2, 3 -> 4 -> 0, with 1 a terminal win and 2 a terminal loss.
+    offsets = np.array([0, 3, 3, 3, 4, 5])
+    children = np.array([1, 2, 3, 4, 0])
+    terminal = np.array([0, 1, 2, 0, 0], dtype=np.int8)
+    expected_values, expected_distances = retrograde.propagate(
+        offsets, children, terminal
+    )
+
+    values = terminal.copy()
+    distances = np.where(terminal != 0, 0, retrograde.NO_DISTANCE).astype(np.int32)
+    unresolved = np.diff(offsets).astype(np.int32)
+    parents_of = np.repeat(np.arange(5), np.diff(offsets))
+    resolved = np.flatnonzero(terminal)
+    distance = 1
+    while len(resolved) > 0:
+        edges = np.isin(children, resolved)
+        resolved = parallel.resolve(
+            values,
+            distances,
+            unresolved,
+            parents_of[edges],
+            values[children[edges]],
+            distance,
+        )
+        distance += 1
+
+    assert np.array_equal(values, expected_values)
+    assert np.array_equal(distances, expected_distances)
+
+
+def test_matches_serial():
+    """The parallel solve gives exactly the same result as the serial solve, for
+    any number of workers."""
+
+    inventory = (1, 0, 1, 1, 0, 1)
+    root = State(Player.BLUE, pieces=[(1, 1, Piece.ORANGE_SMALL)])
+    expected = retrograde.solve(root, inventory=inventory)
+
+    for workers in [1, 3]:
+        solution = parallel.solve(root, workers=workers, inventory=inventory)
+        assert np.array_equal(solution.keys, expected.keys)
+        assert np.array_equal(solution.values, expected.values)
+        assert np.array_equal(solution.distances, expected.distances)
+
+
+def test_exchange(tmp_path):
+    """Each worker receives the batches the others sent it in the round before, and
+    the files are deleted once they are read."""
+
+    exchanges = [parallel._Exchange(str(tmp_path), shard, 2) for shard in range(2)]
+    assert exchanges[0].receive(2) == []
+
+    for shard, exchange in enumerate(exchanges):
+        keys = [np.array([10 * shard + target], dtype=np.uint64) for target in range(2)]
+        sent = exchange.send([(k, np.array([shard], dtype=np.int8)) for k in keys])
+        assert sent == 2
+
+    for target, exchange in enumerate(exchanges):
+        batches = exchange.receive(2)
+        assert [batch[0].tolist() for batch in batches] == [[target], [10 + target]]
+        assert [batch[1].tolist() for batch in batches] == [[0], [1]]
+
+    assert list(tmp_path.iterdir()) == []
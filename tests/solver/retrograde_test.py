@@ -0,0 +1,123 @@
+"""Tests for the retrograde solver."""
+
+import numpy as np
+
+from goblet_gobblers.game.state import State, Piece, Player
+from goblet_gobblers.solver.retrograde import (
+    NO_DISTANCE,
+    Value,
+    enumerate_positions,
+    expand,
+    position_key,
+    propagate,
+    terminal_value,
+)
+
+
+def make_graph(children_lists: list[list[int]], terminal: dict[int, Value]):
+    offsets = np.cumsum([0] + [len(c) for c in children_lists]).astype(np.int64)
+    children = np.array([c for cs in children_lists for c in cs], dtype=np.int64)
+    terminal_array = np.zeros(len(children_lists), dtype=np.int8)
+    for i, value in terminal.items():
+        terminal_array[i] = value.value
+
+    return offsets, children, terminal_array
+
+
+def test_propagate_win_and_loss():
+    """Test propagation on a small acyclic graph."""
+
+    # 0 -> 1, 2. 1 is a terminal loss, so 0 is a win in one ply.
+    # 2 -> 3 and 3 is a terminal win, so 2 is a loss in one ply.
+    offsets, children, terminal = make_graph(
+        [[1, 2], [], [3], []], {1: Value.LOSS, 3: Value.WIN}
+    )
+    values, distances = propagate(offsets, children, terminal)
+
+    assert [Value(v) for v in values] == [Value.WIN, Value.LOSS, Value.LOSS, Value.WIN]
+    assert list(distances) == [1, 0, 1, 0]
+
+
+def test_propagate_distances():
+    """The winner takes the fastest win and the loser the slowest loss."""
+
+    # 0 can lose in one ply by moving to 1 or in three plies by moving to 2.
+    offsets, children, terminal = make_graph(
+        [[1, 2], [], [3], [4], []], {1: Value.WIN, 4: Value.WIN}
+    )
+    values, distances = propagate(offsets, children, terminal)
+
+    assert Value(values[3]) == Value.LOSS
+    assert distances[3] == 1
+    assert Value(values[2]) == Value.WIN
+    assert distances[2] == 2
+    assert Value(values[0]) == Value.LOSS
+    assert distances[0] == 3
+
+
+def test_propagate_cycle_is_draw():
+    """A player who can stay on a cycle forever gets a draw."""
+
+    # 0 <-> 1, and 1 can also move to a terminal win for the opponent.
+    offsets, children, terminal = make_graph([[1], [0, 2], []], {2: Value.WIN})
+    values, distances = propagate(offsets, children, terminal)
+
+    assert [Value(v) for v in values] == [Value.DRAW, Value.DRAW, Value.WIN]
+    assert list(distances) == [NO_DISTANCE, NO_DISTANCE, 0]
+
+    # If 1 can move to a terminal loss for the opponent, it wins.
+    offsets, children, terminal = make_graph([[1], [0, 2], []], {2: Value.LOSS})
+    values, distances = propagate(offsets, children, terminal)
+
+    assert [Value(v) for v in values] == [Value.LOSS, Value.WIN, Value.LOSS]
+    assert list(distances) == [2, 1, 0]
+
+
+def test_terminal_value():
+    """The value of a finished game is from the point of view of the player to
+    play."""
+
+    line = [
+        (1, 0, Piece.BLUE_SMALL),
+        (1, 1, Piece.BLUE_SMALL),
+        (1, 2, Piece.BLUE_MEDIUM),
+    ]
+
+    assert terminal_value(State(Player.ORANGE, pieces=line)) == Value.LOSS
+    assert terminal_value(State(Player.BLUE, pieces=line)) == Value.WIN
+    assert terminal_value(State(Player.BLUE, pieces=[])) is None
+
+
+def test_enumerate_stops_at_terminal():
+    """Positions where the game is over are not expanded."""
+
+    line = [
+        (1, 0, Piece.BLUE_SMALL),
+        (1, 1, Piece.BLUE_SMALL),
+        (1, 2, Piece.BLUE_MEDIUM),
+    ]
+    keys, offsets, children, terminal = enumerate_positions(
+        State(Player.ORANGE, pieces=line)
+    )
+
+    assert len(keys) == 1
+    assert list(offsets) == [0, 0]
+    assert len(children) == 0
+    assert list(terminal) == [Value.LOSS.value]
+
+
+def test_expand_matches_state():
+    """Expanding a frontier finds the same children as State.play."""
+
+    states = [State(Player.ORANGE, pieces=[])]
+    for _ in range(3):
+        state = states[-1]
+        states.append(state.play(*state.valid_moves()[-1]))
+
+    keys = np.array([position_key(state) for state in states], dtype=np.uint64)
+    terminal, parents, children = expand(keys)
+
+    assert list(terminal) == [0] * len(states)
+    for i, state in enumerate(states):
+        expected = {position_key(state.play(*move)) for move in state.valid_moves()}
+        assert sorted(children[parents == i].tolist()) == sorted(expected)
@@ -0,0 +1,89 @@
+"""Tests for the alpha-beta search."""
+
+import numpy as np
+
+from goblet_gobblers.game.state import State, Piece, Player
+from goblet_gobblers.solver.search import WIN_SCORE, Searcher, is_proven
+
+
+def minimax_nodes(state: State, depth: int) -> int:
+    """Returns the number of positions plain minimax visits."""
+    if depth == 0 or state.is_win() is not None:
+        return 1
+
+    return 1 + sum(
+        minimax_nodes(state.play(*move), depth - 1) for move in state.valid_moves()
+    )
+
+
+def test_win_in_one():
+    """The search finds a move that completes a line."""
+
+    state = State(
+        Player.ORANGE,
+        pieces=[
+            (0, 0, Piece.ORANGE_BIG),
+            (0, 1, Piece.ORANGE_BIG),
+            (1, 1, Piece.BLUE_BIG),
+            (2, 2, Piece.BLUE_BIG),
+        ],
+    )
+    result = Searcher().search(state, max_depth=4)
+
+    assert result.score == WIN_SCORE - 1
+    assert result.depth == 1
+    assert is_proven(result.score)
+    assert state.play(*result.best_move).is_win() == Player.ORANGE
+    assert result.principal_variation == [result.best_move]
+
+
+def test_loss_in_two():
+    """If the opponent has two threats that can't both be stopped, every move
+    loses."""
+
+    state = State(
+        Player.BLUE,
+        pieces=[
+            (0, 0, Piece.ORANGE_BIG),
+            (0, 1, Piece.ORANGE_BIG),
+            (1, 0, Piece.ORANGE_MEDIUM),
+            (1, 1, Piece.BLUE_MEDIUM),
+            (2, 2, Piece.BLUE_SMALL),
+            (2, 2, Piece.ORANGE_MEDIUM),
+        ],
+    )
+    result = Searcher().search(state, max_depth=4)
+
+    assert result.score == -(WIN_SCORE - 2)
+    assert len(result.principal_variation) == 2
+
+
+def test_fewer_nodes_than_minimax():
+    """Alpha-beta with move ordering and the transposition table visits fewer
+    positions than minimax."""
+
+    state = State(Player.ORANGE, pieces=[(1, 1, Piece.BLUE_BIG)])
+    result = Searcher().search(state, max_depth=3)
+
+    assert result.score == 0
+    assert result.depth == 3
+    assert result.nodes * 5 < minimax_nodes(state, 3)
+
+
+def test_repetitions():
+    """Positions that repeat on the path are scored as draws, and results that
+    depend on them aren't reused, so searching again with the filled table gives
+    the same result."""
+
+    # Every piece is on the board, so the players can only move pieces around.
+    board = np.array([0x40, 0x16, 0x01, 0x06, 0, 0x30, 0, 0x40, 0x21], dtype=np.int8)
+    state = State(Player.ORANGE, initial_board=board)
+
+    searcher = Searcher(table_capacity=1 << 16)
+    result = searcher.search(state, max_depth=8)
+    assert searcher.repetitions > 0
+    assert result.score == WIN_SCORE - 7
+
+    again = searcher.search(state, max_depth=8)
+    assert again.score == result.score
+    assert Searcher().search(state, max_depth=7).score == result.score
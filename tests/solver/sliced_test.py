@@ -0,0 +1,125 @@
+"""Tests for the inventory sliced solver."""
+
+import numpy as np
+import pytest
+
+from goblet_gobblers.game.state import State, Piece, Player
+from goblet_gobblers.solver import retrograde, sliced
+from goblet_gobblers.solver.sliced import (
+    SliceStore,
+    _SliceCache,
+    slice_keys,
+    slices,
+    solve,
+    solve_slice,
+    successors,
+)
+
+
+def test_slices_fullest_first():
+    """Every slice is solved before the slices with one less piece."""
+
+    order = slices((1, 0, 2, 1, 0, 0))
+    assert len(order) == 2 * 1 * 3 * 2 * 1 * 1
+    assert order[0] == (1, 0, 2, 1, 0, 0)
+    assert order[-1] == (0, 0, 0, 0, 0, 0)
+    assert [sum(counts) for counts in order] == sorted(
+        [sum(counts) for counts in order], reverse=True
+    )
+
+    assert slices((2,) * 6, smallest=(2, 2, 2, 2, 2, 1)) == [
+        (2,) * 6,
+        (2, 2, 2, 2, 2, 1),
+    ]
+
+
+def test_slice_keys():
+    """A slice holds every canonical position with the given pieces on the board."""
+
+    # One orange big piece can be in a corner, an edge or the center.
+    keys = slice_keys((0, 0, 1, 0, 0, 0))
+    assert len(keys) == 3 * 2
+
+    state = State(Player.BLUE, pieces=[(0, 1, Piece.ORANGE_BIG)])
+    assert retrograde.position_key(state) in keys
+
+    # Pieces of the same size can't share a square, but a bigger piece can cover a
+    # smaller one.
+    keys = slice_keys((1, 0, 0, 1, 0, 0))
+    boards, _ = retrograde.split_keys(keys)
+    assert np.all(np.count_nonzero(boards, axis=1) == 2)
+
+    covered = State(
+        Player.ORANGE, pieces=[(1, 1, Piece.ORANGE_SMALL), (1, 1, Piece.BLUE_BIG)]
+    )
+    assert retrograde.position_key(covered) in slice_keys((1, 0, 0, 0, 0, 1))
+
+
+def test_matches_retrograde(tmp_path):
+    """Solving slice by slice gives the same values and distances as solving the
+    whole game at once."""
+
+    inventory = (1, 0, 1, 1, 0, 1)
+    expected = retrograde.solve(inventory=inventory)
+
+    solution = solve(str(tmp_path), inventory=inventory)
+    values, distances = _SliceCache(solution.store).lookup(expected.keys)
+    assert np.array_equal(values, expected.values)
+    assert np.array_equal(distances, expected.distances)
+    assert solution.value(expected.root) == expected.root_value()
+
+    # Solving again uses the slices on disk.
+    solved = []
+    solve(str(tmp_path), inventory=inventory, callback=solved.append)
+    assert solved == []
+
+
+def test_only_successors_in_memory(tmp_path, monkeypatch):
+    """While a slice is solved only the slices it can reach are in memory."""
+
+    inventory = (1, 1, 1, 1, 0, 1)
+    assert successors((1, 0, 1, 0, 0, 0), inventory) == [
+        (1, 1, 1, 0, 0, 0),
+        (1, 0, 1, 1, 0, 0),
+        (1, 0, 1, 0, 0, 1),
+    ]
+
+    in_memory = {}
+
+    def recording_solve_slice(counts, inventory, cache, instrumentation=None):
+        result = solve_slice(counts, inventory, cache, instrumentation)
+        in_memory[counts] = set(cache.slices)
+        return result
+
+    monkeypatch.setattr(sliced, "solve_slice", recording_solve_slice)
+    solve(str(tmp_path), inventory=inventory)
+
+    assert len(in_memory) == len(slices(inventory))
+    for counts, loaded in in_memory.items():
+        assert loaded <= set(successors(counts, inventory))
+
+
+def test_chunks(tmp_path):
+    """Expanding a slice in small chunks gives the same result."""
+
+    inventory = (1, 0, 1, 1, 0, 1)
+    store = solve(str(tmp_path), inventory=inventory).store
+    counts = (1, 0, 0, 1, 0, 0)
+    keys, values, distances = solve_slice(
+        counts, inventory, _SliceCache(store), chunk_size=5
+    )
+
+    expected_keys, expected_values, expected_distances = store.load(counts)
+    assert np.array_equal(keys, expected_keys)
+    assert np.array_equal(values, expected_values)
+    assert np.array_equal(distances, expected_distances)
+
+
+def test_store_checks_inventory(tmp_path):
+    """Slices solved for one inventory can't be used for another."""
+
+    solve(str(tmp_path), inventory=(0, 0, 1, 0, 0, 1))
+
+    store = SliceStore(str(tmp_path), inventory=(0, 0, 2, 0, 0, 2))
+    with pytest.raises(ValueError):
+        store.load((0, 0, 1, 0, 0, 1))
@@ -0,0 +1,94 @@
+"""Tests for the tablebase file format."""
+
+import numpy as np
+import pytest
+
+from goblet_gobblers.game import ranking
+from goblet_gobblers.game.state import State, Piece, Player
+from goblet_gobblers.solver import retrograde, tablebase
+from goblet_gobblers.solver.tablebase import Tablebase
+
+
+def test_round_trip(tmp_path):
+    """Every position of a solution can be looked up in the written file."""
+
+    solution = retrograde.solve(inventory=(1, 0, 1, 1, 0, 1))
+    path = str(tmp_path / "small.tb")
+    tablebase.write(path, solution)
+
+    table = Tablebase(path)
+    assert len(table) == len(solution)
+    assert isinstance(table.values, np.memmap)
+    assert len(table.values) * 4 >= ranking.RANK_COUNT
+
+    ranks = ranking.rank_boards(*retrograde.split_keys(solution.keys))
+    assert np.array_equal(table.value_codes(ranks), solution.values + 1)
+    assert np.array_equal(table.distances_of(ranks), solution.distances)
+    for key in solution.keys[:: len(solution) // 50]:
+        state = State.from_key(int(key))
+        assert table.lookup(state) == solution.value(state)
+        assert table.distance(state) == solution.distance(state)
+
+    assert table.lookup(solution.root) == solution.root_value()
+    assert table.distance(solution.root) == solution.distance(solution.root)
+
+    # The medium pieces aren't used in this version of the game.
+    missing = State(Player.ORANGE, pieces=[(0, 0, Piece.ORANGE_MEDIUM)])
+    assert table.lookup(missing) is None
+    assert table.distance(missing) is None
+
+
+def test_overflow(tmp_path, monkeypatch):
+    """Distances that don't fit in the stored width are read from the overflow
+    arrays."""
+
+    # Every decided distance is stored as 0 and read from the overflow arrays.
+    monkeypatch.setattr(tablebase, "OVERFLOW", 0)
+    solution = retrograde.solve(inventory=(1, 0, 2, 1, 0, 2))
+    decided = solution.values != retrograde.Value.DRAW.value
+    assert np.any(solution.distances[decided] == 0)
+    assert np.any(solution.distances[decided] == 1)
+
+    path = str(tmp_path / "overflow.tb")
+    tablebase.write(path, solution)
+    table = Tablebase(path)
+
+    ranks = ranking.rank_boards(*retrograde.split_keys(solution.keys))
+    assert np.array_equal(table.distances_of(ranks), solution.distances)
+    for key in solution.keys[decided][:: np.count_nonzero(decided) // 50]:
+        state = State.from_key(int(key))
+        assert table.distance(state) == solution.distance(state)
+
+
+def test_without_distances(tmp_path):
+    """A file written without distances is smaller and still has the values."""
+
+    solution = retrograde.solve(inventory=(1, 0, 1, 1, 0, 1))
+    with_path = tmp_path / "with.tb"
+    without_path = tmp_path / "without.tb"
+    tablebase.write(str(with_path), solution)
+    tablebase.write(str(without_path), solution, distances=False)
+    assert without_path.stat().st_size < with_path.stat().st_size
+
+    table = Tablebase(str(without_path))
+    assert not table.has_distances
+    assert table.lookup(solution.root) == solution.root_value()
+    with pytest.raises(ValueError):
+        table.distance(solution.root)
+
+
+def test_version_check(tmp_path, monkeypatch):
+    """A file written for other rules or another encoding is rejected."""
+
+    solution = retrograde.solve(inventory=(0, 0, 1, 0, 0, 1))
+    path = str(tmp_path / "old.tb")
+    tablebase.write(path, solution)
+
+    monkeypatch.setattr(tablebase, "RULES_VERSION", tablebase.RULES_VERSION + 1)
+    with pytest.raises(ValueError):
+        Tablebase(path)
+
+    other = tmp_path / "other.tb"
+    other.write_bytes(b"not a tablebase")
+    with pytest.raises(ValueError):
+        Tablebase(str(other))
@@ -0,0 +1,83 @@
+"""Tests for the transposition table."""
+
+from goblet_gobblers.game.state import State, Piece, Player
+from goblet_gobblers.solver.transposition import (
+    EXACT,
+    LOWER,
+    Replacement,
+    TranspositionTable,
+)
+
+
+def test_state_hash():
+    """States can be used in sets and dicts. Equal states include the player to
+    play."""
+
+    state1 = State(Player.ORANGE, pieces=[(0, 0, Piece.ORANGE_BIG)])
+    state2 = State(Player.ORANGE, pieces=[(2, 2, Piece.ORANGE_BIG)])
+    state3 = State(Player.BLUE, pieces=[(0, 0, Piece.ORANGE_BIG)])
+
+    assert state1 == state2
+    assert hash(state1) == hash(state2)
+    assert state1 != state3
+    assert state1.key() != state3.key()
+    assert len({state1, state2, state3}) == 2
+    assert state1 != "not a state"
+
+
+def test_store_and_probe():
+    """Test storing and finding entries."""
+
+    for replacement in Replacement:
+        table = TranspositionTable(1024, replacement)
+        assert table.probe(5) is None
+
+        table.store(5, value=3, depth=2, flag=EXACT, move=7)
+        entry = table.probe(5)
+        assert (entry.value, entry.depth, entry.flag, entry.move) == (3, 2, EXACT, 7)
+        assert table.probe(6) is None
+
+        # Key zero is the empty board with orange to play.
+        table.store(0, value=-1, depth=4, flag=LOWER)
+        assert table.probe(0).value == -1
+        assert len(table) == 2
+        assert (table.probes, table.hits) == (4, 2)
+
+        table.clear()
+        assert table.probe(5) is None
+
+
+def test_replacement():
+    """Test what happens when positions collide in a bucket."""
+
+    # With a single bucket every key collides.
+    table = TranspositionTable(1, Replacement.ALWAYS)
+    table.store(1, value=1, depth=5, flag=EXACT)
+    table.store(2, value=2, depth=1, flag=EXACT)
+    assert table.probe(1) is None
+    assert table.probe(2).value == 2
+
+    table = TranspositionTable(1, Replacement.DEPTH)
+    table.store(1, value=1, depth=5, flag=EXACT)
+    table.store(2, value=2, depth=1, flag=EXACT)
+    assert table.probe(1).value == 1
+    assert table.probe(2) is None
+    table.store(3, value=3, depth=5, flag=EXACT)
+    assert table.probe(3).value == 3
+
+    table = TranspositionTable(2, Replacement.TWO_TIER)
+    table.store(1, value=1, depth=5, flag=EXACT)
+    table.store(2, value=2, depth=1, flag=EXACT)
+    assert table.probe(1).value == 1
+    assert table.probe(2).value == 2
+
+    # A deeper entry takes the depth preferred slot and the old one moves over.
+    table.store(3, value=3, depth=6, flag=EXACT)
+    assert table.probe(1).value == 1
+    assert table.probe(2) is None
+    assert table.probe(3).value == 3
+
+    # Updating an existing position keeps its slot.
+    table.store(1, value=4, depth=0, flag=EXACT)
+    assert table.probe(1).value == 4
+    assert table.probe(3).value == 3